@@ -0,0 +1,93 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import time
+
+import numpy as np
+
+from dp_engine import DETERMINISTIC_ACTIONS, STOCHASTIC_ACTIONS, SWEEPS, GridMDP
+
+# dp_engine.GridMDP against the notebook's loop Agent on grids built by tiling the notebook's
+# WorldGrid. Reports the cost of one policy-evaluation sweep (the loops only up to
+# --loop-max-states, as their list membership tests make a sweep quadratic in the states) and
+# the engine's compile time and full value iteration with each sweep order.
+
+NOTEBOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'DP_Programming_excercise.ipynb')
+
+
+def notebook_agent():
+    """(Agent class, WorldGrid) defined by the notebook's code cell, without its Colab drive mount."""
+    with open(NOTEBOOK) as f:
+        source = ''.join(json.load(f)['cells'][1]['source'])
+    source = '\n'.join(line for line in source.splitlines() if 'google.colab' not in line and 'drive.mount' not in line)
+    namespace = {'__name__': 'notebook'}
+    exec(source, namespace)
+    start = source.index('WorldGrid = np.array(')
+    grid_source = source[start:source.index('])', start) + 2]
+    exec(grid_source, namespace)
+    return namespace['Agent'], namespace['WorldGrid']
+
+
+def tiled_grid(world_grid, tiles):
+    """The notebook grid's interior repeated tiles x tiles times inside one border wall, with the goal
+    at the centre tile's (7, 10)."""
+    interior = world_grid[1:-1, 1:-1]
+    grid = np.pad(np.tile(interior, (tiles, tiles)), 1, constant_values=1)
+    centre = tiles // 2
+    return grid, (centre * interior.shape[0] + 7, centre * interior.shape[1] + 10)
+
+
+def loop_sweep_seconds(agent_class, grid, goal, deterministic):
+    with contextlib.redirect_stdout(io.StringIO()):
+        agent = agent_class(grid, desired_position=goal, mode=deterministic)
+    value = np.zeros(grid.shape)
+    start = time.perf_counter()
+    agent.PolicyEval(agent.init_policy, value)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized DP engine against the notebook loops.")
+    parser.add_argument('--tiles', type=int, nargs='+', default=[1, 2, 4, 12, 36],
+                        help="grid sizes, as copies of the notebook grid per side (36: ~10^6 cells)")
+    parser.add_argument('--stochastic', action='store_true', help="use the 60/20/20 stochastic action model")
+    parser.add_argument('--tolerance', type=float, default=1.0)
+    parser.add_argument('--loop-max-states', type=int, default=2000)
+    args = parser.parse_args()
+
+    agent_class, world_grid = notebook_agent()
+    valid_actions = STOCHASTIC_ACTIONS if args.stochastic else DETERMINISTIC_ACTIONS
+    print(f"{'stochastic' if args.stochastic else 'deterministic'} model, tolerance {args.tolerance:g}")
+    print(f"{'cells':>9}{'states':>9}{'compile s':>11}{'loop sweep ms':>15}{'sweep ms':>10}{'speedup':>9}"
+          + ''.join(f"{'VI ' + sweep:>20}" for sweep in SWEEPS))
+    for tiles in args.tiles:
+        grid, goal = tiled_grid(world_grid, tiles)
+        start = time.perf_counter()
+        mdp = GridMDP(grid, goal, valid_actions, tolerance=args.tolerance)
+        compile_seconds = time.perf_counter() - start
+
+        policy, value = mdp.uniform_policy(), np.zeros(mdp.num_states)
+        run = mdp.sweeper(policy)
+        start = time.perf_counter()
+        run(value)
+        sweep_seconds = time.perf_counter() - start
+
+        loop = loop_sweep_seconds(agent_class, grid, goal, not args.stochastic) \
+            if mdp.num_states <= args.loop_max_states else float('nan')
+        solves = []
+        for sweep in SWEEPS:
+            run = mdp.sweeper(None, sweep)
+            value = np.zeros(mdp.num_states)
+            start = time.perf_counter()
+            for count in range(1, 100001):
+                if run(value) < mdp.tolerance:
+                    break
+            solves.append(f"{count} in {time.perf_counter() - start:.3f} s")
+        print(f"{grid.size:>9}{mdp.num_states:>9}{compile_seconds:>11.3f}{loop * 1e3:>15.1f}{sweep_seconds * 1e3:>10.2f}"
+              f"{loop / sweep_seconds:>9.0f}" + ''.join(f"{solve:>20}" for solve in solves))
+
+
+if __name__ == "__main__":
+    main()
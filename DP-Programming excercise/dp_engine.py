@@ -0,0 +1,284 @@
+import numpy as np
+
+# Vectorized dynamic programming for the grid world of DP_Programming_excercise.ipynb.
+#
+# GridMDP compiles a WorldGrid and an action model (the notebook's valid_actions) once into a
+# sparse transition matrix in CSR form, one row per (state, action), and the expected reward of
+# every row. Policy evaluation, policy improvement, GPI and value iteration then run as sparse
+# matrix-vector products and argmaxes over the whole state space, which scales to grids of
+# 10^5-10^6 cells:
+#
+#   mdp = GridMDP(WorldGrid, desired_position=(7, 10), valid_actions=STOCHASTIC_ACTIONS)
+#   policy, value = mdp.value_iter(sweep='gauss-seidel')
+#   agent.PolicyGraph(mdp.policy_dict(policy), "Value Iteration")
+#   agent.ValueGraph(mdp.value_grid(value), "Value Iteration")
+#
+# Sweeps are 'jacobi' (every state from the previous values), 'gauss-seidel' (the grid's four
+# colour classes one after the other, each using the values the previous classes just wrote)
+# or 'async' (only the states whose successors changed by at least the tolerance last sweep).
+# All three reach the notebook's fixed points; Gauss-Seidel visits the states in colour order
+# rather than the notebook's row order, so intermediate values differ.
+
+MOVES = {
+    "up": (-1, 0),
+    "down": (1, 0),
+    "right": (0, 1),
+    "left": (0, -1),
+    "up_right": (-1, 1),
+    "up_left": (-1, -1),
+    "down_right": (1, 1),
+    "down_left": (1, -1)
+}
+
+DETERMINISTIC_ACTIONS = {key: [(key, 1)] for key in MOVES}
+
+# 60% intended move, 20% each for the adjacent moves
+STOCHASTIC_ACTIONS = {
+    "up": [("up", 0.6), ("up_left", 0.2), ("up_right", 0.2)],
+    "up_left": [("up_left", 0.6), ("up", 0.2), ("left", 0.2)],
+    "up_right": [("up_right", 0.6), ("up", 0.2), ("right", 0.2)],
+    "down": [("down", 0.6), ("down_left", 0.2), ("down_right", 0.2)],
+    "down_left": [("down_left", 0.6), ("down", 0.2), ("left", 0.2)],
+    "down_right": [("down_right", 0.6), ("down", 0.2), ("right", 0.2)],
+    "left": [("left", 0.6), ("up_left", 0.2), ("down_left", 0.2)],
+    "right": [("right", 0.6), ("up_right", 0.2), ("down_right", 0.2)]
+}
+
+SWEEPS = ('jacobi', 'gauss-seidel', 'async')
+
+
+class CSRMatrix:
+    """Sparse matrix in compressed sparse row form: row i holds data[indptr[i]:indptr[i + 1]] at columns
+    indices[indptr[i]:indptr[i + 1]]. Products scatter-add with np.bincount, so empty rows cost nothing."""
+
+    def __init__(self, indptr, indices, data, shape):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.shape = shape
+        self.row_ids = np.repeat(np.arange(shape[0], dtype=indices.dtype), np.diff(indptr))
+
+    @classmethod
+    def from_coo(cls, rows, columns, data, shape):
+        order = np.argsort(rows, kind='stable')
+        indptr = np.zeros(shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=shape[0]), out=indptr[1:])
+        index_dtype = np.int32 if max(shape) < 2 ** 31 else np.int64
+        return cls(indptr, columns[order].astype(index_dtype), data[order].astype(np.float64), shape)
+
+    def dot(self, vector):
+        return np.bincount(self.row_ids, weights=self.data * vector[self.indices], minlength=self.shape[0])
+
+    def take_rows(self, rows):
+        """The sub-matrix of the given rows, in that order."""
+        rows = np.asarray(rows)
+        counts = self.indptr[rows + 1] - self.indptr[rows]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        # Entry positions of every kept row, gathered in one pass
+        entries = np.repeat(self.indptr[rows] - indptr[:-1], counts) + np.arange(indptr[-1])
+        return CSRMatrix(indptr, self.indices[entries], self.data[entries], (len(rows), self.shape[1]))
+
+    def transpose(self):
+        return CSRMatrix.from_coo(self.indices.astype(np.int64), self.row_ids, self.data, self.shape[::-1])
+
+
+class GridMDP:
+    """A WorldGrid (0 free, 1 obstacle) compiled into transitions and rewards over its free cells.
+
+    States are the free cells in row-major order, the notebook's `states`. Row s * A + a of
+    `transitions` holds the next-state probabilities of action a (in valid_actions order) from
+    state s and `rewards[s * A + a]` its expected reward. With blocked='drop', outcomes that
+    leave the grid or hit an obstacle are left out, as the notebook does, so their probability
+    mass earns nothing; with blocked='stay' the agent stays put and gets reward_obstacle_collision.
+    """
+
+    def __init__(self, world_grid, desired_position, valid_actions=DETERMINISTIC_ACTIONS, moves=MOVES,
+                 discount_factor=0.95, reward_clear_move=-1.0, reward_desired_goal=100,
+                 reward_obstacle_collision=-50, tolerance=1, blocked='drop'):
+        self.world_grid = np.asarray(world_grid)
+        self.desired_position = tuple(desired_position)
+        self.actions = list(valid_actions)
+        self.discount_factor = discount_factor
+        self.tolerance = tolerance
+        height, width = self.world_grid.shape
+        free = self.world_grid.ravel() == 0
+        self.states = np.flatnonzero(free)  # flat cell index of each state
+        self.state_index = np.full(self.world_grid.size, -1, dtype=np.int64)
+        self.state_index[self.states] = np.arange(len(self.states))
+        num_states, num_actions = len(self.states), len(self.actions)
+        rows, columns = np.divmod(self.states, width)
+        goal_cell = self.desired_position[0] * width + self.desired_position[1]
+
+        transition_rows, next_states, probabilities, rewards = [], [], [], []
+        for a, action in enumerate(self.actions):
+            for move, probability in valid_actions[action]:
+                dy, dx = moves[move]
+                next_rows, next_columns = rows + dy, columns + dx
+                inside = (next_rows >= 0) & (next_rows < height) & (next_columns >= 0) & (next_columns < width)
+                next_cells = np.where(inside, next_rows * width + next_columns, 0)
+                reachable = inside & free[next_cells]
+                reward = np.where(next_cells == goal_cell, reward_desired_goal, reward_clear_move)
+                if blocked == 'stay':
+                    next_cells = np.where(reachable, next_cells, self.states)
+                    reward = np.where(reachable, reward, reward_obstacle_collision)
+                    reachable = np.ones(num_states, dtype=bool)
+                elif blocked != 'drop':
+                    raise ValueError(f"blocked must be 'drop' or 'stay', not {blocked!r}")
+                kept = np.flatnonzero(reachable)
+                transition_rows.append(kept * num_actions + a)
+                next_states.append(self.state_index[next_cells[kept]])
+                probabilities.append(np.full(len(kept), float(probability)))
+                rewards.append(probability * reward[kept])
+        transition_rows = np.concatenate(transition_rows)
+        probabilities = np.concatenate(probabilities)
+        self.transitions = CSRMatrix.from_coo(transition_rows, np.concatenate(next_states), probabilities,
+                                              (num_states * num_actions, num_states))
+        self.rewards = np.bincount(transition_rows, weights=np.concatenate(rewards), minlength=num_states * num_actions)
+
+        # Gauss-Seidel colour classes: no move of one cell in any direction stays within a class
+        colours = (rows % 2) * 2 + columns % 2
+        self.colour_classes = [np.flatnonzero(colours == colour) for colour in range(4)]
+        self._predecessors = None
+
+    @property
+    def num_states(self):
+        return len(self.states)
+
+    def uniform_policy(self):
+        """The notebook's init_policy: every action with probability 1 / A, as an (S, A) array."""
+        return np.full((self.num_states, len(self.actions)), 1.0 / len(self.actions))
+
+    def q_values(self, value):
+        """(S, A) action values under a value vector."""
+        return (self.rewards + self.discount_factor * self.transitions.dot(value)).reshape(self.num_states, -1)
+
+    def _backup(self, policy, states=None):
+        """Function mapping a value vector to the backed-up values of `states` (default: all).
+
+        policy None backs up the best action (value iteration), an (S,) array that action, an
+        (S, A) array the expectation over its action probabilities.
+        """
+        num_actions = len(self.actions)
+        states = np.arange(self.num_states) if states is None else states
+        if policy is not None and np.ndim(policy) == 1:
+            rows = states * num_actions + np.asarray(policy)[states]
+            transitions, rewards = self.transitions.take_rows(rows), self.rewards[rows]
+            return lambda value: rewards + self.discount_factor * transitions.dot(value)
+
+        rows = (states[:, None] * num_actions + np.arange(num_actions)).ravel()
+        transitions, rewards = self.transitions.take_rows(rows), self.rewards[rows]
+        if policy is None:
+            return lambda value: (rewards + self.discount_factor * transitions.dot(value)).reshape(-1, num_actions).max(axis=1)
+        weights = np.asarray(policy)[states].ravel()
+        return lambda value: ((rewards + self.discount_factor * transitions.dot(value)) * weights).reshape(
+            -1, num_actions).sum(axis=1)
+
+    def predecessors(self):
+        """Transposed transitions: row s lists the (state, action) rows that can reach state s."""
+        if self._predecessors is None:
+            self._predecessors = self.transitions.transpose()
+        return self._predecessors
+
+    def sweeper(self, policy=None, sweep='jacobi'):
+        """Function running one sweep of backups in place on a value vector and returning the largest change.
+
+        The backups of `policy` (see _backup) are compiled once here, not on every sweep.
+        """
+        if sweep == 'jacobi':
+            backup = self._backup(policy)
+
+            def run(value):
+                backed_up = backup(value)
+                max_change = float(np.abs(backed_up - value).max(initial=0.0))
+                value[:] = backed_up
+                return max_change
+            return run
+
+        if sweep == 'gauss-seidel':
+            backups = [(states, self._backup(policy, states)) for states in self.colour_classes]
+
+            def run(value):
+                max_change = 0.0
+                for states, backup in backups:
+                    backed_up = backup(value)
+                    max_change = max(max_change, float(np.abs(backed_up - value[states]).max(initial=0.0)))
+                    value[states] = backed_up
+                return max_change
+            return run
+
+        if sweep == 'async':
+            predecessors, num_actions = self.predecessors(), len(self.actions)
+            active = [np.arange(self.num_states)]
+
+            def run(value):
+                states = active[0]
+                backed_up = self._backup(policy, states)(value)
+                change = np.abs(backed_up - value[states])
+                value[states] = backed_up
+                # Only the states that can reach a changed state need another backup
+                changed = states[change >= self.tolerance]
+                active[0] = np.unique(predecessors.take_rows(changed).indices // num_actions)
+                return float(change.max(initial=0.0))
+            return run
+        raise ValueError(f"sweep must be one of {SWEEPS}, not {sweep!r}")
+
+    def policy_eval(self, policy, value=None, sweep='jacobi', max_sweeps=100000):
+        """Evaluate a policy ((S,) actions, (S, A) probabilities, or None for the best action) until a sweep
+        changes no value by the tolerance or more; returns the values, updated in place if given."""
+        value = np.zeros(self.num_states) if value is None else value
+        run = self.sweeper(policy, sweep)
+        for _ in range(max_sweeps):
+            if run(value) < self.tolerance:
+                break
+        return value
+
+    def policy_improv(self, policy, value):
+        """(greedy actions, converged): the greedy policy and whether it keeps every current action.
+
+        A current action tied with the best is kept, so ties can't make the iteration cycle.
+        """
+        q = self.q_values(value)
+        current = np.asarray(policy) if np.ndim(policy) == 1 else np.argmax(policy, axis=1)
+        best = np.argmax(q, axis=1)
+        states = np.arange(self.num_states)
+        keep = q[states, current] >= q[states, best]
+        greedy = np.where(keep, current, best)
+        return greedy, bool(keep.all())
+
+    def policy_iter(self, sweep='jacobi', max_iterations=1000):
+        """Policy iteration from the uniform policy; returns (actions, values)."""
+        policy, value = self.uniform_policy(), np.zeros(self.num_states)
+        for _ in range(max_iterations):
+            self.policy_eval(policy, value, sweep)
+            policy, converged = self.policy_improv(policy, value)
+            if converged:
+                break
+        return policy, value
+
+    def gpi(self, sweep='jacobi', max_iterations=100000):
+        """Generalized policy iteration: one evaluation sweep per improvement; returns (actions, values)."""
+        policy, value = self.uniform_policy(), np.zeros(self.num_states)
+        for _ in range(max_iterations):
+            self.policy_eval(policy, value, sweep, max_sweeps=1)
+            policy, converged = self.policy_improv(policy, value)
+            if converged:
+                break
+        return policy, value
+
+    def value_iter(self, sweep='jacobi', max_sweeps=100000):
+        """Value iteration to the tolerance, then the greedy policy; returns (actions, values)."""
+        value = self.policy_eval(None, sweep=sweep, max_sweeps=max_sweeps)
+        return np.argmax(self.q_values(value), axis=1), value
+
+    def value_grid(self, value):
+        """State values laid out on the grid, 0 on obstacles, like the notebook's value functions."""
+        grid = np.zeros(self.world_grid.shape)
+        grid.ravel()[self.states] = value
+        return grid
+
+    def policy_dict(self, actions):
+        """Deterministic policy in the notebook's {state: {action: probability}} form, for Agent.PolicyGraph."""
+        width = self.world_grid.shape[1]
+        return {(int(cell // width), int(cell % width)): {action: int(a == best) for a, action in enumerate(self.actions)}
+                for cell, best in zip(self.states, actions)}
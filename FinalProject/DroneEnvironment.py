@@ -1,40 +1,169 @@
 import gym
 import numpy as np
-import airsim
-import cv2
+try:
+    import airsim
+except ImportError:  # no simulator package installed, fall back to the in-process fake
+    import fake_airsim as airsim
 import time
-from movements import move_forward, move_45_degrees_right_up, move_45_degrees_left_up, move_45_degrees_right_down, move_45_degrees_left_down, rotate_45_degrees_right, rotate_45_degrees_left
+from observation import DEPTH_REQUEST, OBSERVATION_SHAPE, DepthObservation
+from pipeline import ActionPipeline
+from profiling import NULL_PROFILER, ProfiledClient
+from rewards import DEFAULT_WEIGHTS, compute_rewards
+from sim_clock import continue_for_time, sim_seconds
+from sim_settings import load_capture_settings, load_clock_speed
+from state_cache import CachedStateClient
+from telemetry import RESET_ACTION, TIMEOUT_ACTION
+from movements import yaw_from_pose, move_forward, move_45_degrees_right_up, move_45_degrees_left_up, move_45_degrees_right_down, move_45_degrees_left_down, rotate_45_degrees_right, rotate_45_degrees_left
+
+def compute_reward(previous_position, current_position, front_distance, target_x, weights=DEFAULT_WEIGHTS):
+    """Shaped reward and episode termination for one transition between two vehicle positions, see rewards.py."""
+    rewards, dones = compute_rewards([(previous_position.x_val, previous_position.y_val, previous_position.z_val)],
+                                     [(current_position.x_val, current_position.y_val, current_position.z_val)],
+                                     [front_distance], target_x, weights)
+    return float(rewards[0]), bool(dones[0])
+
+
+def step_info(current_position, front_distance, target_x):
+    """Per-step info dict: where the vehicle is and how the episode ended, if it did."""
+    return {'position': (current_position.x_val, current_position.y_val, current_position.z_val),
+            'is_success': bool(current_position.x_val >= target_x),
+            'collision': bool(front_distance < 0.5)}
+
+
+HOVER_SECONDS = 0.1  # simulated time of the zero-velocity command settling a teleported vehicle
+
+
+def _pose(values):
+    # (x, y, z, qx, qy, qz, qw) as saved by DroneEnv.episode_state()
+    x, y, z, qx, qy, qz, qw = values
+    return airsim.Pose(airsim.Vector3r(x, y, z), airsim.Quaternionr(qx, qy, qz, qw))
+
 
 class DroneEnv(gym.Env):
     """Custom Environment that follows gym interface."""
     metadata = {'render.modes': ['console']}
 
-    def __init__(self):
+    def __init__(self, client=None, observation_client=None, use_pipeline=True, clock_speed=None,
+                 observation_dtype=np.uint8, frame_stack=1, lowres=False, telemetry=None, profiler=None,
+                 lockstep=False, fast_reset=False, start_states=None, reward_weights=DEFAULT_WEIGHTS):
         super(DroneEnv, self).__init__()
+        # Optional profiling.StepProfiler timing each stage of step() and counting RPCs per action
+        self.profiler = profiler if profiler is not None else NULL_PROFILER
         # Define action and observation space
         self.action_space = gym.spaces.Discrete(7)  # Expanded to include new actions
-        self.observation_space = gym.spaces.Box(low=0, high=255, shape=(72, 128, 1), dtype=np.uint8)
+        # Observations are quantized depth (uint8 log-scale or float16 metres, see observation.py);
+        # observation_dtype=None keeps raw float32 metres. frame_stack > 1 stacks the last frames
+        # along the channel axis; lowres adds a 'lowres' image at the settings.json capture size.
+        lowres_shape = None
+        if lowres:
+            width, height, _ = load_capture_settings()
+            lowres_shape = (height, width, 1)
+        self.observation = DepthObservation(observation_dtype, OBSERVATION_SHAPE, frame_stack, lowres_shape,
+                                            self.profiler)
+        self.observation_space = self.observation.observation_space
 
-        self.client = airsim.MultirotorClient()
+        # Any MultirotorClientInterface works here, e.g. clients.make_client('surrogate').
+        # Pose/state queries are served from one snapshot per step, see state_cache.py.
+        raw_client = client if client is not None else airsim.MultirotorClient()
+        if profiler is not None:
+            raw_client = ProfiledClient(raw_client, profiler)
+        self.client = CachedStateClient(raw_client)
         self.client.confirmConnection()
         self.client.enableApiControl(True)
         self.client.armDisarm(True)
         self.target_x = 35
-        self.start_time = None
+        self.start_time = None  # simulated seconds at the start of the episode
         self.num_actions = 0
-        self.time_limit = 60  # seconds
+        self.time_limit = 60  # simulated seconds, the same at any clock speed
         self.action_limit = 25
+        self.reward_weights = reward_weights  # rewards.RewardWeights
         self.previous_x_val = None  # To store previous x position
+        # Optional telemetry.TelemetryWriter receiving one record per step
+        self.telemetry = telemetry
+        # Incremented as each episode starts; an appended telemetry file continues its episode ids
+        self.episode = telemetry.next_episode - 1 if telemetry is not None else -1
+        # Non-blocking actions; observation_client is an optional second connection used to
+        # fetch the next observation while the motion finishes.
+        if client is None and observation_client is None and use_pipeline:
+            observation_client = airsim.MultirotorClient()
+        if profiler is not None and observation_client is not None:
+            observation_client = raw_client if observation_client is client else ProfiledClient(observation_client, profiler)
+        # Simulated seconds per wall-clock second, only used to size wall-clock waits. With lockstep
+        # the simulator stays paused between steps and each action runs for exactly its duration.
+        self.clock_speed = clock_speed if clock_speed is not None else load_clock_speed()
+        if lockstep and not use_pipeline:
+            raise ValueError("lockstep stepping needs the action pipeline (use_pipeline=True)")
+        self.lockstep = lockstep
+        self.pipeline = ActionPipeline(self.client, observation_client, clock_speed=self.clock_speed,
+                                       profiler=self.profiler, lockstep=lockstep) if use_pipeline else None
+        # With fast_reset only the first reset takes off; later ones teleport back to the hover pose
+        # it reached, or to a pose drawn from start_states (a reset_states.ResetStatePool).
+        self.fast_reset = fast_reset or start_states is not None
+        self.start_states = start_states
+        self.hover_pose = None
+        self.start_pose = None  # where the current episode started
+        self.restart_state = None  # set by restart_episode() for the next reset
+        self.last_reset_seconds = None  # wall-clock duration of the latest reset
+
+    def sim_time(self):
+        """Simulated seconds of the current state snapshot; no RPC once the step has observed the vehicle."""
+        return sim_seconds(self.client.getMultirotorState().timestamp)
 
     def step(self, action):
-        if self.start_time is not None and (time.time() - self.start_time > self.time_limit or self.num_actions >= self.action_limit):
-            return self.reset(), -100, True, {'timeout': True}  # Resetting with a timeout or action limit reached
+        if self.start_time is not None and (self.sim_time() - self.start_time > self.time_limit or self.num_actions >= self.action_limit):
+            timeout_reward = self.reward_weights.timeout_reward
+            if self.telemetry is not None:
+                self._record_step(TIMEOUT_ACTION, timeout_reward, self.client.simGetVehiclePose(), np.nan,
+                                  time.perf_counter())
+            return self.reset(), timeout_reward, True, {'timeout': True, 'is_success': False, 'collision': False}  # Resetting with a timeout or action limit reached
         self.num_actions += 1
+        step_start = time.perf_counter()
+        profiler = self.profiler
+        profiler.action = int(action)
 
         # Store previous position for movement calculation
-        previous_position = self.client.simGetVehiclePose().position
+        with profiler.phase('pose'):
+            previous_pose = self.client.simGetVehiclePose()
+        previous_position = previous_pose.position
+
+        if self.pipeline is not None:
+            # Non-blocking action with the next observation fetched as the motion ends
+            with profiler.phase('issue'):
+                pending = self.pipeline.step_async(action, previous_pose)
+            responses, state = pending.join()  # timed as 'motion' and 'observation'
+            # Observed on this client (the cache) unless the pipeline has its own connection
+            self.client.store(state, fetched=self.pipeline.observation_client is not None)
+            depth_image, observation = self.observation(responses)
+            current_position = state.kinematics_estimated.position
+        else:
+            with profiler.phase('motion'):
+                self.take_action(action)
+            # Get the new depth image
+            depth_image, observation = self.get_depth_image()
+            # Get current position to check altitude and lateral movements
+            with profiler.phase('pose'):
+                current_position = self.client.simGetVehiclePose().position
+
+        with profiler.phase('reward'):
+            front_distance = np.min(depth_image) if depth_image is not None else float('inf')
+            reward, done = compute_reward(previous_position, current_position, front_distance, self.target_x,
+                                          self.reward_weights)
+        if self.telemetry is not None:
+            with profiler.phase('telemetry'):
+                # The pose is served from the step's state snapshot, no extra RPC
+                self._record_step(int(action), reward, self.client.simGetVehiclePose(), front_distance, step_start)
 
-        # Action handling
+        profiler.record('step', time.perf_counter() - step_start)
+        return observation, reward, done, step_info(current_position, front_distance, self.target_x)
+
+    def _record_step(self, action, reward, pose, front_distance, step_start):
+        """Stream one telemetry record; see telemetry.py for the timeout and reset markers."""
+        position = pose.position
+        self.telemetry.record(self.episode, 0, self.num_actions, action, reward, position.x_val, position.y_val,
+                              position.z_val, yaw_from_pose(pose), front_distance, time.perf_counter() - step_start)
+
+    def take_action(self, action):
+        """Run one discrete action with the blocking movement primitives."""
         if action == 0:
             move_forward(self.client, 1, 2.5)  # Move forward
         elif action == 1:
@@ -50,73 +179,87 @@ class DroneEnv(gym.Env):
         elif action == 6:
             rotate_45_degrees_left(self.client, 1)  # Rotate 45 degrees to the left
 
-        # Get the new depth image and check distances
-        depth_image = self.get_depth_image()
-        front_distance = np.min(depth_image) if depth_image is not None else float('inf')
-
-        # Get current position to check altitude and lateral movements
-        current_position = self.client.simGetVehiclePose().position
-        self.positions.append((current_position.x_val, current_position.y_val, current_position.z_val))
+    def get_depth_image(self, reset=False):
+        """Retrieve the depth image from the drone's sensor; returns (depth in metres, observation).
 
-        # Calculate x and z changes
-        x_change = current_position.x_val - previous_position.x_val
-        z_change = current_position.z_val - previous_position.z_val
-
-        # Conditions for completing the episode
-        done = bool(front_distance < 0.5 or current_position.x_val >= self.target_x)
-
-        # Check if the drone has strayed too far sideways
-        if abs(current_position.z_val) > 10:
-            reward = -25  # Heavy penalty for straying too far laterally
-            done = True
-        else:
-            # Default step cost
-            reward = -1
-            # Adjust reward based on vertical movement
-            if z_change > 0:
-                reward += 5 * z_change  # Reward for ascending
-            if z_change < 0:
-                reward -= 3 * abs(z_change)  # Penalty for descending
-
-            # Encourage forward movement and penalize backward movement
-            if x_change > 0:
-                reward += 7 * x_change  # Amplified reward for moving forward
-            if x_change < 0:
-                reward += x_change  # Negative reward for moving away from the goal
-
-            if front_distance < 1.0:
-                reward -= (1.0 / front_distance) * 5  # Scale the penalty by distance
-            if front_distance < 0.5:
-                reward = -5  # Large penalty for near collision
-            elif current_position.x_val >= self.target_x:
-                reward = 100  # Large reward for reaching the goal
-
-        return np.array(depth_image), reward, done, {}
-
-
-    def get_depth_image(self):
-        """Retrieve and process depth image from the drone's sensor."""
-        responses = self.client.simGetImages([airsim.ImageRequest("0", airsim.ImageType.DepthPlanar, pixels_as_float=True)])
-        if responses:
-            response = responses[0]
-            img_data = np.array(response.image_data_float, dtype=np.float32)
-            depth_image = cv2.resize(img_data, (128, 72))
-            depth_image = np.expand_dims(depth_image, axis=-1)
-        return depth_image
+        Both are views into preallocated buffer rings, reused a few steps later.
+        """
+        with self.profiler.phase('images'):
+            responses = self.client.simGetImages(DEPTH_REQUEST)
+        return self.observation(responses, reset)
 
     def reset(self):
-        self.start_time = time.time()
+        reset_start = time.perf_counter()
+        self.profiler.action = 'reset'
         self.num_actions = 0
         self.previous_x_val = None  # Reset previous x position
-        self.client.reset()
-        self.client.enableApiControl(True)
-        self.client.armDisarm(True)
-        self.client.takeoffAsync().join()
-        self.client.moveToZAsync(-5, 1).join()
-        self.positions = []  # Clear the position log
-        return self.get_depth_image()
-        
+        restart, self.restart_state = self.restart_state, None
+        start_pose = None
+        if restart is not None:
+            start_pose = _pose(restart['start'])
+            self.episode = restart['episode'] - 1
+            if 'start_states_rng' in restart:
+                self.start_states.rng.bit_generator.state = restart['start_states_rng']
+        elif self.fast_reset and self.hover_pose is not None:
+            start_pose = self.start_states.sample() if self.start_states is not None else self.hover_pose
+        if start_pose is not None and self.hover_pose is not None:
+            self.teleport(start_pose)
+        else:
+            if self.lockstep:
+                self.client.simPause(False)  # the take-off is joined in real time
+            self.client.reset()
+            self.client.enableApiControl(True)
+            self.client.armDisarm(True)
+            self.client.takeoffAsync().join()
+            self.client.moveToZAsync(-5, 1).join()
+            if self.lockstep:
+                self.client.simPause(True)
+            self.hover_pose = self.client.simGetVehiclePose()
+            if start_pose is not None:
+                self.teleport(start_pose)
+        self.start_time = self.sim_time()
+        self.episode += 1
+        depth_image, observation = self.get_depth_image(reset=True)
+        self.start_pose = self.client.simGetVehiclePose()
+        if self.telemetry is not None and restart is None:
+            # The start pose, so offline relabelling can score the first step (a restarted
+            # episode's reset record is already in the log)
+            self._record_step(RESET_ACTION, 0.0, self.start_pose, np.min(depth_image), reset_start)
+        self.last_reset_seconds = time.perf_counter() - reset_start
+        self.profiler.record('reset', self.last_reset_seconds)
+        return observation
+
+    def episode_state(self):
+        """Counter and start pose of the current episode (and the start-state sampler), see checkpoint.py."""
+        position, orientation = self.start_pose.position, self.start_pose.orientation
+        state = {'episode': self.episode,
+                 'start': [position.x_val, position.y_val, position.z_val,
+                           orientation.x_val, orientation.y_val, orientation.z_val, orientation.w_val]}
+        if self.start_states is not None:
+            state['start_states_rng'] = self.start_states.rng.bit_generator.state
+        return state
+
+    def restart_episode(self, state):
+        """Make the next reset() start the episode saved by episode_state() over: same counter, start pose
+        and first observation, taking off first if this env has not flown yet."""
+        self.restart_state = state
+
+    def teleport(self, pose):
+        """Place the vehicle at pose, hovering at rest, without a simulator reset or take-off."""
+        self.client.simSetVehiclePose(pose, True)
+        # A zero-velocity command at the pose's altitude stops any motion left over from the last episode;
+        # it is joined so the episode's first observation sees the vehicle at rest
+        hover = self.client.moveByVelocityZAsync(0, 0, pose.position.z_val, HOVER_SECONDS)
+        if self.lockstep:
+            continue_for_time(self.client, HOVER_SECONDS, self.clock_speed).join()
+        hover.join()
 
     def close(self):
+        if self.pipeline is not None:
+            self.pipeline.close()
+        if self.lockstep:
+            self.client.simPause(False)
+        if self.telemetry is not None:
+            self.telemetry.flush()
         self.client.armDisarm(False)
         self.client.enableApiControl(False)
@@ -0,0 +1,282 @@
+import time
+
+import gym
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv
+
+from DroneEnvironment import HOVER_SECONDS, airsim, step_info
+from movements import ACTIONS, move_along_yaw_async, rotate_to_yaw_async, yaw_from_pose
+from observation import DEPTH_REQUEST, OBSERVATION_SHAPE, DepthDecoder, DepthQuantizer, FrameStack, stacked_space
+from rewards import DEFAULT_WEIGHTS, compute_rewards
+from sim_clock import sim_seconds
+from telemetry import RESET_ACTION, TIMEOUT_ACTION
+
+
+class DroneVecEnv(VecEnv):
+    """Vectorized DroneEnv driving N named vehicles through a single AirSim client.
+
+    Each step issues the movement commands of every vehicle before joining any of them,
+    then gathers all depth images and poses in one round, so the wall-clock cost of a
+    step stays close to that of a single vehicle. Vehicles are reset independently
+    when their episode ends, following the SB3 auto-reset convention. With `fast_reset` a
+    finished vehicle is teleported straight back to the hover pose it reached on the first
+    reset instead of to the ground and climbing again. With `frame_stack` k each vehicle's
+    observation stacks its last k frames along the channel axis, starting an episode with its
+    first frame repeated, exactly like DroneEnv(frame_stack=k) and replay.FrameReplayBuffer.
+    """
+
+    def __init__(self, vehicle_names, client=None, observation_dtype=np.uint8, telemetry=None, fast_reset=False,
+                 reward_weights=DEFAULT_WEIGHTS, frame_stack=1):
+        self.vehicle_names = list(vehicle_names)
+        self.render_mode = None
+        self.decoder = DepthDecoder(OBSERVATION_SHAPE)
+        if observation_dtype is not None:
+            self.quantizer = DepthQuantizer(observation_dtype, OBSERVATION_SHAPE)
+            observation_space = self.quantizer.observation_space
+        else:
+            self.quantizer = None
+            observation_space = gym.spaces.Box(low=0, high=np.inf, shape=OBSERVATION_SHAPE, dtype=np.float32)
+        self.frame_space = observation_space  # one frame per vehicle
+        self.stacks = [FrameStack(OBSERVATION_SHAPE, observation_space.dtype, frame_stack)
+                       for _ in self.vehicle_names] if frame_stack > 1 else None
+        observation_space = stacked_space(observation_space, frame_stack)
+        action_space = gym.spaces.Discrete(len(ACTIONS))
+        super(DroneVecEnv, self).__init__(len(self.vehicle_names), observation_space, action_space)
+
+        self.client = client if client is not None else airsim.MultirotorClient()
+        self.client.confirmConnection()
+        for name in self.vehicle_names:
+            self.client.enableApiControl(True, vehicle_name=name)
+            self.client.armDisarm(True, vehicle_name=name)
+        self.target_x = 35
+        self.time_limit = 60  # simulated seconds
+        self.action_limit = 25
+        self.reward_weights = reward_weights  # rewards.RewardWeights
+        self.start_times = [None] * self.num_envs
+        self._sim_times = np.zeros(self.num_envs)  # simulated seconds of each vehicle's latest image
+        self.num_actions = [0] * self.num_envs
+        self.telemetry = telemetry  # optional telemetry.TelemetryWriter, one record per vehicle step
+        self.episodes = [-1] * self.num_envs
+        self._next_episode = telemetry.next_episode if telemetry is not None else 0
+        self.home_poses = [None] * self.num_envs
+        self.fast_reset = fast_reset
+        self.hover_poses = None
+        self._poses = [None] * self.num_envs
+        self._depth = np.zeros((self.num_envs,) + OBSERVATION_SHAPE, dtype=np.float32)  # latest images in metres
+        self._actions = None
+
+    def reset(self):
+        self.client.reset()
+        for name in self.vehicle_names:
+            self.client.enableApiControl(True, vehicle_name=name)
+            self.client.armDisarm(True, vehicle_name=name)
+        self.home_poses = [self.client.simGetVehiclePose(vehicle_name=name) for name in self.vehicle_names]
+        self._wait_all([self.client.takeoffAsync(vehicle_name=name) for name in self.vehicle_names])
+        frames = self._frames()
+        self._reset_indices(range(self.num_envs), frames)
+        if self.fast_reset:
+            self.hover_poses = list(self._poses)
+        return self._stack(frames, range(self.num_envs), reset=True)
+
+    def _frames(self):
+        return np.zeros((self.num_envs,) + self.frame_space.shape, dtype=self.frame_space.dtype)
+
+    def _stack(self, frames, indices, reset, observations=None):
+        """Observations of the given vehicles' new frames, stacked onto their previous ones (or
+        repeated, on reset) when frame_stack > 1; written into `observations` if given."""
+        if self.stacks is None:
+            return frames
+        if observations is None:
+            observations = np.zeros((self.num_envs,) + self.observation_space.shape, dtype=self.observation_space.dtype)
+        for i in indices:
+            observations[i] = np.asarray(self.stacks[i].append(frames[i], reset))
+        return observations
+
+    def _reset_indices(self, indices, frames, climb=True):
+        """Bring the given vehicles to their hover start state, writing their first frames in place."""
+        reset_start = time.perf_counter()
+        if climb:
+            self._wait_all([self.client.moveToZAsync(-5, 1, vehicle_name=self.vehicle_names[i]) for i in indices])
+        self._observe(indices, frames, self._poses)
+        for i in indices:
+            self.start_times[i] = self._sim_times[i]
+            self.num_actions[i] = 0
+            self.episodes[i] = self._next_episode
+            self._next_episode += 1
+            self._record_step(i, RESET_ACTION, 0.0, self._poses[i], np.min(self._depth[i]), reset_start)
+
+    def step_async(self, actions):
+        self._actions = np.asarray(actions).reshape(self.num_envs)
+
+    def step_wait(self):
+        step_start = time.perf_counter()
+        # Episode time is read from the images' simulator timestamps, not the wall clock
+        timed_out = [self.start_times[i] is not None and (self._sim_times[i] - self.start_times[i] > self.time_limit
+                                                          or self.num_actions[i] >= self.action_limit)
+                     for i in range(self.num_envs)]
+        active = [i for i in range(self.num_envs) if not timed_out[i]]
+        for i in active:
+            self.num_actions[i] += 1
+
+        previous_poses = list(self._poses)
+        self._issue_actions(active, previous_poses)
+        frames = self._frames()
+        self._observe(range(self.num_envs), frames, self._poses)
+        observations = self._stack(frames, range(self.num_envs), reset=False)
+        poses = self._poses
+
+        # Rewards of the whole batch in one call; timed-out vehicles are overridden below
+        front_distances = self._depth.min(axis=(1, 2, 3))
+        batch_rewards, dones = compute_rewards(self._positions(previous_poses), self._positions(poses),
+                                               front_distances, self.target_x, self.reward_weights)
+        rewards = batch_rewards.astype(np.float32)
+        infos = [{} for _ in range(self.num_envs)]
+        for i in range(self.num_envs):
+            if timed_out[i]:
+                rewards[i], dones[i] = self.reward_weights.timeout_reward, True
+                infos[i] = dict(step_info(poses[i].position, np.inf, self.target_x), timeout=True, is_success=False)
+                self._record_step(i, TIMEOUT_ACTION, rewards[i], poses[i], np.nan, step_start)
+                continue
+            infos[i] = step_info(poses[i].position, front_distances[i], self.target_x)
+            self._record_step(i, int(self._actions[i]), rewards[i], poses[i], front_distances[i], step_start)
+
+        finished = [i for i in range(self.num_envs) if dones[i]]
+        if finished:
+            for i in finished:
+                infos[i]['terminal_observation'] = observations[i].copy()
+            observations = self._restart(finished, frames, observations)
+        return observations, rewards, dones, infos
+
+    def _restart(self, indices, frames, observations=None):
+        """Start new episodes for the given vehicles after the first reset, teleporting them back to their
+        hover (fast_reset) or home pose; returns observations with theirs replaced by the first ones."""
+        if self.hover_poses is not None:
+            self._teleport_hover(indices)
+            self._reset_indices(indices, frames, climb=False)
+        else:
+            self._teleport_home(indices)
+            self._reset_indices(indices, frames)
+        return self._stack(frames, indices, reset=True, observations=observations)
+
+    def reset_vehicles(self, indices):
+        """Start new episodes for the given vehicles only; returns their first observations."""
+        indices = list(indices)
+        if self.home_poses[0] is None:
+            observations = self.reset()  # nothing has flown yet: every vehicle takes off
+        else:
+            observations = self._restart(indices, self._frames())
+        return [observations[i] for i in indices]
+
+    @staticmethod
+    def _positions(poses):
+        return np.array([(pose.position.x_val, pose.position.y_val, pose.position.z_val) for pose in poses])
+
+    def _record_step(self, i, action, reward, pose, front_distance, step_start):
+        # One telemetry record per vehicle step, plus the timeout and reset markers of telemetry.py
+        if self.telemetry is None:
+            return
+        position = pose.position
+        self.telemetry.record(self.episodes[i], i, self.num_actions[i], action, reward, position.x_val,
+                              position.y_val, position.z_val, yaw_from_pose(pose), front_distance,
+                              time.perf_counter() - step_start)
+
+    def _issue_actions(self, indices, poses):
+        """Send every vehicle's primitive: all rotations first, then all translations."""
+        target_yaws = {}
+        rotations = []
+        for i in indices:
+            yaw_change, duration, speed, z_change = ACTIONS[int(self._actions[i])]
+            current_yaw = yaw_from_pose(poses[i])
+            target_yaws[i] = current_yaw + yaw_change
+            if yaw_change:
+                rotations.append(rotate_to_yaw_async(self.client, target_yaws[i], duration,
+                                                     vehicle_name=self.vehicle_names[i]))
+        self._wait_all(rotations)
+
+        translations = []
+        for i in indices:
+            yaw_change, duration, speed, z_change = ACTIONS[int(self._actions[i])]
+            if speed is None:
+                continue
+            z = poses[i].position.z_val + z_change
+            translations.append(move_along_yaw_async(self.client, target_yaws[i], duration, speed, z,
+                                                     vehicle_name=self.vehicle_names[i]))
+        self._wait_all(translations)
+
+    def _teleport_home(self, indices):
+        for i in indices:
+            self.client.simSetVehiclePose(self.home_poses[i], True, vehicle_name=self.vehicle_names[i])
+
+    def _teleport_hover(self, indices):
+        hovers = []
+        for i in indices:
+            name, pose = self.vehicle_names[i], self.hover_poses[i]
+            self.client.simSetVehiclePose(pose, True, vehicle_name=name)
+            hovers.append(self.client.moveByVelocityZAsync(0, 0, pose.position.z_val, HOVER_SECONDS,
+                                                           vehicle_name=name))
+        # Settled before the first observation of the new episodes
+        self._wait_all(hovers)
+
+    def _observe(self, indices, observations, poses):
+        """Gather depth images and poses for the given vehicles in one round, filling both in place."""
+        for i in indices:
+            name = self.vehicle_names[i]
+            responses = self.client.simGetImages(DEPTH_REQUEST, vehicle_name=name)
+            poses[i] = self.client.simGetVehiclePose(vehicle_name=name)
+            if responses:
+                self.decoder.decode_into(responses[0], self._depth[i, :, :, 0])
+                self._sim_times[i] = sim_seconds(responses[0].time_stamp)
+            if self.quantizer is not None:
+                self.quantizer.quantize_into(self._depth[i], observations[i])
+            else:
+                observations[i] = self._depth[i]
+
+    @staticmethod
+    def _wait_all(futures):
+        for future in futures:
+            future.join()
+
+    def close(self):
+        if self.telemetry is not None:
+            self.telemetry.flush()
+        for name in self.vehicle_names:
+            self.client.armDisarm(False, vehicle_name=name)
+            self.client.enableApiControl(False, vehicle_name=name)
+
+    def seed(self, seed=None):
+        return [None] * self.num_envs
+
+    def _per_vehicle(self, value):
+        # Attributes holding one entry per vehicle (vehicle_names, episodes, num_actions, ...)
+        return isinstance(value, list) and len(value) == self.num_envs
+
+    def get_attr(self, attr_name, indices=None):
+        value = getattr(self, attr_name)
+        indices = self._get_indices(indices)
+        return [value[i] for i in indices] if self._per_vehicle(value) else [value] * len(indices)
+
+    def set_attr(self, attr_name, value, indices=None):
+        indices = list(self._get_indices(indices))
+        current = getattr(self, attr_name, None)
+        if self._per_vehicle(current):
+            for i in indices:
+                current[i] = value
+        elif set(indices) == set(range(self.num_envs)):
+            setattr(self, attr_name, value)
+        else:
+            raise NotImplementedError(f"{attr_name} is shared by all vehicles of a DroneVecEnv, not set per vehicle")
+
+    # Methods run for the selected vehicles only; any other method acts on the whole VecEnv, once
+    VEHICLE_METHODS = {'reset': 'reset_vehicles'}
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        indices = list(self._get_indices(indices))
+        if method_name in self.VEHICLE_METHODS:
+            return getattr(self, self.VEHICLE_METHODS[method_name])(indices, *method_args, **method_kwargs)
+        if set(indices) != set(range(self.num_envs)):
+            raise NotImplementedError(f"{method_name} acts on all vehicles of a DroneVecEnv at once, not on some")
+        return [getattr(self, method_name)(*method_args, **method_kwargs)] * len(indices)
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False] * len(self._get_indices(indices))
+
@@ -0,0 +1,66 @@
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+import fake_airsim
+from observation import OBSERVATION_SHAPE, DepthDecoder
+
+# Compares the per-observation cost of decoding a DepthPlanar response:
+#   legacy - np.array of the float list, reshape, cv2.resize, expand_dims (the old DroneEnv path)
+#   list   - DepthDecoder on AirSim's float-list response
+#   bytes  - DepthDecoder on a raw float32 byte response (the in-process backends)
+
+
+def legacy_decode(response):
+    img_data = np.array(response.image_data_float, dtype=np.float32)
+    img_data = img_data.reshape(response.height, response.width)
+    return np.expand_dims(cv2.resize(img_data, (OBSERVATION_SHAPE[1], OBSERVATION_SHAPE[0])), axis=-1)
+
+
+def make_responses(width, height, seed=0):
+    depth = np.random.default_rng(seed).uniform(1, 100, width * height).astype(np.float32)
+    image_type = fake_airsim.ImageType.DepthPlanar
+    as_list = fake_airsim.ImageResponse(depth.tolist(), width, height, image_type, 0)
+    as_bytes = fake_airsim.ImageResponse([], width, height, image_type, 0, depth.tobytes())
+    return as_list, as_bytes
+
+
+def measure(decode, response, frames):
+    decode(response)  # warm up scratch buffers
+    tracemalloc.start()
+    start_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for _ in range(frames):
+        decode(response)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        decode(response)
+    elapsed = time.perf_counter() - start
+    return elapsed / frames * 1e6, (peak - start_bytes) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark depth image decoding into observations.")
+    parser.add_argument('--frames', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'capture':<12}{'path':<8}{'us/frame':>10}{'peak KiB':>10}")
+    for width, height in [(128, 72), (256, 144), (640, 360)]:
+        as_list, as_bytes = make_responses(width, height)
+        decoder = DepthDecoder(OBSERVATION_SHAPE)
+        expected = legacy_decode(as_list)
+        assert np.allclose(decoder.decode(as_list), expected) and np.allclose(decoder.decode(as_bytes), expected)
+        for name, decode, response in [('legacy', legacy_decode, as_list), ('list', decoder.decode, as_list),
+                                       ('bytes', decoder.decode, as_bytes)]:
+            micros, peak = measure(decode, response, args.frames)
+            print(f"{f'{width}x{height}':<12}{name:<8}{micros:>10.1f}{peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import time
+
+from DroneEnvironment import DroneEnv
+from DroneVecEnvironment import DroneVecEnv
+from evaluation import evaluate
+from parallel_training import make_policy
+from surrogate import SurrogateClient
+
+# Wall time to evaluate an untrained CnnPolicy on the surrogate with motions taking real time
+# (--clock-speed simulated seconds per second):
+#   serial  - the old main.py loop: one DroneEnv, one predict and one extra pose query per step
+#   batched - evaluation.evaluate on a DroneVecEnv flying K vehicles at once
+
+
+def serial_evaluation(policy, num_episodes, clock_speed):
+    env = DroneEnv(client=SurrogateClient(clock_speed=clock_speed), use_pipeline=False, clock_speed=clock_speed)
+    rewards, trajectories = [], []
+    for _ in range(num_episodes):
+        obs = env.reset()
+        done, total_reward, positions = False, 0, []
+        while not done:
+            action, _ = policy.predict(obs, deterministic=True)
+            obs, reward, done, info = env.step(action)
+            total_reward += reward
+            pose = env.client.simGetVehiclePose().position
+            positions.append((pose.x_val, pose.y_val, pose.z_val))
+        rewards.append(total_reward)
+        trajectories.append(positions)
+    env.close()
+    return rewards
+
+
+def batched_evaluation(policy, num_episodes, num_envs, clock_speed):
+    names = [f'Drone{i + 1}' for i in range(num_envs)]
+    venv = DroneVecEnv(names, client=SurrogateClient(vehicle_names=names, clock_speed=clock_speed))
+    results = evaluate(policy, venv, num_episodes)
+    venv.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark serial versus batched policy evaluation.")
+    parser.add_argument('--episodes', type=int, default=20)
+    parser.add_argument('--clock-speed', type=float, default=20.0)
+    parser.add_argument('--envs', type=int, nargs='+', default=[1, 2, 5, 10])
+    args = parser.parse_args()
+
+    probe = DroneEnv(client=SurrogateClient(), use_pipeline=False)
+    policy = make_policy(probe.observation_space, probe.action_space)
+
+    start = time.perf_counter()
+    serial_evaluation(policy, args.episodes, args.clock_speed)
+    serial = time.perf_counter() - start
+    print(f"{'mode':<12}{'seconds':>9}{'speedup':>9}")
+    print(f"{'serial':<12}{serial:>9.2f}{1.0:>8.2f}x")
+    for num_envs in args.envs:
+        start = time.perf_counter()
+        results = batched_evaluation(policy, args.episodes, num_envs, args.clock_speed)
+        elapsed = time.perf_counter() - start
+        print(f"{f'batched x{num_envs}':<12}{elapsed:>9.2f}{serial / elapsed:>8.2f}x   {results.summary()}")
+
+
+if __name__ == "__main__":
+    main()
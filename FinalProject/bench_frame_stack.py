@@ -0,0 +1,69 @@
+import argparse
+import time
+import tracemalloc
+
+import gymnasium
+import numpy as np
+
+from DroneEnvironment import DroneEnv
+from replay import FrameReplayBuffer, gymnasium_space
+from surrogate import SurrogateClient
+
+# Compares DroneEnv observation modes on the surrogate backend:
+#   step ms      - wall time per env.step
+#   alloc KiB    - memory allocated per step by the observation path (tracemalloc peak)
+#   replay KiB   - FrameReplayBuffer memory per transition, against storing obs + next_obs
+#                  stacks outright as SB3's default ReplayBuffer does
+
+MODES = {
+    'single': dict(),
+    'stack4': dict(frame_stack=4),
+    'stack4+lowres': dict(frame_stack=4, lowres=True),
+}
+
+
+def measure(steps, buffer_size, **kwargs):
+    env = DroneEnv(client=SurrogateClient(), **kwargs)
+    buffer = FrameReplayBuffer(buffer_size, gymnasium_space(env.observation_space),
+                               gymnasium.spaces.Discrete(env.action_space.n), frame_stack=kwargs.get('frame_stack', 1))
+    rng = np.random.default_rng(0)
+    obs = env.reset()
+    durations, peaks = [], []
+    for _ in range(steps):
+        action = rng.integers(env.action_space.n)
+        tracemalloc.start()
+        start = time.perf_counter()
+        next_obs, reward, done, info = env.step(action)
+        durations.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        buffer.add(as_batch(obs), as_batch(next_obs), np.array([action]), np.array([reward]),
+                   np.array([done]), [info])
+        obs = env.reset() if done else next_obs
+    env.close()
+
+    spaces = getattr(env.observation_space, 'spaces', {None: env.observation_space})
+    stacked = 2 * sum(int(np.prod(space.shape)) * space.dtype.itemsize for space in spaces.values())
+    return np.mean(durations) * 1e3, np.median(peaks) / 1024, buffer.nbytes() / buffer.buffer_size / 1024, \
+        stacked / 1024
+
+
+def as_batch(obs):
+    if isinstance(obs, dict):
+        return {key: np.asarray(value)[None] for key, value in obs.items()}
+    return np.asarray(obs)[None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark frame-stacked and multi-resolution observations.")
+    parser.add_argument('--steps', type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"{'mode':<16}{'step ms':>9}{'alloc KiB':>11}{'replay KiB':>12}{'stacked KiB':>13}")
+    for name, kwargs in MODES.items():
+        step_ms, alloc, replay, stacked = measure(args.steps, args.steps, **kwargs)
+        print(f"{name:<16}{step_ms:>9.3f}{alloc:>11.1f}{replay:>12.1f}{stacked:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from DroneEnvironment import DroneEnv
+from motion_table import MotionTable
+from movements import action_async, yaw_from_pose
+from surrogate import BlocksWorld, SurrogateClient
+from telemetry import TelemetryWriter, load_telemetry
+
+try:
+    import airsim
+except ImportError:  # no simulator package installed, fall back to the in-process fake
+    import fake_airsim as airsim
+
+# MotionTable accuracy and throughput.
+#
+# accuracy: position error of predict_next_pose against the surrogate, one step at a time and
+#   open loop over whole random action sequences, for the nominal table (ACTIONS as commanded),
+#   a table probed on the surrogate and one fitted to telemetry of random DroneEnv flights.
+# throughput: poses advanced per second by predict_next_pose and rollout for batches of N poses.
+
+
+def pose_array(pose):
+    return np.array([pose.position.x_val, pose.position.y_val, pose.position.z_val, yaw_from_pose(pose)])
+
+
+def fly(client, start, actions):
+    """Poses (steps + 1, 4) of the surrogate vehicle flying actions from start."""
+    client.simSetVehiclePose(airsim.Pose(airsim.Vector3r(*start[:3]), airsim.to_quaternion(0, 0, np.radians(start[3]))),
+                             True)
+    poses = [pose_array(client.simGetVehiclePose())]
+    for action in actions:
+        future, _ = action_async(client, int(action), poses[-1][3], poses[-1][2], chain_rotation=False)
+        future.join()
+        poses.append(pose_array(client.simGetVehiclePose()))
+    return np.array(poses)
+
+
+def fitted_table(steps, seed):
+    """Table fitted to telemetry of `steps` random DroneEnv steps in the default Blocks world."""
+    path = os.path.join(tempfile.mkdtemp(), 'telemetry.npy')
+    with TelemetryWriter(path) as telemetry:
+        env = DroneEnv(client=SurrogateClient(), use_pipeline=False, clock_speed=1e6, telemetry=telemetry)
+        env.reset()
+        for action in np.random.default_rng(seed).integers(0, 7, steps):
+            if env.step(action)[2]:
+                env.reset()
+        env.close()
+    return MotionTable.fit(load_telemetry(path))
+
+
+def accuracy(tables, flights, steps, seed=0):
+    client = SurrogateClient(world=BlocksWorld([], []))
+    client.enableApiControl(True)
+    rng = np.random.default_rng(seed)
+    starts = np.column_stack([np.zeros((flights, 2)), rng.uniform(-20, -1, flights), rng.integers(0, 8, flights) * 45.0])
+    actions = rng.integers(0, 7, (flights, steps))
+    flown = np.array([fly(client, start, sequence) for start, sequence in zip(starts, actions)])  # (flights, steps + 1, 4)
+    results = {}
+    for name, table in tables.items():
+        one_step, _ = table.predict_next_pose(flown[:, :-1].reshape(-1, 4), actions.reshape(-1))
+        one_step_error = np.linalg.norm(one_step[:, :3] - flown[:, 1:].reshape(-1, 4)[:, :3], axis=1)
+        trajectories, _ = table.rollout(flown[:, 0], actions)
+        final_error = np.linalg.norm(trajectories[-1, :, :3] - flown[:, -1, :3], axis=1)
+        results[name] = (one_step_error.mean(), one_step_error.max(), final_error.mean(), final_error.max())
+    return results
+
+
+def throughput(table, batch_size, steps, repeats=20, seed=0):
+    rng = np.random.default_rng(seed)
+    poses = np.column_stack([rng.uniform(-5, 5, (batch_size, 2)), rng.uniform(-20, -1, batch_size),
+                             rng.uniform(-180, 180, batch_size)])
+    actions = rng.integers(0, 7, (batch_size, steps))
+    table.predict_next_pose(poses, actions[:, 0])
+    start = time.perf_counter()
+    for _ in range(repeats):
+        table.predict_next_pose(poses, actions[:, 0])
+    step_seconds = (time.perf_counter() - start) / repeats
+    start = time.perf_counter()
+    for _ in range(max(1, repeats // steps)):
+        table.rollout(poses, actions)
+    rollout_seconds = (time.perf_counter() - start) / max(1, repeats // steps)
+    return batch_size / step_seconds, rollout_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MotionTable accuracy and throughput.")
+    parser.add_argument('--flights', type=int, default=200, help="random flights compared against the surrogate")
+    parser.add_argument('--steps', type=int, default=25, help="actions per flight and rollout")
+    parser.add_argument('--fit-steps', type=int, default=5000, help="random DroneEnv steps logged for the fit")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 100, 1000, 10000])
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    probed = MotionTable.probe(SurrogateClient(world=BlocksWorld([], [])))
+    print(f"probed {probed.counts.sum()} cells in {time.perf_counter() - start:.2f} s")
+    tables = {'nominal': MotionTable.nominal(), 'probed': probed, 'fitted': fitted_table(args.fit_steps, 1)}
+
+    print(f"\nposition error (m) over {args.flights} flights of {args.steps} actions")
+    print(f"{'table':<10}{'1-step mean':>13}{'1-step max':>12}{'open-loop mean':>16}{'open-loop max':>15}")
+    for name, (step_mean, step_max, final_mean, final_max) in accuracy(tables, args.flights, args.steps).items():
+        print(f"{name:<10}{step_mean:>13.3f}{step_max:>12.3f}{final_mean:>16.3f}{final_max:>15.3f}")
+
+    print(f"\n{'poses':>8}{'poses/s':>14}{f'{args.steps}-step rollout ms':>22}{'rollouts/ms':>13}")
+    for batch_size in args.batch_sizes:
+        rate, rollout_seconds = throughput(probed, batch_size, args.steps)
+        print(f"{batch_size:>8}{rate:>14,.0f}{rollout_seconds * 1e3:>22.2f}{batch_size / (rollout_seconds * 1e3):>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
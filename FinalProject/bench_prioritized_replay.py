@@ -0,0 +1,105 @@
+import argparse
+import time
+
+import numpy as np
+from stable_baselines3 import DQN
+
+from DroneEnvironment import DroneEnv
+from DroneVecEnvironment import DroneVecEnv
+from evaluation import evaluate
+from prioritized_replay import PrioritizedDQN, PrioritizedFrameReplayBuffer, SumTree
+from replay import FrameReplayBuffer
+from surrogate import SurrogateClient
+
+# Prioritized replay benchmarks.
+#
+# throughput: sum-tree sampling (stratified prefix-sum descent) and priority updates per second
+#   at capacities 1e5-1e6, against np.random.choice over the normalized priorities, which costs
+#   O(N) per batch.
+# efficiency: DQN with uniform replay versus PrioritizedDQN, with 1-step and n-step returns,
+#   trained for the same number of steps on the surrogate DroneEnv. Reports the share of stored
+#   transitions that end an episode (goal, collision or altitude), the probability that a draw
+#   replays one of them, and the greedy policy's evaluation on the surrogate DroneVecEnv.
+
+
+def throughput(capacity, batch_size, repeats, seed=0):
+    rng = np.random.default_rng(seed)
+    tree = SumTree(capacity)
+    priorities = rng.random(capacity) ** 3
+    tree.update(np.arange(capacity), priorities)
+    np.random.seed(seed)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        indices = tree.find((np.arange(batch_size) + np.random.random_sample(batch_size)) * (tree.total / batch_size))
+    sample_rate = repeats * batch_size / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        tree.update(indices, np.random.random_sample(batch_size))
+    update_rate = repeats * batch_size / (time.perf_counter() - start)
+
+    naive_repeats = max(1, repeats // 20)
+    start = time.perf_counter()
+    for _ in range(naive_repeats):
+        rng.choice(capacity, batch_size, p=tree.leaves / tree.leaves.sum())
+    naive_rate = naive_repeats * batch_size / (time.perf_counter() - start)
+    return sample_rate, update_rate, naive_rate
+
+
+def terminal_share(buffer):
+    """(share of stored transitions ending an episode, probability that one draw replays one of them)."""
+    count = buffer.buffer_size if buffer.full else buffer.pos
+    terminal = buffer.dones[:count].reshape(-1) > 0
+    stored = float(terminal.mean())
+    if not isinstance(buffer, PrioritizedFrameReplayBuffer):
+        return stored, stored
+    leaves = buffer.tree.leaves[:count * buffer.n_envs]
+    return stored, float(leaves[terminal].sum() / leaves.sum())
+
+
+def train(algorithm, buffer_class, n_steps, steps, seed):
+    env = DroneEnv(client=SurrogateClient(), use_pipeline=False, clock_speed=1e6, fast_reset=True)
+    model = algorithm("CnnPolicy", env, buffer_size=10000, learning_starts=500, seed=seed, verbose=0,
+                      replay_buffer_class=buffer_class, replay_buffer_kwargs=dict(n_steps=n_steps))
+    start = time.perf_counter()
+    model.learn(total_timesteps=steps)
+    seconds = time.perf_counter() - start
+    stored, replayed = terminal_share(model.replay_buffer)
+    results = evaluate(model, DroneVecEnv([''], client=SurrogateClient()), num_episodes=5)
+    env.close()
+    return seconds, stored, replayed, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prioritized replay throughput and sample efficiency.")
+    parser.add_argument('mode', choices=['throughput', 'efficiency'])
+    parser.add_argument('--capacities', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--repeats', type=int, default=2000)
+    parser.add_argument('--steps', type=int, default=4000, help="training steps per configuration")
+    parser.add_argument('--n-steps', type=int, default=3)
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0])
+    args = parser.parse_args()
+
+    if args.mode == 'throughput':
+        print(f"batch {args.batch_size}")
+        print(f"{'capacity':>10}{'sample/s':>14}{'update/s':>14}{'choice/s':>14}")
+        for capacity in args.capacities:
+            sample_rate, update_rate, naive_rate = throughput(capacity, args.batch_size, args.repeats)
+            print(f"{capacity:>10}{sample_rate:>14,.0f}{update_rate:>14,.0f}{naive_rate:>14,.0f}")
+        return
+
+    configurations = [('uniform', DQN, FrameReplayBuffer, 1),
+                      ('prioritized', PrioritizedDQN, PrioritizedFrameReplayBuffer, 1),
+                      (f'prioritized n={args.n_steps}', PrioritizedDQN, PrioritizedFrameReplayBuffer, args.n_steps)]
+    print(f"{args.steps} training steps, seeds {args.seeds}")
+    print(f"{'replay':<16}{'train s':>9}{'ends stored':>13}{'ends replayed':>15}{'eval reward':>13}{'success':>9}")
+    for name, algorithm, buffer_class, n_steps in configurations:
+        runs = [train(algorithm, buffer_class, n_steps, args.steps, seed) for seed in args.seeds]
+        print(f"{name:<16}{np.mean([r[0] for r in runs]):>9.1f}{np.mean([r[1] for r in runs]):>13.3f}"
+              f"{np.mean([r[2] for r in runs]):>15.3f}{np.mean([r[3].rewards.mean() for r in runs]):>13.1f}"
+              f"{np.mean([r[3].success.mean() for r in runs]):>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import argparse
+
+import numpy as np
+
+from reactive import ReactiveController
+from sim_settings import load_clock_speed
+from surrogate import BlocksWorld, SurrogateClient
+
+# Control-loop timing of reactive.ReactiveController on the surrogate: tick jitter (start versus
+# schedule), observation age when the command is sent and tick latency, at several loop rates
+# (simulated Hz, so ticks come every 1 / (rate * clock_speed) wall seconds),
+# with observations fetched inline at the start of each tick or streamed from a worker thread.
+# Every configuration flies the same random worlds to target_x with `rpc_delay` per call.
+
+
+def fly(world_seed, rate_hz, streamed, rpc_delay, clock_speed, target_x):
+    world = BlocksWorld.default() if world_seed is None else BlocksWorld.random(seed=world_seed)
+    client = SurrogateClient(world=world, rpc_delay=rpc_delay, clock_speed=clock_speed)
+    client.enableApiControl(True)
+    client.armDisarm(True)
+    client.takeoffAsync().join()
+    client.moveToZAsync(-5, 5).join()
+    controller = ReactiveController(target_x=target_x)
+    return controller.fly(client, client if streamed else None, rate_hz=rate_hz, clock_speed=clock_speed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the reactive controller's streaming control loop.")
+    parser.add_argument('--rates', type=float, nargs='+', default=[20.0, 50.0], help="loop rates in simulated Hz")
+    parser.add_argument('--worlds', type=int, default=5, help="random worlds flown per configuration")
+    parser.add_argument('--rpc-delay', type=float, default=0.002, help="seconds added to every RPC")
+    parser.add_argument('--clock-speed', type=float, default=load_clock_speed(),
+                        help="simulated seconds per wall second (default: ClockSpeed in settings.json)")
+    parser.add_argument('--target-x', type=float, default=40.0)
+    args = parser.parse_args()
+
+    print(f"rpc_delay={args.rpc_delay * 1e3:.1f} ms, clock_speed={args.clock_speed:g}, {args.worlds} worlds")
+    print(f"{'rate':>6}{'fetch':>9}{'Hz':>8}{'jitter p50/p95 ms':>20}{'age p50/p95 ms':>17}"
+          f"{'latency p50/p95 ms':>21}{'overruns':>10}{'reached':>9}")
+    for rate in args.rates:
+        for streamed in (False, True):
+            logs = [fly(seed, rate, streamed, args.rpc_delay, args.clock_speed, args.target_x)
+                    for seed in range(args.worlds)]
+            started = np.concatenate([log.column('started') for log in logs])
+            jitter = (started - np.concatenate([log.column('scheduled') for log in logs])) * 1e3
+            sent = np.concatenate([log.column('sent') for log in logs])
+            age = (sent - np.concatenate([log.column('observed') for log in logs])) * 1e3
+            latency = (sent - started) * 1e3
+            achieved = np.mean([log.summary()['rate_hz'] for log in logs])
+            print(f"{rate:>6g}{'stream' if streamed else 'inline':>9}{achieved:>8.1f}"
+                  f"{np.percentile(jitter, 50):>11.2f}/{np.percentile(jitter, 95):<8.2f}"
+                  f"{np.percentile(age, 50):>8.2f}/{np.percentile(age, 95):<8.2f}"
+                  f"{np.percentile(latency, 50):>12.2f}/{np.percentile(latency, 95):<8.2f}"
+                  f"{sum(log.overruns for log in logs):>10}{sum(log.reached for log in logs):>6}/{len(logs)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import argparse
+
+import numpy as np
+
+from DroneEnvironment import DroneEnv
+from surrogate import SurrogateClient
+
+# DroneEnv.reset latency with the full reset (simulator reset, take-off, climb to -5 m) versus the
+# fast reset (teleport to the cached hover pose), on the surrogate with `rpc_delay` per call and
+# motions running at `clock_speed`. Each reset follows a few random steps, and the first
+# observation of every fast reset is checked against the one the full reset produced.
+
+
+def measure(fast_reset, episodes, steps, rpc_delay, clock_speed, seed=0):
+    client = SurrogateClient(rpc_delay=rpc_delay, clock_speed=clock_speed)
+    env = DroneEnv(client=client, use_pipeline=False, clock_speed=clock_speed, fast_reset=fast_reset)
+    first_observation = np.array(env.reset())
+    rng = np.random.default_rng(seed)
+    wall, sim, calls, identical = [], [], [], True
+    for _ in range(episodes):
+        for action in rng.integers(0, 7, steps):
+            if env.step(action)[2]:
+                break
+        sim_before = client.sim_time
+        calls_before = sum(client.call_counts.values())
+        observation = env.reset()
+        wall.append(env.last_reset_seconds)
+        sim.append(client.sim_time - sim_before)
+        calls.append(sum(client.call_counts.values()) - calls_before)
+        identical &= bool(np.array_equal(np.array(observation), first_observation))
+    env.close()
+    return np.array(wall) * 1e3, np.mean(sim), np.mean(calls), identical
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DroneEnv full versus fast reset.")
+    parser.add_argument('--episodes', type=int, default=20)
+    parser.add_argument('--steps', type=int, default=3, help="random steps flown before each reset")
+    parser.add_argument('--rpc-delay', type=float, default=0.002, help="seconds added to every RPC")
+    parser.add_argument('--clock-speed', type=float, default=100.0, help="simulated seconds per wall second")
+    args = parser.parse_args()
+
+    print(f"rpc_delay={args.rpc_delay * 1e3:.1f} ms, clock_speed={args.clock_speed:g}")
+    print(f"{'reset':<8}{'mean ms':>9}{'p95 ms':>9}{'sim s':>8}{'RPCs':>7}  same first observation")
+    results = {}
+    for name, fast_reset in [('full', False), ('fast', True)]:
+        wall, sim, calls, identical = measure(fast_reset, args.episodes, args.steps, args.rpc_delay,
+                                              args.clock_speed)
+        results[name] = wall.mean()
+        print(f"{name:<8}{wall.mean():>9.2f}{np.percentile(wall, 95):>9.2f}{sim:>8.2f}{calls:>7.1f}  {identical}")
+    print(f"speedup {results['full'] / results['fast']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import time
+
+import numpy as np
+
+from DroneEnvironment import DroneEnv
+from fake_airsim import MultirotorClient
+
+# Wall-clock latency of DroneEnv.step with the blocking primitives versus the ActionPipeline
+# (observing on the env's own connection or on an observation connection), against a fake
+# client that charges `rpc_delay` per call and runs motions at `clock_speed`. Also checks the
+# state cache's bookkeeping: the getMultirotorState fetches it counts per step against the
+# getMultirotorState RPCs the client actually received, which should both be about one.
+
+
+def measure(use_pipeline, observation_connection, steps, rpc_delay, clock_speed, seed=0):
+    client = MultirotorClient(rpc_delay=rpc_delay, clock_speed=clock_speed)
+    env = DroneEnv(client=client, observation_client=client if observation_connection else None,
+                   use_pipeline=use_pipeline, clock_speed=clock_speed)
+    env.reset()
+    rng = np.random.default_rng(seed)
+    latencies = []
+    step_calls = state_fetches = state_rpcs = 0
+    for action in rng.integers(0, 7, steps):
+        calls_before = sum(client.call_counts.values())
+        fetches_before = env.client.state_fetches
+        state_rpcs_before = client.call_counts['getMultirotorState']
+        start = time.perf_counter()
+        _, _, done, _ = env.step(action)
+        latencies.append(time.perf_counter() - start)
+        step_calls += sum(client.call_counts.values()) - calls_before
+        state_fetches += env.client.state_fetches - fetches_before
+        state_rpcs += client.call_counts['getMultirotorState'] - state_rpcs_before
+        if done:
+            env.reset()
+    env.close()
+    return np.array(latencies) * 1e3, step_calls / steps, state_fetches / steps, state_rpcs / steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DroneEnv.step latency with and without the action pipeline.")
+    parser.add_argument('--steps', type=int, default=200)
+    parser.add_argument('--rpc-delay', type=float, default=0.005, help="seconds added to every RPC")
+    parser.add_argument('--clock-speed', type=float, default=100.0, help="simulated seconds per wall second")
+    args = parser.parse_args()
+
+    print(f"rpc_delay={args.rpc_delay * 1e3:.1f} ms, clock_speed={args.clock_speed:g}")
+    print(f"{'mode':<18}{'mean ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'RPCs/step':>11}"
+          f"{'counted fetches/step':>22}{'state RPCs/step':>17}")
+    for name, use_pipeline, observation_connection in [('blocking', False, False), ('pipeline', True, False),
+                                                       ('pipeline+observer', True, True)]:
+        latencies, calls, fetches, state_rpcs = measure(use_pipeline, observation_connection, args.steps,
+                                                        args.rpc_delay, args.clock_speed)
+        print(f"{name:<18}{latencies.mean():>9.2f}{np.percentile(latencies, 50):>9.2f}"
+              f"{np.percentile(latencies, 95):>9.2f}{calls:>11.2f}{fetches:>22.2f}{state_rpcs:>17.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+import argparse
+import itertools
+import json
+import multiprocessing as mp
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from DroneEnvironment import DroneEnv
+from fake_airsim import MultirotorClient
+from profiling import NULL_PROFILER, StepProfiler
+from sim_settings import load_capture_settings
+
+# End-to-end benchmark suite for the drone stack's hot paths, with JSON baselines:
+#
+#   python bench_suite.py run --out baseline.json
+#   ... change something ...
+#   python bench_suite.py run --out current.json
+#   python bench_suite.py compare baseline.json current.json --threshold 0.15
+#
+# Every case runs against fake_airsim.MultirotorClient with `--rpc-delay` seconds per call, at
+# each `--image-size` (default: the settings.json capture size and AirSim's 256x144 camera):
+#
+#   step           DroneEnv.step with the blocking movements.py primitives (resets included)
+#   step_pipeline  DroneEnv.step with the ActionPipeline
+#   reset          DroneEnv.reset: simulator reset and take-off
+#   fast_reset     DroneEnv.reset teleporting to the cached hover pose
+#   depth_image    DroneEnv.get_depth_image
+#   primitives     the seven movements.py primitives, round robin (one phase each)
+#   dqn            main.py's DQN learning on the env, timesteps per second
+#
+# Each case reports calls per second, phase latency percentiles from profiling.StepProfiler,
+# RPCs per call, tracemalloc's peak bytes allocated per call and bytes still held afterwards
+# (measured in a second, unprofiled pass), and the peak RSS of the process, which runs alone
+# in a spawned worker.
+
+CASES = ('step', 'step_pipeline', 'reset', 'fast_reset', 'depth_image', 'primitives', 'dqn')
+INSTANT_CLOCK = 1e6  # the env's clock speed when the fake client completes motions instantly
+WARMUP_CALLS = 20
+PRIMITIVES = ('move_forward', 'move_45_degrees_right_up', 'move_45_degrees_left_up', 'move_45_degrees_right_down',
+              'move_45_degrees_left_down', 'rotate_45_degrees_right', 'rotate_45_degrees_left')
+# Metrics compared by default; higher is better only for per_second
+COMPARED = ('per_second', 'p50_ms', 'p95_ms', 'p99_ms', 'alloc_kib_per_call', 'peak_rss_mib')
+
+
+def make_env(config, profiler, **kwargs):
+    """DroneEnv on a fresh stand-in client sized by config; profiler None leaves it unprofiled."""
+    client = MultirotorClient(image_size=tuple(config['image_size']), rpc_delay=config['rpc_delay'],
+                              clock_speed=config['clock_speed'], binary_images=config['binary_images'])
+    kwargs.setdefault('use_pipeline', False)
+    if kwargs['use_pipeline']:
+        kwargs['observation_client'] = client
+    return DroneEnv(client=client, profiler=profiler, clock_speed=config['clock_speed'] or INSTANT_CLOCK, **kwargs)
+
+
+def setup_step(config, profiler, use_pipeline=False):
+    env = make_env(config, profiler, use_pipeline=use_pipeline)
+    env.reset()
+    calls = WARMUP_CALLS + max(config['calls'], config['allocation_calls'])
+    actions = iter(np.random.default_rng(config['seed']).integers(0, 7, calls).tolist())
+
+    def step():
+        if env.step(next(actions))[2]:
+            env.reset()
+    return env, step
+
+
+def setup_reset(config, profiler, fast_reset=False):
+    env = make_env(config, profiler, fast_reset=fast_reset)
+    env.reset()
+    return env, env.reset
+
+
+def setup_depth_image(config, profiler):
+    env = make_env(config, profiler)
+    env.reset()
+    phases = profiler or NULL_PROFILER
+
+    def get_depth_image():
+        with phases.phase('get_depth_image'):
+            env.get_depth_image()
+    return env, get_depth_image
+
+
+def setup_primitives(config, profiler):
+    env = make_env(config, profiler)
+    env.reset()
+    phases = profiler or NULL_PROFILER
+    calls = itertools.count()
+
+    def primitive():
+        action = next(calls) % len(PRIMITIVES)
+        if profiler is not None:
+            profiler.action = action  # RPCs are attributed to the primitive
+        with phases.phase(PRIMITIVES[action]):
+            env.take_action(action)
+    return env, primitive
+
+
+SETUPS = {
+    'step': setup_step,
+    'step_pipeline': lambda config, profiler: setup_step(config, profiler, use_pipeline=True),
+    'reset': setup_reset,
+    'fast_reset': lambda config, profiler: setup_reset(config, profiler, fast_reset=True),
+    'depth_image': setup_depth_image,
+    'primitives': setup_primitives,
+}
+
+
+def phase_table(profiler):
+    return {name: {'count': count, 'mean_ms': mean * 1e3, 'p50_ms': p50 * 1e3, 'p95_ms': p95 * 1e3,
+                   'p99_ms': p99 * 1e3, 'max_ms': maximum * 1e3}
+            for name, count, _, mean, p50, p95, p99, maximum in profiler.summary()}
+
+
+def allocations(operation, calls):
+    """(mean peak KiB traced during a call, bytes per call still allocated after all of them)."""
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    peaks = 0
+    for _ in range(calls):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        operation()
+        peaks += tracemalloc.get_traced_memory()[1] - before
+    retained = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return peaks / calls / 1024, retained / calls
+
+
+def peak_rss_mib():
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2 ** 20 if sys.platform == 'darwin' else 1024)
+
+
+def measure(case, config):
+    """Timing pass with a StepProfiler, then an unprofiled allocation pass on a fresh env."""
+    profiler = StepProfiler()
+    env, operation = SETUPS[case](config, profiler)
+    for _ in range(WARMUP_CALLS):
+        operation()
+    profiler.histograms.clear()
+    profiler.rpc_counts.clear()
+    calls = config['calls']
+    start = time.perf_counter()
+    for _ in range(calls):
+        operation()
+    seconds = time.perf_counter() - start
+    env.close()
+
+    env, operation = SETUPS[case](config, None)
+    for _ in range(WARMUP_CALLS):
+        operation()
+    alloc_kib, retained = allocations(operation, config['allocation_calls'])
+    env.close()
+    return {'calls': calls, 'seconds': seconds, 'per_second': calls / seconds, 'phases': phase_table(profiler),
+            'rpcs_per_call': sum(profiler.rpc_counts.values()) / calls, 'alloc_kib_per_call': alloc_kib,
+            'retained_bytes_per_call': retained}
+
+
+def measure_dqn(config):
+    """Timesteps per second of main.py's DQN (uint8 frames, FrameReplayBuffer) learning on the env."""
+    from stable_baselines3 import DQN
+    from replay import FrameReplayBuffer
+    profiler = StepProfiler()
+    env = make_env(config, profiler)
+    model = DQN("CnnPolicy", env, buffer_size=10000, learning_starts=config['dqn_steps'] // 5,
+                replay_buffer_class=FrameReplayBuffer, replay_buffer_kwargs=dict(frame_stack=1, n_steps=1),
+                seed=config['seed'], verbose=0)
+    start = time.perf_counter()
+    model.learn(total_timesteps=config['dqn_steps'])
+    seconds = time.perf_counter() - start
+    env.close()
+    profiler.record('learn', seconds)
+    return {'calls': config['dqn_steps'], 'seconds': seconds, 'per_second': config['dqn_steps'] / seconds,
+            'phases': phase_table(profiler), 'rpcs_per_call': sum(profiler.rpc_counts.values()) / config['dqn_steps']}
+
+
+def run_case(case, config):
+    """One case's results, measured in the calling (fresh) process; missing optional packages skip it."""
+    try:
+        result = measure_dqn(config) if case == 'dqn' else measure(case, config)
+    except ImportError as error:
+        return {'skipped': str(error)}
+    result['peak_rss_mib'] = peak_rss_mib()
+    return result
+
+
+def run(config, cases):
+    """{case@WxH: results} with every case in its own spawned process, so peak RSS is its own."""
+    results = {}
+    for width, height in config['image_sizes']:
+        for case in cases:
+            name = f"{case}@{width}x{height}"
+            with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context('spawn')) as pool:
+                results[name] = pool.submit(run_case, case, dict(config, image_size=(width, height))).result()
+            print_case(name, results[name])
+    return results
+
+
+def print_case(name, result):
+    if 'skipped' in result:
+        print(f"{name:<30}skipped: {result['skipped']}")
+        return
+    alloc = f"{result['alloc_kib_per_call']:>11.1f}" if 'alloc_kib_per_call' in result else f"{'-':>11}"
+    print(f"{name:<30}{result['per_second']:>10,.1f}{result['rpcs_per_call']:>7.1f}{alloc}{result['peak_rss_mib']:>9.0f}")
+    for phase, stats in result['phases'].items():
+        print(f"  {phase:<28}{stats['count']:>8}{stats['p50_ms']:>9.3f}{stats['p95_ms']:>9.3f}{stats['p99_ms']:>9.3f}"
+              f"{stats['max_ms']:>9.3f}")
+
+
+def metrics(result):
+    """Flat {metric: value} of one case's results, with phase percentiles as 'phase.p95_ms'."""
+    flat = {key: value for key, value in result.items() if key in COMPARED}
+    for phase, stats in result.get('phases', {}).items():
+        flat.update({f"{phase}.{key}": value for key, value in stats.items() if key in COMPARED})
+    return flat
+
+
+def compare(baseline, current, threshold, min_ms):
+    """Rows of (case, metric, baseline, current, relative change, regressed) for metrics in both runs.
+
+    A metric regresses when it got worse by more than `threshold` (relative); latencies must
+    also have grown by at least `min_ms`, so jitter of microsecond phases is not flagged.
+    """
+    rows = []
+    for case in sorted(set(baseline['results']) & set(current['results'])):
+        before, after = metrics(baseline['results'][case]), metrics(current['results'][case])
+        for metric in sorted(set(before) & set(after)):
+            old, new = before[metric], after[metric]
+            change = (new - old) / old if old else 0.0
+            worse = -change if metric == 'per_second' else change
+            regressed = worse > threshold and not (metric.endswith('_ms') and new - old < min_ms)
+            rows.append((case, metric, old, new, change, regressed))
+    return rows
+
+
+def environment():
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+            'processor': platform.processor()}
+
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the drone stack's hot paths and track regressions.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help="run the benchmarks and save the results as JSON")
+    run_parser.add_argument('--out', default='bench_results.json')
+    run_parser.add_argument('--cases', nargs='+', choices=CASES, default=list(CASES))
+    width, height, _ = load_capture_settings()
+    run_parser.add_argument('--image-size', type=parse_size, nargs='+', default=[(width, height), (256, 144)],
+                            help="camera sizes WxH to run every case at")
+    run_parser.add_argument('--rpc-delay', type=float, default=0.0, help="seconds added to every RPC")
+    run_parser.add_argument('--clock-speed', type=float,
+                            help="simulated seconds per wall second of the motions (default: instant)")
+    run_parser.add_argument('--binary-images', action='store_true',
+                            help="serve images as float32 bytes instead of AirSim's float lists")
+    run_parser.add_argument('--calls', type=int, default=500, help="timed calls per case")
+    run_parser.add_argument('--allocation-calls', type=int, default=100, help="calls traced for allocations")
+    run_parser.add_argument('--dqn-steps', type=int, default=500)
+    run_parser.add_argument('--seed', type=int, default=0)
+    compare_parser = commands.add_parser('compare', help="flag regressions of a run against a baseline")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.15, help="relative change counted as a regression")
+    compare_parser.add_argument('--min-ms', type=float, default=0.05,
+                                help="smallest latency increase counted as a regression")
+    compare_parser.add_argument('--all', action='store_true', help="print every metric, not only regressions")
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        config = {'image_sizes': args.image_size, 'rpc_delay': args.rpc_delay, 'clock_speed': args.clock_speed,
+                  'binary_images': args.binary_images, 'calls': args.calls, 'allocation_calls': args.allocation_calls,
+                  'dqn_steps': args.dqn_steps, 'seed': args.seed}
+        print(f"rpc_delay={args.rpc_delay * 1e3:.1f} ms, {args.calls} calls per case")
+        print(f"{'case':<30}{'calls/s':>10}{'RPCs':>7}{'alloc KiB':>11}{'RSS MiB':>9}")
+        print(f"  {'phase':<28}{'count':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+        results = run(config, args.cases)
+        with open(args.out, 'w') as f:
+            json.dump({'config': config, 'environment': environment(), 'results': results}, f, indent=1)
+        print(f"saved {args.out}")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    if baseline['config'] != current['config']:
+        print("warning: the runs were made with different configurations")
+    rows = compare(baseline, current, args.threshold, args.min_ms)
+    regressions = [row for row in rows if row[5]]
+    print(f"{'case':<26}{'metric':<36}{'baseline':>12}{'current':>12}{'change':>10}")
+    for case, metric, old, new, change, regressed in rows if args.all else regressions:
+        print(f"{case:<26}{metric:<36}{old:>12.4g}{new:>12.4g}{change:>+10.1%}{'  REGRESSION' if regressed else ''}")
+    print(f"{len(regressions)} regressions beyond {args.threshold:.0%} in {len(rows)} metrics")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
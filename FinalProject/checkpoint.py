@@ -0,0 +1,263 @@
+import json
+import os
+import pickle
+import random
+import shutil
+import time
+
+import numpy as np
+import torch
+from stable_baselines3.common.callbacks import BaseCallback
+
+# Periodic, resumable checkpoints of a DQN run using replay.FrameReplayBuffer. A checkpoint
+# directory holds
+#
+#   checkpoint.json          manifest of the latest checkpoint, replaced atomically
+#   model_NNNNNNNNNN.zip     policy, target network and optimizer state (SB3's model.save)
+#   state_NNNNNNNNNN.pkl     RNG states, the envs' episode counters and replay priorities, if any
+#   replay/NNNNNNNNNN/       replay segment: the buffer rows written since the previous checkpoint
+#
+# Every file is complete before the manifest names it, so a crash mid-checkpoint leaves the
+# previous checkpoint usable. The replay buffer is saved incrementally: a segment holds only the
+# rows added since the last checkpoint, so its cost follows the steps taken in between rather
+# than the buffer size, and segments whose rows have all been overwritten are deleted. Segments
+# are plain .npy files, memory-mapped on reload.
+#
+# Checkpoints are taken between rollouts at an episode boundary, the point from which training
+# can continue exactly as if it had never stopped:
+#
+#   checkpointer = Checkpointer('runs/dqn')
+#   model.learn(100000, callback=PeriodicCheckpoint(checkpointer, every=5000))
+#   ...
+#   model = checkpointer.load(DQN, env)
+#   model.learn(100000 - model.num_timesteps, reset_num_timesteps=False, callback=...)
+
+MANIFEST_FILE = 'checkpoint.json'
+REPLAY_DIR = 'replay'
+REPLAY_ARRAYS = ('actions', 'rewards', 'dones', 'timeouts', 'episode_starts')
+
+
+def _write_atomically(path, write):
+    """Write path through write(file) into a temporary file, then rename it over path."""
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def _frames_name(key):
+    # FrameReplayBuffer keys a Box observation's frames by None
+    return 'frames' if key is None else f'frames_{key}'
+
+
+def rng_state(model):
+    """RNG states that drive a DQN run: Python, NumPy (replay sampling, exploration), torch and the action space."""
+    state = {'python': random.getstate(), 'numpy': np.random.get_state(), 'torch': torch.get_rng_state(),
+             'action_space': model.action_space.np_random.bit_generator.state}
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def set_rng_state(model, state):
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+    model.action_space.np_random.bit_generator.state = state['action_space']
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+
+def env_states(venv):
+    """Each env's episode_state() (DroneEnv), or None if the envs can't be restarted from a checkpoint."""
+    try:
+        return venv.env_method('episode_state')
+    except AttributeError:
+        return None
+
+
+class ReplaySnapshot:
+    """Incremental on-disk copy of a FrameReplayBuffer, one segment of newly written rows per write()."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.segments = []  # live segment names, oldest first
+        self.owner = None  # per ring slot, the index in segments of the latest segment holding it
+        self.saved = 0  # buffer.num_added at the latest segment
+
+    def write(self, buffer, name):
+        """Save the rows added since the last write as segment `name`; returns the segments now dead."""
+        if self.owner is None:
+            self.owner = np.full(buffer.buffer_size, -1)
+        # The slot at pos holds a provisional next frame, saved now and again by the next segment
+        count = min(buffer.num_added - self.saved + 1, buffer.buffer_size)
+        slots = (buffer.pos - count + 1 + np.arange(count)) % buffer.buffer_size
+        in_segment = np.zeros(buffer.buffer_size, dtype=bool)
+        in_segment[slots] = True
+        terminal = [key for key in buffer.terminal_frames if in_segment[key[0]]]
+
+        arrays = {'slots': slots,
+                  'terminal_slots': np.array([pos for pos, _ in terminal], dtype=np.int64),
+                  'terminal_envs': np.array([env for _, env in terminal], dtype=np.int64)}
+        for key, frames in buffer.frames.items():
+            arrays[_frames_name(key)] = frames[slots]
+            arrays['terminal_' + _frames_name(key)] = np.array(
+                [buffer.terminal_frames[pos_env][key] for pos_env in terminal]).reshape((-1,) + frames.shape[2:])
+        for array_name in REPLAY_ARRAYS:
+            arrays[array_name] = getattr(buffer, array_name)[slots]
+
+        temporary = os.path.join(self.directory, name + '.tmp')
+        shutil.rmtree(temporary, ignore_errors=True)
+        os.makedirs(temporary)
+        for array_name, array in arrays.items():
+            _write_atomically(os.path.join(temporary, array_name + '.npy'), lambda f: np.save(f, array))
+        final = os.path.join(self.directory, name)
+        shutil.rmtree(final, ignore_errors=True)
+        os.replace(temporary, final)
+
+        self.owner[slots] = len(self.segments)
+        self.segments.append(name)
+        self.saved = buffer.num_added
+        return self._drop_dead()
+
+    def _drop_dead(self):
+        live = np.zeros(len(self.segments), dtype=bool)
+        live[self.owner[self.owner >= 0]] = True
+        dead = [name for name, alive in zip(self.segments, live) if not alive]
+        index = np.cumsum(live) - 1
+        self.owner = np.where(self.owner >= 0, index[self.owner], -1)
+        self.segments = [name for name, alive in zip(self.segments, live) if alive]
+        return dead
+
+    def load(self, buffer, segments, buffer_state):
+        """Rebuild buffer from the given segments (oldest first) and its saved position."""
+        self.segments, self.owner = [], np.full(buffer.buffer_size, -1)
+        buffer.terminal_frames.clear()
+        for name in segments:
+            path = os.path.join(self.directory, name)
+
+            def load(array_name):
+                return np.load(os.path.join(path, array_name + '.npy'), mmap_mode='r')
+
+            slots = np.array(load('slots'))
+            for key, frames in buffer.frames.items():
+                frames[slots] = load(_frames_name(key))
+            for array_name in REPLAY_ARRAYS:
+                getattr(buffer, array_name)[slots] = load(array_name)
+            # Later segments overwrite the terminal frames of the slots they hold, like add() does
+            in_segment = np.zeros(buffer.buffer_size, dtype=bool)
+            in_segment[slots] = True
+            for pos_env in [key for key in buffer.terminal_frames if in_segment[key[0]]]:
+                del buffer.terminal_frames[pos_env]
+            terminal = {key: np.array(load('terminal_' + _frames_name(key))) for key in buffer.frames}
+            for i, pos_env in enumerate(zip(load('terminal_slots').tolist(), load('terminal_envs').tolist())):
+                buffer.terminal_frames[pos_env] = {key: frames[i] for key, frames in terminal.items()}
+            self.owner[slots] = len(self.segments)
+            self.segments.append(name)
+        buffer.pos = buffer_state['pos']
+        buffer.full = buffer_state['full']
+        buffer.num_added = buffer_state['num_added']
+        buffer._episode_start = np.array(buffer_state['episode_start'], dtype=bool)
+        self.saved = buffer.num_added
+        self._drop_dead()
+
+
+class Checkpointer:
+    """Writes and reads the checkpoints of one training run in `directory`."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(os.path.join(directory, REPLAY_DIR), exist_ok=True)
+        self.replay = ReplaySnapshot(os.path.join(directory, REPLAY_DIR))
+        manifest_path = os.path.join(directory, MANIFEST_FILE)
+        self.manifest = None  # of the latest checkpoint, if any
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                self.manifest = json.load(f)
+        self.last_save_seconds = None
+
+    def save(self, model, extra=None):
+        """Checkpoint model at its current step; `extra` is any JSON-serializable dict kept in the manifest."""
+        save_start = time.perf_counter()
+        name = f'{model.num_timesteps:010d}'
+        model_file, state_file = f'model_{name}.zip', f'state_{name}.pkl'
+        _write_atomically(os.path.join(self.directory, model_file), model.save)
+        state = {'rng': rng_state(model), 'envs': env_states(model.get_env())}
+        if hasattr(model.replay_buffer, 'snapshot_state'):
+            # Small per-transition state rewritten in place, like prioritized_replay's priorities
+            state['replay'] = model.replay_buffer.snapshot_state()
+        _write_atomically(os.path.join(self.directory, state_file), lambda f: pickle.dump(state, f))
+        buffer = model.replay_buffer
+        dead = self.replay.write(buffer, name)
+
+        manifest = {'step': model.num_timesteps, 'model': model_file, 'state': state_file,
+                    'replay_segments': list(self.replay.segments),
+                    'replay': {'pos': int(buffer.pos), 'full': bool(buffer.full), 'num_added': int(buffer.num_added),
+                               'episode_start': buffer._episode_start.tolist()},
+                    'extra': extra or {}}
+        _write_atomically(os.path.join(self.directory, MANIFEST_FILE),
+                          lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+
+        # Only now that the manifest no longer names them can the previous files go
+        previous, self.manifest = self.manifest, manifest
+        if previous is not None:
+            for file_name in {previous['model'], previous['state']} - {model_file, state_file}:
+                os.remove(os.path.join(self.directory, file_name))
+        for segment in dead:
+            shutil.rmtree(os.path.join(self.replay.directory, segment), ignore_errors=True)
+        self.last_save_seconds = time.perf_counter() - save_start
+        return manifest
+
+    def load(self, algorithm, env=None, **kwargs):
+        """The latest checkpoint's model (e.g. algorithm=DQN) with its replay buffer, RNG states and envs restored.
+
+        Envs providing restart_episode() (DroneEnv) start the saved episode over on the reset that
+        learn(..., reset_num_timesteps=False) begins with.
+        """
+        if self.manifest is None:
+            raise FileNotFoundError(f"no checkpoint in {self.directory}")
+        model = algorithm.load(os.path.join(self.directory, self.manifest['model']), env=env, **kwargs)
+        self.replay.load(model.replay_buffer, self.manifest['replay_segments'], self.manifest['replay'])
+        with open(os.path.join(self.directory, self.manifest['state']), 'rb') as f:
+            state = pickle.load(f)
+        set_rng_state(model, state['rng'])
+        if 'replay' in state:
+            model.replay_buffer.load_snapshot_state(state['replay'])
+        if state['envs'] is not None and model.get_env() is not None:
+            for i, env_state in enumerate(state['envs']):
+                model.get_env().env_method('restart_episode', env_state, indices=[i])
+        return model
+
+
+class PeriodicCheckpoint(BaseCallback):
+    """Checkpoints training at the first rollout start on an episode boundary once `every` steps have passed.
+
+    `extra`, a dict or a function returning one, is stored in the manifest (e.g. telemetry rows).
+    Episode boundaries need all envs to have just finished, so use a single training env.
+    """
+
+    def __init__(self, checkpointer, every, extra=None, verbose=0):
+        super(PeriodicCheckpoint, self).__init__(verbose)
+        self.checkpointer = checkpointer
+        self.every = every
+        self.extra = extra
+        self.last_step = 0
+        self.at_episode_start = True
+
+    def _on_training_start(self):
+        self.last_step = self.num_timesteps
+
+    def _on_step(self):
+        self.at_episode_start = bool(np.all(self.locals['dones']))
+        return True
+
+    def _on_rollout_start(self):
+        if not self.at_episode_start or self.num_timesteps - self.last_step < self.every:
+            return
+        extra = self.extra() if callable(self.extra) else self.extra
+        self.checkpointer.save(self.model, extra)
+        self.last_step = self.num_timesteps
+        if self.verbose:
+            print(f"checkpoint at step {self.num_timesteps} in {self.checkpointer.last_save_seconds:.2f} s")
@@ -0,0 +1,107 @@
+from abc import ABC, abstractmethod
+
+# Client abstraction for everything FinalProject asks of the simulator.
+# airsim.MultirotorClient, fake_airsim.MultirotorClient and surrogate.SurrogateClient all
+# satisfy it, so DroneEnv and the movement primitives run unchanged against any of them.
+
+BACKENDS = ('airsim', 'surrogate', 'fake')
+
+
+class MultirotorClientInterface(ABC):
+    """The subset of airsim.MultirotorClient used by DroneEnv, movements.py and the task scripts."""
+
+    @abstractmethod
+    def confirmConnection(self):
+        pass
+
+    @abstractmethod
+    def enableApiControl(self, is_enabled, vehicle_name=''):
+        pass
+
+    @abstractmethod
+    def armDisarm(self, arm, vehicle_name=''):
+        pass
+
+    @abstractmethod
+    def reset(self):
+        pass
+
+    @abstractmethod
+    def simGetVehiclePose(self, vehicle_name=''):
+        pass
+
+    @abstractmethod
+    def getMultirotorState(self, vehicle_name=''):
+        pass
+
+    @abstractmethod
+    def simSetVehiclePose(self, pose, ignore_collision, vehicle_name=''):
+        pass
+
+    @abstractmethod
+    def simGetImages(self, requests, vehicle_name=''):
+        pass
+
+    @abstractmethod
+    def simPause(self, is_paused):
+        pass
+
+    @abstractmethod
+    def simIsPause(self):
+        pass
+
+    @abstractmethod
+    def simContinueForTime(self, seconds):
+        pass
+
+    @abstractmethod
+    def takeoffAsync(self, timeout_sec=20, vehicle_name=''):
+        pass
+
+    @abstractmethod
+    def landAsync(self, timeout_sec=60, vehicle_name=''):
+        pass
+
+    @abstractmethod
+    def moveToZAsync(self, z, velocity, timeout_sec=3e38, yaw_mode=None, lookahead=-1,
+                     adaptive_lookahead=1, vehicle_name=''):
+        pass
+
+    @abstractmethod
+    def moveToPositionAsync(self, x, y, z, velocity, timeout_sec=3e38, drivetrain=None, yaw_mode=None,
+                            lookahead=-1, adaptive_lookahead=1, vehicle_name=''):
+        pass
+
+    @abstractmethod
+    def moveByVelocityZAsync(self, vx, vy, z, duration, drivetrain=None, yaw_mode=None, vehicle_name=''):
+        pass
+
+    @abstractmethod
+    def rotateToYawAsync(self, yaw, timeout_sec=3e38, margin=5, vehicle_name=''):
+        pass
+
+
+def make_client(backend='airsim', **kwargs):
+    """Create a simulator client for the given backend ('airsim', 'surrogate' or 'fake')."""
+    if backend == 'airsim':
+        import airsim
+        MultirotorClientInterface.register(airsim.MultirotorClient)
+        return airsim.MultirotorClient(**kwargs)
+    if backend == 'surrogate':
+        from surrogate import SurrogateClient
+        return SurrogateClient(**kwargs)
+    if backend == 'fake':
+        from fake_airsim import MultirotorClient
+        return MultirotorClient(**kwargs)
+    raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+
+
+def make_observation_client(backend, client, **kwargs):
+    """Second client for fetching observations while `client` is busy with a motion command.
+
+    AirSim's RPC client is not thread-safe, so the real backend needs its own connection; the
+    in-process backends must share `client` to see the same world state.
+    """
+    if backend == 'airsim':
+        return make_client(backend, **kwargs)
+    return client
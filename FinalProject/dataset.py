@@ -0,0 +1,396 @@
+import argparse
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import gym
+import numpy as np
+
+from movements import yaw_from_pose
+from telemetry import TelemetryWriter, load_telemetry
+
+# Offline datasets of DroneEnv experience, so training runs can reuse flown transitions instead
+# of occupying the simulator. A dataset is a directory holding
+#
+#   transitions.npy   one TRANSITION_DTYPE row per step, streamed like telemetry (memory-mappable)
+#   frames_NNNNNN.npz compressed chunks of observation frames, each frame stored once
+#   meta.json         frame layout, frame stack and chunk size
+#
+# Frames form one stream per episode: the reset observation, then each step's next observation.
+# A transition refers to its obs and next_obs by frame number, and stacked observations are
+# rebuilt from the stream, so frame stacking costs nothing on disk.
+#
+#   env = DatasetRecorder(DroneEnv(...), 'flights/run1')   # record while training or flying
+#   dataset = OfflineDataset('flights/run1')
+#   dataset.fill_replay_buffer(model.replay_buffer)        # pre-fill SB3's replay
+#   for batch in dataset.batches(256): ...                 # offline RL / behavior cloning
+
+TRANSITION_DTYPE = np.dtype([
+    ('episode', np.int32),
+    ('step', np.int16),
+    ('action', np.int16),
+    ('reward', np.float32),
+    ('done', np.bool_),
+    ('timeout', np.bool_),
+    ('obs_frame', np.int64),
+    ('next_frame', np.int64),
+    ('first_frame', np.int64),  # the episode's reset frame, repeated to fill early stacks
+    ('x', np.float32),  # pose after the step
+    ('y', np.float32),
+    ('z', np.float32),
+    ('yaw', np.float32),  # degrees
+])
+
+TRANSITIONS_FILE = 'transitions.npy'
+META_FILE = 'meta.json'
+
+
+def _chunk_path(path, chunk):
+    return os.path.join(path, f'frames_{chunk:06d}.npz')
+
+
+def _spaces(observation_space):
+    # Frames are keyed per Dict key, or under 'obs' for a Box observation
+    if isinstance(getattr(observation_space, 'spaces', None), dict):
+        return dict(observation_space.spaces)
+    return {'obs': observation_space}
+
+
+class DatasetRecorder(gym.Wrapper):
+    """Wraps a DroneEnv and appends every transition it makes to the dataset at `path`.
+
+    Observations are written as frames in compressed chunks of `chunk_size`; with a frame-stacked
+    env only the newest frame of each observation is kept. Recording an existing dataset appends
+    new episodes to it.
+    """
+
+    def __init__(self, env, path, chunk_size=1024):
+        super(DatasetRecorder, self).__init__(env)
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.frame_stack = env.observation.frame_stack
+        spaces = _spaces(env.observation_space)
+        self.meta = {'chunk_size': chunk_size, 'frame_stack': self.frame_stack, 'num_frames': 0,
+                     'num_actions': int(env.action_space.n), 'is_dict': len(spaces) > 1 or 'obs' not in spaces,
+                     'keys': {key: {'shape': list(space.shape[:-1]) + [space.shape[-1] // self.frame_stack],
+                                    'dtype': np.dtype(space.dtype).str, 'low': float(np.min(space.low)),
+                                    'high': float(np.max(space.high))}
+                              for key, space in spaces.items()}}
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                existing = json.load(f)
+            if existing['keys'] != self.meta['keys'] or existing['chunk_size'] != chunk_size:
+                raise ValueError(f"{path} holds a dataset of a different observation layout")
+            self.meta['num_frames'] = existing['num_frames']
+        self.transitions = TelemetryWriter(os.path.join(path, TRANSITIONS_FILE), chunk_size, TRANSITION_DTYPE,
+                                           append=True)
+        # An appended dataset restarts in a fresh chunk, so written chunks are never rewritten
+        self.next_frame = -(-self.meta['num_frames'] // chunk_size) * chunk_size
+        self.chunk = {key: np.zeros((chunk_size,) + tuple(info['shape']), dtype=info['dtype'])
+                      for key, info in self.meta['keys'].items()}
+        # Incremented as each episode starts
+        self.episode = self.transitions.next_episode - 1
+        self.steps = 0
+        self.obs_frame = None
+        self.first_frame = None
+
+    def _write_frame(self, observation):
+        frame = self.next_frame
+        slot = frame % self.meta['chunk_size']
+        for key, chunk in self.chunk.items():
+            value = observation[key] if self.meta['is_dict'] else observation
+            channels = chunk.shape[-1]
+            # LazyFrames hand out their newest frame without stacking the rest
+            chunk[slot] = value.frame(-1) if hasattr(value, 'frame') else np.asarray(value)[..., -channels:]
+        self.next_frame += 1
+        if slot == self.meta['chunk_size'] - 1:
+            self._flush_frames()
+        return frame
+
+    def _flush_frames(self):
+        count = self.next_frame % self.meta['chunk_size'] or self.meta['chunk_size']
+        if self.next_frame <= self.meta['num_frames']:
+            return
+        chunk = (self.next_frame - 1) // self.meta['chunk_size']
+        np.savez_compressed(_chunk_path(self.path, chunk), **{key: frames[:count] for key, frames in self.chunk.items()})
+        self.meta['num_frames'] = self.next_frame
+        self.transitions.flush()
+        with open(os.path.join(self.path, META_FILE), 'w') as f:
+            json.dump(self.meta, f, indent=2)
+
+    def reset(self, **kwargs):
+        observation = self.env.reset(**kwargs)
+        self._start_episode(observation)
+        return observation
+
+    def _start_episode(self, observation):
+        self.obs_frame = self.first_frame = self._write_frame(observation)
+        self.episode += 1
+        self.steps = 0
+
+    def step(self, action):
+        # Poses come from the env's cached state snapshot, no RPC
+        pose = self.env.client.simGetVehiclePose()
+        observation, reward, done, info = self.env.step(action)
+        self.steps += 1
+        timeout = bool(info.get('timeout', False))
+        # DroneEnv returns the next episode's first observation on a timeout; the vehicle didn't
+        # move, so the transition's next_obs is its obs and its pose the one before the step.
+        if not timeout:
+            pose = self.env.client.simGetVehiclePose()
+        position = pose.position
+        next_frame = self.obs_frame if timeout else self._write_frame(observation)
+        self.transitions.record(self.episode, self.steps, int(action), reward, done, timeout, self.obs_frame,
+                                next_frame, self.first_frame, position.x_val, position.y_val, position.z_val,
+                                yaw_from_pose(pose))
+        self.obs_frame = next_frame
+        if timeout:
+            self._start_episode(observation)
+        return observation, reward, done, info
+
+    def close(self):
+        self._flush_frames()
+        self.transitions.close()
+        return self.env.close()
+
+
+class OfflineDataset:
+    """Reads a recorded dataset lazily: transitions are memory-mapped and frame chunks decompressed on demand.
+
+    Up to `cache_chunks` decompressed chunks are kept, and batches() decompresses the next
+    `prefetch` chunks on a background thread while the current one is consumed, so datasets
+    larger than memory stream at the rate of the consumer.
+    """
+
+    def __init__(self, path, cache_chunks=6, prefetch=2):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.transitions = load_telemetry(os.path.join(path, TRANSITIONS_FILE))
+        self.chunk_size = self.meta['chunk_size']
+        self.frame_stack = self.meta['frame_stack']
+        # Only transitions whose frames are all on disk
+        self.num_transitions = int(np.searchsorted(self.transitions['next_frame'], self.meta['num_frames']))
+        self.cache_chunks = cache_chunks
+        self.prefetch = prefetch
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def __len__(self):
+        return self.num_transitions
+
+    @property
+    def observation_space(self):
+        """The stacked observation space the dataset was recorded with (gym spaces, like DroneEnv)."""
+        spaces = {}
+        for key, info in self.meta['keys'].items():
+            shape = tuple(info['shape'][:-1]) + (info['shape'][-1] * self.frame_stack,)
+            spaces[key] = gym.spaces.Box(low=info['low'], high=info['high'], shape=shape, dtype=np.dtype(info['dtype']))
+        return gym.spaces.Dict(spaces) if self.meta['is_dict'] else spaces['obs']
+
+    @property
+    def action_space(self):
+        return gym.spaces.Discrete(self.meta['num_actions'])
+
+    def _load(self, chunk):
+        with np.load(_chunk_path(self.path, chunk)) as data:
+            return {key: data[key] for key in self.meta['keys']}
+
+    def _chunk(self, chunk):
+        if chunk in self._cache:
+            self._cache.move_to_end(chunk)
+            return self._cache[chunk]
+        pending = self._pending.pop(chunk, None)
+        frames = pending.result() if pending is not None else self._load(chunk)
+        self._cache[chunk] = frames
+        while len(self._cache) > self.cache_chunks:
+            self._cache.popitem(last=False)
+        return frames
+
+    def _prefetch(self, chunks):
+        for chunk in chunks:
+            if chunk not in self._cache and chunk not in self._pending:
+                self._pending[chunk] = self._executor.submit(self._load, chunk)
+
+    def frames(self, key, indices):
+        """Frames of one observation key at the given frame numbers."""
+        indices = np.asarray(indices)
+        info = self.meta['keys'][key]
+        out = np.empty(indices.shape + tuple(info['shape']), dtype=info['dtype'])
+        chunks = indices // self.chunk_size
+        for chunk in np.unique(chunks):
+            mask = chunks == chunk
+            out[mask] = self._chunk(int(chunk))[key][indices[mask] % self.chunk_size]
+        return out
+
+    def _observations(self, key, last, first):
+        # Stack of frame_stack frames ending at `last`, oldest first, clamped to the episode's first frame
+        indices = np.maximum(last[:, None] - np.arange(self.frame_stack - 1, -1, -1), first[:, None])
+        stack = np.moveaxis(self.frames(key, indices), 1, -2)
+        return stack.reshape(stack.shape[:-2] + (-1,))
+
+    def batch(self, rows):
+        """Dict of obs, next_obs, actions, rewards, dones, timeouts and positions for transition rows."""
+        records = self.transitions[rows]
+        first = records['first_frame']
+        obs = {key: self._observations(key, records['obs_frame'], first) for key in self.meta['keys']}
+        next_obs = {key: self._observations(key, records['next_frame'], first) for key in self.meta['keys']}
+        if not self.meta['is_dict']:
+            obs, next_obs = obs['obs'], next_obs['obs']
+        return {'obs': obs, 'next_obs': next_obs, 'actions': records['action'].astype(np.int64),
+                'rewards': records['reward'].astype(np.float32), 'dones': records['done'].astype(np.float32),
+                'timeouts': records['timeout'].astype(np.float32),
+                'positions': np.column_stack([records['x'], records['y'], records['z']])}
+
+    def _chunk_rows(self):
+        # Row range of the transitions whose next frame lies in each chunk
+        next_frames = np.asarray(self.transitions['next_frame'][:self.num_transitions])
+        num_chunks = -(-self.meta['num_frames'] // self.chunk_size)
+        bounds = np.searchsorted(next_frames, np.arange(num_chunks + 1) * self.chunk_size)
+        return [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+    def batches(self, batch_size, shuffle=True, seed=None, epochs=1):
+        """Yield batch() dicts over the dataset, `epochs` times (None: forever).
+
+        Shuffling permutes the chunks and the transitions within each chunk, so every batch
+        reads at most a couple of chunks while the following ones are prefetched.
+        """
+        rng = np.random.default_rng(seed)
+        chunk_rows = self._chunk_rows()
+        epoch = 0
+        leftover = np.zeros(0, dtype=np.int64)
+        while epochs is None or epoch < epochs:
+            order = rng.permutation(len(chunk_rows)) if shuffle else np.arange(len(chunk_rows))
+            for position, index in enumerate(order):
+                upcoming = order[position + 1:position + 1 + self.prefetch]
+                # A transition's stack can reach back into the chunk before its next frame's
+                self._prefetch(chunk for i in upcoming for chunk in self._chunks_of(chunk_rows[i]))
+                start, stop = chunk_rows[index]
+                rows = np.arange(start, stop)
+                rows = np.concatenate([leftover, rng.permutation(rows) if shuffle else rows])
+                full = len(rows) - len(rows) % batch_size
+                for batch_start in range(0, full, batch_size):
+                    yield self.batch(rows[batch_start:batch_start + batch_size])
+                leftover = rows[full:]
+            epoch += 1
+        if len(leftover):
+            yield self.batch(leftover)
+
+    def _chunks_of(self, row_range):
+        start, stop = row_range
+        first = int(self.transitions['first_frame'][start])
+        low = max(int(self.transitions['obs_frame'][start]) - self.frame_stack + 1, first)
+        return range(low // self.chunk_size, (int(self.transitions['next_frame'][stop - 1])) // self.chunk_size + 1)
+
+    def replay(self, batch_size=32, seed=None):
+        """Endless shuffled stream with the SharedReplay sample() interface, for parallel_training.Learner."""
+        return DatasetReplay(self, batch_size, seed)
+
+    def fill_replay_buffer(self, buffer, max_transitions=None):
+        """Add the dataset's transitions in order to an SB3-style replay buffer (e.g. replay.FrameReplayBuffer).
+
+        Timeouts are passed as TimeLimit.truncated so the buffer bootstraps through them. The last
+        transition added always ends its episode, as a truncation if the data stops mid-episode,
+        so the live env's first observation starts a new episode in the buffer instead of
+        continuing the dataset's last one. Returns the number of transitions added.
+        """
+        count = len(self) if max_transitions is None else min(max_transitions, len(self))
+        for start in range(0, count, self.chunk_size):
+            batch = self.batch(slice(start, min(start + self.chunk_size, count)))
+            if start + len(batch['actions']) == count and not batch['dones'][-1]:
+                batch['dones'][-1] = batch['timeouts'][-1] = True
+            for i in range(len(batch['actions'])):
+                if self.meta['is_dict']:
+                    obs = {key: value[i:i + 1] for key, value in batch['obs'].items()}
+                    next_obs = {key: value[i:i + 1] for key, value in batch['next_obs'].items()}
+                else:
+                    obs, next_obs = batch['obs'][i:i + 1], batch['next_obs'][i:i + 1]
+                buffer.add(obs, next_obs, batch['actions'][i:i + 1], batch['rewards'][i:i + 1],
+                           batch['dones'][i:i + 1], [{'TimeLimit.truncated': bool(batch['timeouts'][i])}])
+        return count
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+class DatasetReplay:
+    """Adapter giving an OfflineDataset the sample() of parallel_training.SharedReplay.
+
+    Batches come from OfflineDataset.batches() in order, so the requested size must match
+    `batch_size`; timeouts are not terminal, as in FrameReplayBuffer.
+    """
+
+    def __init__(self, dataset, batch_size, seed=None):
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self._batches = dataset.batches(batch_size, seed=seed, epochs=None)
+
+    def size(self):
+        return len(self.dataset)
+
+    def sample(self, batch_size, rng=None):
+        if batch_size != self.batch_size:
+            raise ValueError(f"DatasetReplay streams batches of {self.batch_size}, not {batch_size}")
+        batch = next(self._batches)
+        dones = batch['dones'] * (1 - batch['timeouts'])
+        return batch['obs'], batch['actions'], batch['rewards'], batch['next_obs'], dones
+
+
+def record(path, backend='surrogate', steps=10000, frame_stack=1, chunk_size=1024, seed=0):
+    """Fly a uniformly random policy for `steps` steps and record it to `path`."""
+    from DroneEnvironment import DroneEnv
+    from clients import make_client, make_observation_client
+    client = make_client(backend)
+    env = DatasetRecorder(DroneEnv(client=client, observation_client=make_observation_client(backend, client),
+                                   frame_stack=frame_stack), path, chunk_size)
+    rng = np.random.default_rng(seed)
+    env.reset()
+    for _ in range(steps):
+        if env.step(int(rng.integers(env.action_space.n)))[2]:
+            env.reset()
+    env.close()
+
+
+def train_offline(path, updates=10000, batch_size=32, log_interval=1000):
+    """DQN updates on a recorded dataset alone, with parallel_training's Learner; returns the policy."""
+    from parallel_training import Learner, make_policy
+    dataset = OfflineDataset(path)
+    policy = make_policy(dataset.observation_space, dataset.action_space)
+    learner = Learner(policy, dataset.replay(batch_size), None, batch_size=batch_size)
+    try:
+        while learner.updates < updates:
+            loss = learner.train_step()
+            if learner.updates % log_interval == 0:
+                print(f"updates {learner.updates:7d}  loss {loss:.4f}")
+    finally:
+        dataset.close()
+    return policy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record DroneEnv datasets and train on them offline.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    record_parser = commands.add_parser('record', help="fly a random policy and record its transitions")
+    record_parser.add_argument('path')
+    record_parser.add_argument('--backend', default='surrogate')
+    record_parser.add_argument('--steps', type=int, default=10000)
+    record_parser.add_argument('--frame-stack', type=int, default=1)
+    record_parser.add_argument('--chunk-size', type=int, default=1024, help="frames per compressed chunk")
+    train_parser = commands.add_parser('train', help="DQN updates on a recorded dataset, no simulator needed")
+    train_parser.add_argument('path')
+    train_parser.add_argument('--updates', type=int, default=10000)
+    train_parser.add_argument('--batch-size', type=int, default=32)
+    train_parser.add_argument('--output', default='dqn_drone_offline', help="where to save the trained policy")
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        record(args.path, args.backend, args.steps, args.frame_stack, args.chunk_size)
+    else:
+        train_offline(args.path, args.updates, args.batch_size).save(args.output)
+
+
+if __name__ == "__main__":
+    main()
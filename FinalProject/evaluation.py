@@ -0,0 +1,92 @@
+import numpy as np
+
+# Batched policy evaluation: K episodes run at once on a vectorized env (DroneVecEnv flies K
+# vehicles concurrently), the policy is called once per step for the whole batch, and the
+# per-episode results are kept in flat NumPy columns and saved as one .npz file.
+
+
+class EvaluationResults:
+    """Per-episode evaluation columns, with all trajectories concatenated into one (N, 3) array.
+
+    Episode i's positions are positions[offsets[i]:offsets[i + 1]].
+    """
+
+    COLUMNS = ('rewards', 'lengths', 'success', 'collision', 'offsets', 'positions')
+
+    def __init__(self, rewards, lengths, success, collision, offsets, positions):
+        self.rewards = np.asarray(rewards, dtype=np.float32)
+        self.lengths = np.asarray(lengths, dtype=np.int32)
+        self.success = np.asarray(success, dtype=bool)
+        self.collision = np.asarray(collision, dtype=bool)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.positions = np.asarray(positions, dtype=np.float32).reshape(-1, 3)
+
+    def __len__(self):
+        return len(self.rewards)
+
+    def trajectory(self, episode):
+        return self.positions[self.offsets[episode]:self.offsets[episode + 1]]
+
+    def trajectories(self):
+        return [self.trajectory(episode) for episode in range(len(self))]
+
+    @property
+    def success_rate(self):
+        return float(self.success.mean()) if len(self) else 0.0
+
+    @property
+    def collision_rate(self):
+        return float(self.collision.mean()) if len(self) else 0.0
+
+    def summary(self):
+        return (f"{len(self)} episodes  mean reward {self.rewards.mean():.2f} +/- {self.rewards.std():.2f}  "
+                f"success {self.success_rate:.0%}  collisions {self.collision_rate:.0%}  "
+                f"mean length {self.lengths.mean():.1f}")
+
+    def save(self, path):
+        np.savez(path, **{column: getattr(self, column) for column in self.COLUMNS})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(*(data[column] for column in cls.COLUMNS))
+
+
+def evaluate(policy, venv, num_episodes=10, deterministic=True):
+    """Run num_episodes episodes spread over venv's environments and collect EvaluationResults.
+
+    `policy` is anything with SB3's predict(observations, deterministic=...) (a model or a
+    policy). Each environment runs a fixed share of the episodes, so short episodes don't
+    crowd out long ones. Positions, success and collisions come from the step infos.
+    """
+    num_envs = venv.num_envs
+    targets = np.array([(num_episodes + i) // num_envs for i in range(num_envs)])
+    counts = np.zeros(num_envs, dtype=int)
+    episode_rewards = np.zeros(num_envs)
+    episode_lengths = np.zeros(num_envs, dtype=int)
+    episode_positions = [[] for _ in range(num_envs)]
+    rewards, lengths, success, collision, trajectories = [], [], [], [], []
+
+    observations = venv.reset()
+    while (counts < targets).any():
+        actions, _ = policy.predict(observations, deterministic=deterministic)
+        observations, step_rewards, dones, infos = venv.step(actions)
+        for i in range(num_envs):
+            if counts[i] >= targets[i]:
+                continue
+            episode_rewards[i] += step_rewards[i]
+            episode_lengths[i] += 1
+            if 'position' in infos[i] and not infos[i].get('timeout'):
+                episode_positions[i].append(infos[i]['position'])
+            if dones[i]:
+                rewards.append(episode_rewards[i])
+                lengths.append(episode_lengths[i])
+                success.append(infos[i].get('is_success', False))
+                collision.append(infos[i].get('collision', False))
+                trajectories.append(episode_positions[i])
+                counts[i] += 1
+                episode_rewards[i], episode_lengths[i], episode_positions[i] = 0, 0, []
+
+    offsets = np.concatenate([[0], np.cumsum([len(positions) for positions in trajectories])])
+    positions = [position for positions in trajectories for position in positions]
+    return EvaluationResults(rewards, lengths, success, collision, offsets, positions)
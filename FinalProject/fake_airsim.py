@@ -0,0 +1,347 @@
+import math
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+from clients import MultirotorClientInterface
+
+# In-process stand-in for the subset of the airsim package used by FinalProject.
+# The module mirrors airsim's names (Vector3r, Pose, ImageRequest, MultirotorClient, ...)
+# so it can be imported in its place when no simulator is available.
+
+
+class Vector3r:
+    def __init__(self, x_val=0.0, y_val=0.0, z_val=0.0):
+        self.x_val = x_val
+        self.y_val = y_val
+        self.z_val = z_val
+
+    def __repr__(self):
+        return f"Vector3r({self.x_val}, {self.y_val}, {self.z_val})"
+
+
+class Quaternionr:
+    def __init__(self, x_val=0.0, y_val=0.0, z_val=0.0, w_val=1.0):
+        self.x_val = x_val
+        self.y_val = y_val
+        self.z_val = z_val
+        self.w_val = w_val
+
+
+class Pose:
+    def __init__(self, position_val=None, orientation_val=None):
+        self.position = position_val if position_val is not None else Vector3r()
+        self.orientation = orientation_val if orientation_val is not None else Quaternionr()
+
+
+class KinematicsState:
+    def __init__(self, position, orientation, linear_velocity):
+        self.position = position
+        self.orientation = orientation
+        self.linear_velocity = linear_velocity
+        self.angular_velocity = Vector3r()
+
+
+class CollisionInfo:
+    def __init__(self, has_collided=False):
+        self.has_collided = has_collided
+
+
+class MultirotorState:
+    def __init__(self, kinematics, collision, timestamp):
+        self.kinematics_estimated = kinematics
+        self.collision = collision
+        self.timestamp = timestamp
+
+
+class ImageType:
+    Scene = 0
+    DepthPlanar = 1
+    DepthPerspective = 2
+    DepthVis = 3
+    DisparityNormalized = 4
+    Segmentation = 5
+    SurfaceNormals = 6
+    Infrared = 7
+
+
+class ImageRequest:
+    def __init__(self, camera_name, image_type, pixels_as_float=False, compress=True):
+        self.camera_name = str(camera_name)
+        self.image_type = image_type
+        self.pixels_as_float = pixels_as_float
+        self.compress = compress
+
+
+class ImageResponse:
+    def __init__(self, image_data_float, width, height, image_type, time_stamp, image_data_uint8=b''):
+        self.image_data_float = image_data_float
+        self.image_data_uint8 = image_data_uint8
+        self.width = width
+        self.height = height
+        self.image_type = image_type
+        self.time_stamp = time_stamp
+
+
+def to_eularian_angles(q):
+    """Same convention as airsim.to_eularian_angles: returns (pitch, roll, yaw) in radians."""
+    z = q.z_val
+    y = q.y_val
+    x = q.x_val
+    w = q.w_val
+    ysqr = y * y
+
+    t0 = +2.0 * (w * x + y * z)
+    t1 = +1.0 - 2.0 * (x * x + ysqr)
+    roll = math.atan2(t0, t1)
+
+    t2 = +2.0 * (w * y - z * x)
+    t2 = max(-1.0, min(1.0, t2))
+    pitch = math.asin(t2)
+
+    t3 = +2.0 * (w * z + x * y)
+    t4 = +1.0 - 2.0 * (ysqr + z * z)
+    yaw = math.atan2(t3, t4)
+
+    return (pitch, roll, yaw)
+
+
+def to_quaternion(pitch, roll, yaw):
+    t0 = math.cos(yaw * 0.5)
+    t1 = math.sin(yaw * 0.5)
+    t2 = math.cos(roll * 0.5)
+    t3 = math.sin(roll * 0.5)
+    t4 = math.cos(pitch * 0.5)
+    t5 = math.sin(pitch * 0.5)
+
+    q = Quaternionr()
+    q.w_val = t0 * t2 * t4 + t1 * t3 * t5
+    q.x_val = t0 * t3 * t4 - t1 * t2 * t5
+    q.y_val = t0 * t2 * t5 + t1 * t3 * t4
+    q.z_val = t1 * t2 * t4 - t0 * t3 * t5
+    return q
+
+
+class YawMode:
+    def __init__(self, is_rate=True, yaw_or_rate=0.0):
+        self.is_rate = is_rate
+        self.yaw_or_rate = yaw_or_rate
+
+
+class DrivetrainType:
+    MaxDegreeOfFreedom = 0
+    ForwardOnly = 1
+
+
+class Future:
+    """Stand-in for the msgpack-rpc future returned by the *Async calls.
+
+    join() blocks until the wall-clock time `ready_at` (time.perf_counter) has passed, so a
+    client with a finite clock speed behaves like a real simulator executing the command.
+    """
+
+    def __init__(self, result=None, ready_at=None):
+        self.result = result
+        self.ready_at = ready_at
+
+    def join(self):
+        if self.ready_at is not None:
+            remaining = self.ready_at - time.perf_counter()
+            if remaining > 0:
+                time.sleep(remaining)
+        return self.result
+
+
+class VehicleState:
+    """Ground-truth kinematic state of one fake vehicle."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, clock=0.0):
+        self.position = np.zeros(3)
+        self.velocity = np.zeros(3)
+        self.yaw = 0.0  # radians
+        self.has_collided = False
+        self.clock = clock  # simulated time at which the vehicle's last command ends
+
+
+class MultirotorClient(MultirotorClientInterface):
+    """Fake airsim.MultirotorClient with instantaneous kinematics and a constant depth camera.
+
+    Every vehicle named in `vehicle_names` gets its own state, so the same client can drive
+    several vehicles exactly like a real multi-vehicle AirSim session. `rpc_delay` adds a
+    blocking sleep to each call to mimic the round trip to the simulator. With a `clock_speed`
+    the futures of motion commands only complete after the commanded simulated time has
+    elapsed at that speed; by default they complete immediately. With `binary_images` float
+    images arrive as raw float32 bytes in image_data_uint8 instead of a list of floats.
+
+    Vehicles fly concurrently: each keeps its own command clock and the simulation time is the
+    latest of them. While paused (simPause) commands take effect but time stands still until
+    simContinueForTime advances it.
+    """
+
+    def __init__(self, ip="", port=41451, timeout_value=3600, vehicle_names=("",),
+                 image_size=(32, 32), depth=10.0, rpc_delay=0.0, takeoff_z=-3.0, clock_speed=None,
+                 binary_images=False):
+        self.vehicles = {name: VehicleState() for name in vehicle_names}
+        self.image_width, self.image_height = image_size
+        self.depth = depth
+        self.rpc_delay = rpc_delay
+        self.takeoff_z = takeoff_z
+        self.clock_speed = clock_speed
+        self.binary_images = binary_images
+        self.sim_time = 0.0
+        self.paused = False
+        self._running_until = 0.0  # wall time at which a simContinueForTime period ends
+        self.call_counts = Counter()
+        self._lock = threading.Lock()  # the pipeline may query from a second thread
+
+    def _rpc(self, name):
+        with self._lock:
+            self.call_counts[name] += 1
+        if self.rpc_delay:
+            time.sleep(self.rpc_delay)
+
+    def _vehicle(self, vehicle_name):
+        if vehicle_name not in self.vehicles:
+            self.vehicles[vehicle_name] = VehicleState()
+        return self.vehicles[vehicle_name]
+
+    def _advance(self, vehicle, seconds):
+        """Account for a command taking `seconds` of simulated time and return its future."""
+        if self.paused:
+            return Future(True)
+        vehicle.clock = max(vehicle.clock, self.sim_time - seconds) + seconds
+        self.sim_time = max(self.sim_time, vehicle.clock)
+        if self.clock_speed is None:
+            return Future(True)
+        return Future(True, time.perf_counter() + seconds / self.clock_speed)
+
+    # Connection and arming
+    def confirmConnection(self):
+        self._rpc('confirmConnection')
+
+    def enableApiControl(self, is_enabled, vehicle_name=''):
+        self._rpc('enableApiControl')
+
+    def armDisarm(self, arm, vehicle_name=''):
+        self._rpc('armDisarm')
+        return True
+
+    def reset(self):
+        self._rpc('reset')
+        for vehicle in self.vehicles.values():
+            vehicle.reset(self.sim_time)
+
+    def simPause(self, is_paused):
+        self._rpc('simPause')
+        self.paused = is_paused
+
+    def simIsPause(self):
+        self._rpc('simIsPause')
+        return self.paused and time.perf_counter() >= self._running_until
+
+    def simContinueForTime(self, seconds):
+        self._rpc('simContinueForTime')
+        self.sim_time += seconds
+        for vehicle in self.vehicles.values():
+            vehicle.clock = max(vehicle.clock, self.sim_time)
+        self.paused = True
+        wall_seconds = seconds / self.clock_speed if self.clock_speed is not None else 0.0
+        self._running_until = time.perf_counter() + wall_seconds
+
+    # State queries
+    def simGetVehiclePose(self, vehicle_name=''):
+        self._rpc('simGetVehiclePose')
+        vehicle = self._vehicle(vehicle_name)
+        return Pose(Vector3r(*vehicle.position), to_quaternion(0, 0, vehicle.yaw))
+
+    def getMultirotorState(self, vehicle_name=''):
+        self._rpc('getMultirotorState')
+        vehicle = self._vehicle(vehicle_name)
+        kinematics = KinematicsState(Vector3r(*vehicle.position), to_quaternion(0, 0, vehicle.yaw),
+                                     Vector3r(*vehicle.velocity))
+        return MultirotorState(kinematics, CollisionInfo(vehicle.has_collided), int(self.sim_time * 1e9))
+
+    def simSetVehiclePose(self, pose, ignore_collision, vehicle_name=''):
+        self._rpc('simSetVehiclePose')
+        vehicle = self._vehicle(vehicle_name)
+        vehicle.position[:] = (pose.position.x_val, pose.position.y_val, pose.position.z_val)
+        vehicle.velocity[:] = 0.0
+        vehicle.yaw = to_eularian_angles(pose.orientation)[2]
+        vehicle.has_collided = False
+
+    def simGetCollisionInfo(self, vehicle_name=''):
+        self._rpc('simGetCollisionInfo')
+        return CollisionInfo(self._vehicle(vehicle_name).has_collided)
+
+    def simGetImages(self, requests, vehicle_name=''):
+        self._rpc('simGetImages')
+        vehicle = self._vehicle(vehicle_name)
+        return [self._render(request, vehicle) for request in requests]
+
+    def _render(self, request, vehicle):
+        depth = np.full(self.image_width * self.image_height, self.depth, dtype=np.float32)
+        return self._response(request, depth, self.image_width, self.image_height)
+
+    def _response(self, request, depth, width, height):
+        if self.binary_images:
+            return ImageResponse([], width, height, request.image_type, int(self.sim_time * 1e9), depth.tobytes())
+        return ImageResponse(depth.ravel().tolist(), width, height, request.image_type, int(self.sim_time * 1e9))
+
+    # Motion commands
+    def _fly(self, vehicle, target, seconds):
+        """Move a vehicle straight to target over the given simulated time."""
+        target = np.asarray(target, dtype=float)
+        vehicle.velocity[:] = (target - vehicle.position) / max(seconds, 1e-6)
+        vehicle.position[:] = target
+        return self._advance(vehicle, seconds)
+
+    def takeoffAsync(self, timeout_sec=20, vehicle_name=''):
+        self._rpc('takeoffAsync')
+        vehicle = self._vehicle(vehicle_name)
+        target = (vehicle.position[0], vehicle.position[1], self.takeoff_z)
+        return self._fly(vehicle, target, abs(self.takeoff_z - vehicle.position[2]))
+
+    def landAsync(self, timeout_sec=60, vehicle_name=''):
+        self._rpc('landAsync')
+        vehicle = self._vehicle(vehicle_name)
+        return self._fly(vehicle, (vehicle.position[0], vehicle.position[1], 0.0), abs(vehicle.position[2]))
+
+    def moveToZAsync(self, z, velocity, timeout_sec=3e38, yaw_mode=None, lookahead=-1,
+                     adaptive_lookahead=1, vehicle_name=''):
+        self._rpc('moveToZAsync')
+        vehicle = self._vehicle(vehicle_name)
+        seconds = abs(z - vehicle.position[2]) / max(velocity, 1e-6)
+        return self._fly(vehicle, (vehicle.position[0], vehicle.position[1], z), seconds)
+
+    def moveToPositionAsync(self, x, y, z, velocity, timeout_sec=3e38, drivetrain=None, yaw_mode=None,
+                            lookahead=-1, adaptive_lookahead=1, vehicle_name=''):
+        self._rpc('moveToPositionAsync')
+        vehicle = self._vehicle(vehicle_name)
+        target = np.array([x, y, z], dtype=float)
+        return self._fly(vehicle, target, np.linalg.norm(target - vehicle.position) / max(velocity, 1e-6))
+
+    def moveByVelocityAsync(self, vx, vy, vz, duration, drivetrain=None, yaw_mode=None, vehicle_name=''):
+        self._rpc('moveByVelocityAsync')
+        vehicle = self._vehicle(vehicle_name)
+        return self._fly(vehicle, vehicle.position + np.array([vx, vy, vz]) * duration, duration)
+
+    def moveByVelocityZAsync(self, vx, vy, z, duration, drivetrain=None, yaw_mode=None, vehicle_name=''):
+        self._rpc('moveByVelocityZAsync')
+        vehicle = self._vehicle(vehicle_name)
+        if yaw_mode is not None and not yaw_mode.is_rate:
+            vehicle.yaw = math.atan2(math.sin(math.radians(yaw_mode.yaw_or_rate)),
+                                     math.cos(math.radians(yaw_mode.yaw_or_rate)))
+        target = (vehicle.position[0] + vx * duration, vehicle.position[1] + vy * duration, z)
+        return self._fly(vehicle, target, duration)
+
+    def rotateToYawAsync(self, yaw, timeout_sec=3e38, margin=5, vehicle_name=''):
+        self._rpc('rotateToYawAsync')
+        vehicle = self._vehicle(vehicle_name)
+        vehicle.yaw = math.atan2(math.sin(math.radians(yaw)), math.cos(math.radians(yaw)))
+        vehicle.velocity[:] = 0.0
+        return self._advance(vehicle, min(timeout_sec, 1.0))
@@ -1,11 +1,22 @@
+import argparse
 import matplotlib.pyplot as plt
 from stable_baselines3 import DQN
-from stable_baselines3.common.evaluation import evaluate_policy
+from checkpoint import Checkpointer, PeriodicCheckpoint
 from DroneEnvironment import DroneEnv
+from DroneVecEnvironment import DroneVecEnv
+from clients import BACKENDS, make_client, make_observation_client
+from dataset import DatasetRecorder, OfflineDataset
+from evaluation import evaluate
+from profiling import StepProfiler
+from prioritized_replay import PrioritizedDQN, PrioritizedFrameReplayBuffer
+from replay import FrameReplayBuffer
+from sim_clock import SimPauseCallback
+from telemetry import TelemetryWriter, episode_returns, episode_trajectories, load_telemetry
 import numpy as np
 
 
-def plot_rewards(rewards):
+def plot_rewards(telemetry_path):
+    _, rewards = episode_returns(load_telemetry(telemetry_path))
     plt.figure(figsize=(10, 5))
     plt.plot(rewards, label='Rewards per Episode')
     plt.xlabel('Episode')
@@ -15,14 +26,16 @@ def plot_rewards(rewards):
     plt.grid(True)
     plt.show()
 
-def plot_trajectories(positions):
+def plot_trajectories(telemetry_path):
+    # Trajectories are sliced from the memory-mapped telemetry one episode at a time
+    positions = (trajectory for _, trajectory in episode_trajectories(load_telemetry(telemetry_path)))
     plt.figure(figsize=(14, 7))
     ax_x = plt.subplot(1, 3, 1)
     ax_y = plt.subplot(1, 3, 2)
     ax_z = plt.subplot(1, 3, 3)
     
     for pos in positions:
-        x_vals, y_vals, z_vals = zip(*pos)
+        x_vals, y_vals, z_vals = pos.T
         ax_x.plot(x_vals, label='X Position')
         ax_y.plot(y_vals, label='Y Position')
         ax_z.plot(z_vals, label='Z Position')
@@ -45,41 +58,117 @@ def plot_trajectories(positions):
     plt.tight_layout()
     plt.show()
     
-def main():
-    env = DroneEnv()
-    model = DQN("CnnPolicy", env, verbose=1, buffer_size=10000, learning_starts=1000)
+def make_eval_env(backend, num_envs, frame_stack=1, telemetry=None):
+    """Vectorized env flying num_envs vehicles at once for evaluation.
+
+    In-process backends create the vehicles themselves; AirSim needs them listed in
+    settings.json as Drone1, Drone2, ... (a single evaluation env uses the default vehicle).
+    """
+    names = [''] if num_envs == 1 else [f'Drone{i + 1}' for i in range(num_envs)]
+    client = make_client(backend) if backend == 'airsim' else make_client(backend, vehicle_names=names)
+    # Frames are stacked like in training, the first frame of an episode repeated
+    return DroneVecEnv(names, client=client, telemetry=telemetry, frame_stack=frame_stack)
 
-    # Start training
-    model.learn(total_timesteps=250)
 
-    # Log rewards and positions for evaluation
-    reward_log = []
-    all_positions = []
-    for i in range(10):  # Example: 10 episodes
-        obs = env.reset()
-        done = False
-        total_reward = 0
-        positions = []  # Store positions for the current episode
-        while not done:
-            action, _states = model.predict(obs, deterministic=True)
-            obs, reward, done, info = env.step(action)
-            total_reward += reward
-            pose = env.client.simGetVehiclePose().position
-            positions.append((pose.x_val, pose.y_val, pose.z_val))  # Store the tuple of x, y, z positions
-        reward_log.append(total_reward)
-        all_positions.append(positions)
-        print(f'Episode {i+1}: Total Reward: {total_reward}')
+def main(backend='airsim', frame_stack=1, eval_envs=1, results_path='evaluation.npz',
+         telemetry_path='telemetry.npy', eval_telemetry_path='evaluation_telemetry.npy', profile_path=None,
+         clock_speed=None, lockstep=False, record_path=None, prefill_path=None, checkpoint_dir=None,
+         checkpoint_every=1000, resume=False, total_timesteps=250, prioritized=False, n_steps=1):
+    # Checkpoints of model, replay buffer and RNG states go to checkpoint_dir, see checkpoint.py
+    checkpointer = Checkpointer(checkpoint_dir) if checkpoint_dir else None
+    resumed = resume and checkpointer is not None and checkpointer.manifest is not None
+    # AirSim reads its ClockSpeed from settings.json at launch; the in-process backends take it here
+    client = make_client(backend, clock_speed=clock_speed) if backend != 'airsim' and clock_speed else \
+        make_client(backend)
+    # per-step training records, streamed to disk; a resumed run drops those logged after its checkpoint
+    telemetry = TelemetryWriter(telemetry_path,
+                                rows=checkpointer.manifest['extra']['telemetry_rows'] if resumed else None)
+    profiler = StepProfiler() if profile_path else None
+    env = DroneEnv(client=client, observation_client=make_observation_client(backend, client),
+                   frame_stack=frame_stack, telemetry=telemetry, profiler=profiler, clock_speed=clock_speed,
+                   lockstep=lockstep)
+    if record_path:
+        env = DatasetRecorder(env, record_path)  # keep the flown transitions for offline reuse
+    # uint8 observations stored once per frame, see replay.py; prioritized sampling, see prioritized_replay.py
+    algorithm, buffer_class = (PrioritizedDQN, PrioritizedFrameReplayBuffer) if prioritized else \
+        (DQN, FrameReplayBuffer)
+    if resumed:
+        # The saved episode starts over from the same pose, so training continues where it stopped
+        model = checkpointer.load(algorithm, env)
+    else:
+        model = algorithm("CnnPolicy", env, verbose=1, buffer_size=10000, learning_starts=1000,
+                          replay_buffer_class=buffer_class,
+                          replay_buffer_kwargs=dict(frame_stack=frame_stack, n_steps=n_steps))
+    if prefill_path and not resumed:
+        # Start from recorded experience: learning begins right away instead of after learning_starts steps
+        dataset = OfflineDataset(prefill_path)
+        dataset.fill_replay_buffer(model.replay_buffer, model.buffer_size)
+        dataset.close()
+        model.learning_starts = 0
+
+    # Start training
+    # The simulator is held still during gradient updates (lockstep already keeps it paused)
+    callbacks = [] if lockstep else [SimPauseCallback(env.client)]
+    if checkpointer is not None:
+        def telemetry_rows():
+            telemetry.flush()
+            return {'telemetry_rows': telemetry.rows}
+        callbacks.append(PeriodicCheckpoint(checkpointer, checkpoint_every, extra=telemetry_rows, verbose=1))
+    model.learn(total_timesteps=total_timesteps - model.num_timesteps, callback=callbacks,
+                reset_num_timesteps=not resumed)
 
     # Save the model
     model.save("dqn_drone")
+    env.close()
+    telemetry.close()
+    if profiler is not None:
+        profiler.save(profile_path)
+        print(profiler.report())
 
-    # Evaluate and display results
-    mean_reward, std_reward = evaluate_policy(model, model.get_env(), n_eval_episodes=10)
-    print(f'Mean reward: {mean_reward}, Std reward: {std_reward}')
+    # Evaluate: episodes run eval_envs at a time, one batched predict per step
+    with TelemetryWriter(eval_telemetry_path) as eval_telemetry:
+        eval_env = make_eval_env(backend, eval_envs, frame_stack, eval_telemetry)
+        results = evaluate(model, eval_env, num_episodes=10)
+        eval_env.close()
+    results.save(results_path)
+    for i, reward in enumerate(results.rewards):
+        print(f'Episode {i+1}: Total Reward: {reward}')
+    print(results.summary())
 
-    # Plot the rewards and average trajectories
-    plot_rewards(reward_log)
-    plot_trajectories(all_positions)  # Plot trajectories for each episode
+    # Plot the rewards and trajectories from the evaluation telemetry
+    plot_rewards(eval_telemetry_path)
+    plot_trajectories(eval_telemetry_path)  # Plot trajectories for each episode
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Train and evaluate the DQN drone agent.")
+    parser.add_argument('--backend', choices=BACKENDS, default='airsim',
+                        help="simulator to fly against; 'surrogate' needs no Unreal/AirSim install")
+    parser.add_argument('--frame-stack', type=int, default=1,
+                        help="stack this many consecutive depth frames per observation")
+    parser.add_argument('--eval-envs', type=int, default=1,
+                        help="evaluation episodes flown concurrently (AirSim: vehicles Drone1..N in settings.json)")
+    parser.add_argument('--results', default='evaluation.npz', help="where to write the evaluation results")
+    parser.add_argument('--telemetry', default='telemetry.npy', help="where to stream per-step training telemetry")
+    parser.add_argument('--profile', help="time the training steps and save the profile here "
+                                           "(inspect with: python -m profiling report PATH)")
+    parser.add_argument('--clock-speed', type=float,
+                        help="simulated seconds per wall-clock second (default: ClockSpeed in settings.json, "
+                             "which AirSim itself reads at launch)")
+    parser.add_argument('--lockstep', action='store_true',
+                        help="keep the simulator paused between steps and run each action with simContinueForTime")
+    parser.add_argument('--record', help="also record the training transitions as a dataset in this directory")
+    parser.add_argument('--prefill', help="pre-fill the replay buffer from a dataset directory (see dataset.py)")
+    parser.add_argument('--checkpoint-dir', help="save resumable training checkpoints in this directory")
+    parser.add_argument('--checkpoint-every', type=int, default=1000,
+                        help="training steps between checkpoints (taken at the next episode boundary)")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue training from the latest checkpoint in --checkpoint-dir, if there is one")
+    parser.add_argument('--timesteps', type=int, default=250, help="total training steps")
+    parser.add_argument('--prioritized', action='store_true',
+                        help="sample replay in proportion to TD error (PrioritizedDQN, see prioritized_replay.py)")
+    parser.add_argument('--n-steps', type=int, default=1, help="bootstrap targets from n-step returns")
+    args = parser.parse_args()
+    main(args.backend, args.frame_stack, args.eval_envs, args.results, args.telemetry, profile_path=args.profile,
+         clock_speed=args.clock_speed, lockstep=args.lockstep, record_path=args.record, prefill_path=args.prefill,
+         checkpoint_dir=args.checkpoint_dir, checkpoint_every=args.checkpoint_every, resume=args.resume,
+         total_timesteps=args.timesteps, prioritized=args.prioritized, n_steps=args.n_steps)
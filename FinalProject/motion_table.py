@@ -0,0 +1,204 @@
+import numpy as np
+
+from movements import ACTIONS, action_async, yaw_from_pose
+from telemetry import episode_groups
+
+try:
+    import airsim
+except ImportError:  # no simulator package installed, fall back to the in-process fake
+    import fake_airsim as airsim
+
+# Lookup table of what each discrete action (movements.ACTIONS) does to the vehicle's pose, for
+# planning and model-based rollouts without a simulator. Poses are (N, 4) arrays of
+# (x, y, z, yaw in degrees), the telemetry columns, and one batched lookup moves them all:
+#
+#   table = MotionTable.probe(SurrogateClient(world=BlocksWorld([], [])))   # or MotionTable.fit(records)
+#   next_poses, seconds = table.predict_next_pose(poses, actions)
+#   trajectories, seconds = table.rollout(poses, action_sequences)
+#
+# Cells are keyed by (action, yaw bin, altitude band) and hold the displacement in the frame of
+# the starting heading (forward, right, down), the yaw change and the simulated duration. The
+# table models free flight only: collisions depend on the world and are left to the caller.
+
+POSE_COLUMNS = ('x', 'y', 'z', 'yaw')
+DELTA_COLUMNS = ('forward', 'right', 'down', 'yaw_change')
+
+
+def wrap_degrees(angles):
+    """Angles in degrees wrapped to [-180, 180)."""
+    return (np.asarray(angles) + 180.0) % 360.0 - 180.0
+
+
+class MotionTable:
+    """Pose change and duration of each action per (yaw bin, altitude band).
+
+    Yaw bins are `yaw_bins` equal sectors centred on multiples of 360 / yaw_bins degrees (the
+    45 degree turns of ACTIONS keep a vehicle on those centres). Altitude bands are split at
+    `z_edges` (NED metres, ascending), with open bands below the first and above the last edge.
+    """
+
+    def __init__(self, yaw_bins=8, z_edges=np.arange(-30.0, 0.5, 1.0), num_actions=len(ACTIONS)):
+        self.yaw_bins = yaw_bins
+        self.z_edges = np.asarray(z_edges, dtype=np.float64)
+        self.num_actions = num_actions
+        shape = (num_actions, yaw_bins, len(self.z_edges) + 1)
+        self.deltas = np.zeros(shape + (len(DELTA_COLUMNS),))
+        self.seconds = np.zeros(shape)
+        self.counts = np.zeros(shape, dtype=np.int64)  # samples behind each cell; 0 for nominal cells
+
+    @classmethod
+    def nominal(cls, **kwargs):
+        """Table of the commanded motions of ACTIONS: rotate first, then fly at speed for the duration."""
+        table = cls(**kwargs)
+        for action, (yaw_change, duration, speed, z_change) in enumerate(ACTIONS):
+            distance = 0.0 if speed is None else speed * duration
+            heading = np.radians(yaw_change)
+            table.deltas[action] = (distance * np.cos(heading), distance * np.sin(heading), z_change, yaw_change)
+            # The blocking primitives join the rotation (at most its duration) before they translate
+            table.seconds[action] = duration * (2 if yaw_change and speed is not None else 1)
+        return table
+
+    def yaw_centers(self):
+        return np.arange(self.yaw_bins) * (360.0 / self.yaw_bins)
+
+    def z_centers(self):
+        """A representative altitude per band: its midpoint, or half a band beyond the outer edges."""
+        edges = self.z_edges
+        width = edges[1] - edges[0] if len(edges) > 1 else 1.0
+        return np.concatenate([[edges[0] - width / 2], (edges[:-1] + edges[1:]) / 2, [edges[-1] + width / 2]])
+
+    def cells(self, poses):
+        """(yaw bin, altitude band) indices of (N, 4) poses."""
+        poses = np.asarray(poses)
+        yaw_bins = np.rint(poses[:, 3] * (self.yaw_bins / 360.0)).astype(np.int64) % self.yaw_bins
+        return yaw_bins, np.searchsorted(self.z_edges, poses[:, 2], side='right')
+
+    def predict_next_pose(self, poses, actions):
+        """(next poses, simulated seconds) after taking actions (N,) from poses (N, 4)."""
+        poses = np.asarray(poses, dtype=np.float64)
+        yaw_bins, bands = self.cells(poses)
+        # One gather of whole rows from the flattened table
+        cells = (np.asarray(actions) * self.yaw_bins + yaw_bins) * self.counts.shape[2] + bands
+        deltas = self.deltas.reshape(-1, len(DELTA_COLUMNS)).take(cells, axis=0)
+        yaw = np.radians(poses[:, 3])
+        cos, sin = np.cos(yaw), np.sin(yaw)
+        next_poses = poses + deltas
+        # Rotate the horizontal displacement from the heading's frame into the world frame
+        next_poses[:, 0] += (cos - 1.0) * deltas[:, 0] - sin * deltas[:, 1]
+        next_poses[:, 1] += sin * deltas[:, 0] + (cos - 1.0) * deltas[:, 1]
+        next_poses[:, 3] = wrap_degrees(next_poses[:, 3])
+        return next_poses, self.seconds.reshape(-1).take(cells)
+
+    def rollout(self, poses, action_sequences):
+        """Imagined open-loop rollouts: (steps + 1, N, 4) poses and (steps, N) seconds for (N, steps) actions."""
+        action_sequences = np.asarray(action_sequences)
+        poses = np.asarray(poses, dtype=np.float64)
+        trajectories = np.empty((action_sequences.shape[1] + 1,) + poses.shape)
+        seconds = np.empty(action_sequences.shape[::-1])
+        trajectories[0] = poses
+        for step in range(action_sequences.shape[1]):
+            trajectories[step + 1], seconds[step] = self.predict_next_pose(trajectories[step], action_sequences[:, step])
+        return trajectories, seconds
+
+    def fill(self, poses, actions, next_poses, seconds=None):
+        """Set each sampled cell to the median of its observed transitions; other cells keep their values.
+
+        The median ignores the odd transition cut short by an obstacle. Durations are set only
+        when `seconds` is given.
+        """
+        poses, next_poses = np.asarray(poses, dtype=np.float64), np.asarray(next_poses, dtype=np.float64)
+        actions = np.asarray(actions)
+        yaw_bins, bands = self.cells(poses)
+        cells = np.ravel_multi_index((actions, yaw_bins, bands), self.counts.shape)
+        yaw = np.radians(poses[:, 3])
+        cos, sin = np.cos(yaw), np.sin(yaw)
+        dx, dy = next_poses[:, 0] - poses[:, 0], next_poses[:, 1] - poses[:, 1]
+        # World displacement rotated into the starting heading's frame
+        columns = [cos * dx + sin * dy, -sin * dx + cos * dy, next_poses[:, 2] - poses[:, 2],
+                   wrap_degrees(next_poses[:, 3] - poses[:, 3])]
+        flat = self.deltas.reshape(-1, len(DELTA_COLUMNS))
+        targets = [(flat, column) for column in range(len(columns))]
+        if seconds is not None:
+            columns.append(np.asarray(seconds, dtype=np.float64))
+            targets.append((self.seconds.reshape(-1, 1), 0))
+
+        sampled, counts = np.unique(cells, return_counts=True)
+        starts = np.r_[0, np.cumsum(counts)[:-1]]
+        for values, (target, column) in zip(columns, targets):
+            # Sorted by cell, then value: each cell's (lower) median sits halfway through its run
+            order = np.lexsort((values, cells))
+            target[sampled, column] = values[order][starts + (counts - 1) // 2]
+        self.counts.reshape(-1)[sampled] = counts
+        return self
+
+    @classmethod
+    def fit(cls, records, prior=None, blocked_fraction=0.1, **kwargs):
+        """Table learned from logged telemetry records (telemetry.py), on top of `prior` (default: nominal).
+
+        Each step is paired with the record before it in its episode. Steps cut short by an
+        obstacle are left out: the step that ends an episode, and translations that covered less
+        than `blocked_fraction` of the prior's distance (a vehicle pinned against a box). Telemetry
+        has no simulated durations, so those keep the prior's.
+        """
+        table = cls.nominal(**kwargs) if prior is None else prior.copy()
+        _, order, starts = episode_groups(records)
+        poses = np.column_stack([np.asarray(records[column])[order] for column in POSE_COLUMNS]).astype(np.float64)
+        actions = np.asarray(records['action'])[order]
+        ends = np.r_[starts[1:], len(order)] - 1
+        # Step records only; an episode's first record is its reset record, the start pose
+        usable = actions >= 0
+        usable[starts] = False
+        usable[ends] = False
+        steps = np.flatnonzero(usable)
+        expected, _ = table.predict_next_pose(poses[steps - 1], actions[steps])
+        expected_distance = np.linalg.norm(expected[:, :3] - poses[steps - 1, :3], axis=1)
+        distance = np.linalg.norm(poses[steps, :3] - poses[steps - 1, :3], axis=1)
+        steps = steps[distance >= blocked_fraction * expected_distance]
+        return table.fill(poses[steps - 1], actions[steps], poses[steps])
+
+    @classmethod
+    def probe(cls, client, position=(0.0, 0.0), chain_rotation=False, vehicle_name='', **kwargs):
+        """Table measured by flying every action once from the centre of every cell.
+
+        The vehicle is teleported to each start pose at the given (x, y), so `client` should fly
+        in free space (e.g. a SurrogateClient with an empty BlocksWorld). Actions run through
+        movements.action_async; chain_rotation=False matches DroneEnv's blocking primitives.
+        """
+        table = cls(**kwargs)
+        client.enableApiControl(True, vehicle_name=vehicle_name)
+        client.armDisarm(True, vehicle_name=vehicle_name)
+        yaw_centers, z_centers = table.yaw_centers(), table.z_centers()
+        poses, actions, next_poses, seconds = [], [], [], []
+        for action in range(table.num_actions):
+            for yaw in yaw_centers:
+                for z in z_centers:
+                    start = airsim.Pose(airsim.Vector3r(position[0], position[1], z),
+                                        airsim.to_quaternion(0, 0, np.radians(yaw)))
+                    client.simSetVehiclePose(start, True, vehicle_name=vehicle_name)
+                    started = client.getMultirotorState(vehicle_name=vehicle_name).timestamp
+                    future, _ = action_async(client, action, yaw, z, vehicle_name, chain_rotation)
+                    future.join()
+                    state = client.getMultirotorState(vehicle_name=vehicle_name)
+                    end = state.kinematics_estimated
+                    poses.append((position[0], position[1], z, yaw))
+                    actions.append(action)
+                    next_poses.append((end.position.x_val, end.position.y_val, end.position.z_val,
+                                       yaw_from_pose(airsim.Pose(end.position, end.orientation))))
+                    seconds.append((state.timestamp - started) * 1e-9)
+        return table.fill(poses, actions, next_poses, seconds)
+
+    def copy(self):
+        table = MotionTable(self.yaw_bins, self.z_edges, self.num_actions)
+        table.deltas[:], table.seconds[:], table.counts[:] = self.deltas, self.seconds, self.counts
+        return table
+
+    def save(self, path):
+        np.savez(path, yaw_bins=self.yaw_bins, z_edges=self.z_edges, deltas=self.deltas, seconds=self.seconds,
+                 counts=self.counts)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            table = cls(int(data['yaw_bins']), data['z_edges'], len(data['deltas']))
+            table.deltas[:], table.seconds[:], table.counts[:] = data['deltas'], data['seconds'], data['counts']
+        return table
@@ -1,10 +1,64 @@
-import airsim
+try:
+    import airsim
+except ImportError:  # no simulator package installed, fall back to the in-process fake
+    import fake_airsim as airsim
 import time
 import math
 
 
-def move_forward(client, duration, speed):
-    current_yaw = get_current_yaw(client)
+# Discrete actions used by DroneEnv, as (yaw_change [deg], duration [s], speed [m/s], z_change [m]).
+# A speed of None means rotate in place; z follows AirSim's NED convention so negative climbs.
+ACTIONS = [
+    (0, 1, 2.5, 0),      # move_forward(client, 1, 2.5)
+    (45, 2, 5, -5),      # move_45_degrees_right_up(client, 2, 5)
+    (-45, 2, 5, -5),     # move_45_degrees_left_up(client, 2, 5)
+    (45, 2, 2, 5),       # move_45_degrees_right_down(client, 2, 2)
+    (-45, 2, 2, 5),      # move_45_degrees_left_down(client, 2, 2)
+    (45, 1, None, 0),    # rotate_45_degrees_right(client, 1)
+    (-45, 1, None, 0),   # rotate_45_degrees_left(client, 1)
+]
+
+
+def rotate_to_yaw_async(client, target_yaw, duration, vehicle_name=''):
+    """Start rotating to target_yaw (degrees) and return the future without waiting on it."""
+    return client.rotateToYawAsync(target_yaw, timeout_sec=duration, vehicle_name=vehicle_name)
+
+
+def move_along_yaw_async(client, yaw, duration, speed, z, vehicle_name='', turn=False):
+    """Start flying along heading yaw (degrees) at altitude z and return the future without waiting on it.
+
+    With turn=True the command also carries yaw as an absolute yaw_mode, so the simulator turns
+    the nose while it flies instead of needing a separate rotateToYawAsync first.
+    """
+    vx = speed * math.cos(math.radians(yaw))
+    vy = speed * math.sin(math.radians(yaw))
+    if turn:
+        return client.moveByVelocityZAsync(vx=vx, vy=vy, z=z, duration=duration,
+                                           yaw_mode=airsim.YawMode(False, yaw), vehicle_name=vehicle_name)
+    return client.moveByVelocityZAsync(vx=vx, vy=vy, z=z, duration=duration, vehicle_name=vehicle_name)
+
+
+def action_async(client, action, yaw, z, vehicle_name='', chain_rotation=True):
+    """Start discrete action `action` (an index into ACTIONS) from heading yaw (degrees) and altitude z.
+
+    Returns (future, seconds): the future of the last command issued and the simulated time it
+    runs for. The caller supplies yaw and z, so no state RPCs are made here. With chain_rotation
+    the yawing moves are sent as one turning translation; otherwise the rotation is joined first,
+    exactly like the blocking primitives.
+    """
+    yaw_change, duration, speed, z_change = ACTIONS[action]
+    target_yaw = yaw + yaw_change
+    if speed is None:
+        return rotate_to_yaw_async(client, target_yaw, duration, vehicle_name), duration
+    if yaw_change and not chain_rotation:
+        rotate_to_yaw_async(client, target_yaw, duration, vehicle_name).join()
+    future = move_along_yaw_async(client, target_yaw, duration, speed, z + z_change, vehicle_name,
+                                  turn=bool(yaw_change) and chain_rotation)
+    return future, duration
+
+
+def move_forward(client, duration, speed, vehicle_name=''):
+    current_yaw = get_current_yaw(client, vehicle_name)
     # Convert yaw to radians for calculation
     yaw_radians = math.radians(current_yaw)
     # Calculate velocity components based on the drone's orientation
@@ -12,96 +66,99 @@ def move_forward(client, duration, speed):
     vy = math.sin(yaw_radians) * speed
     # Command to move in the direction of the nose
     #print(f"Moving forward with vx: {vx}, vy: {vy}, yaw: {current_yaw}")
-    client.moveByVelocityZAsync(vx=vx, vy=vy, z=client.getMultirotorState().kinematics_estimated.position.z_val, duration=duration).join()
+    client.moveByVelocityZAsync(vx=vx, vy=vy, z=client.getMultirotorState(vehicle_name=vehicle_name).kinematics_estimated.position.z_val, duration=duration, vehicle_name=vehicle_name).join()
 
-def get_current_yaw(client):
-    orientation = client.simGetVehiclePose().orientation
-    euler_angles = airsim.to_eularian_angles(orientation)
+def get_current_yaw(client, vehicle_name=''):
+    return yaw_from_pose(client.simGetVehiclePose(vehicle_name=vehicle_name))
+
+def yaw_from_pose(pose):
+    """Yaw in degrees of an already fetched pose."""
+    euler_angles = airsim.to_eularian_angles(pose.orientation)
     yaw = math.degrees(euler_angles[2])
     return yaw
     
-def move_diagonally_forward_up(client, duration, forward_speed, upward_speed):
+def move_diagonally_forward_up(client, duration, forward_speed, upward_speed, vehicle_name=''):
     #print("Moving diagonally forward and up...")
     # Get current yaw and calculate velocity components
-    current_yaw = get_current_yaw(client)
+    current_yaw = get_current_yaw(client, vehicle_name)
     yaw_radians = math.radians(current_yaw)
     vx = math.cos(yaw_radians) * forward_speed
     vy = math.sin(yaw_radians) * forward_speed
 
     # Calculate the current altitude from which to start the ascent
-    current_altitude = client.getMultirotorState().kinematics_estimated.position.z_val
+    current_altitude = client.getMultirotorState(vehicle_name=vehicle_name).kinematics_estimated.position.z_val
     desired_altitude = current_altitude - 5  # Assuming you want to move up by 5 meters
 
     # Move forward and upward simultaneously
-    client.moveByVelocityZAsync(vx=vx, vy=vy, z=desired_altitude, duration=duration).join()
+    client.moveByVelocityZAsync(vx=vx, vy=vy, z=desired_altitude, duration=duration, vehicle_name=vehicle_name).join()
 
-def move_diagonally_forward_down(client, duration, forward_speed, downward_speed):
+def move_diagonally_forward_down(client, duration, forward_speed, downward_speed, vehicle_name=''):
     #print("Moving diagonally forward and down...")
     # Get current yaw and calculate velocity components
-    current_yaw = get_current_yaw(client)
+    current_yaw = get_current_yaw(client, vehicle_name)
     yaw_radians = math.radians(current_yaw)
     vx = math.cos(yaw_radians) * forward_speed
     vy = math.sin(yaw_radians) * forward_speed
 
     # Calculate the current altitude from which to start the descent
-    current_altitude = client.getMultirotorState().kinematics_estimated.position.z_val
+    current_altitude = client.getMultirotorState(vehicle_name=vehicle_name).kinematics_estimated.position.z_val
     desired_altitude = current_altitude + 5  # Assuming you want to move down by 5 meters
 
     # Move forward and downward simultaneously
-    client.moveByVelocityZAsync(vx=vx, vy=vy, z=desired_altitude, duration=duration).join()
+    client.moveByVelocityZAsync(vx=vx, vy=vy, z=desired_altitude, duration=duration, vehicle_name=vehicle_name).join()
 
 
-def move_diagonally_down_yaw(client, yaw_change, duration, forward_speed, downward_speed):
+def move_diagonally_down_yaw(client, yaw_change, duration, forward_speed, downward_speed, vehicle_name=''):
     # Rotate to the new yaw
-    current_yaw = get_current_yaw(client)
+    current_yaw = get_current_yaw(client, vehicle_name)
     target_yaw = current_yaw + yaw_change
-    client.rotateToYawAsync(target_yaw, timeout_sec=duration).join()
+    client.rotateToYawAsync(target_yaw, timeout_sec=duration, vehicle_name=vehicle_name).join()
     # Calculate diagonal movement velocities
     vx = forward_speed * math.cos(math.radians(target_yaw))
     vy = forward_speed * math.sin(math.radians(target_yaw))
-    z = client.getMultirotorState().kinematics_estimated.position.z_val + downward_speed
+    z = client.getMultirotorState(vehicle_name=vehicle_name).kinematics_estimated.position.z_val + downward_speed
     # Move diagonally down with the new yaw
-    client.moveByVelocityZAsync(vx=vx, vy=vy, z=z, duration=duration).join()
+    client.moveByVelocityZAsync(vx=vx, vy=vy, z=z, duration=duration, vehicle_name=vehicle_name).join()
     #print(f"Moved {yaw_change} degrees to {'right' if yaw_change > 0 else 'left'} and down")
 
-def move_45_degrees_right_down(client, duration, speed):
-    move_diagonally_down_yaw(client, 45, duration, speed, 5)
+def move_45_degrees_right_down(client, duration, speed, vehicle_name=''):
+    move_diagonally_down_yaw(client, 45, duration, speed, 5, vehicle_name)
 
-def move_45_degrees_left_down(client, duration, speed):
-    move_diagonally_down_yaw(client, -45, duration, speed, 5)
+def move_45_degrees_left_down(client, duration, speed, vehicle_name=''):
+    move_diagonally_down_yaw(client, -45, duration, speed, 5, vehicle_name)
     
-def move_diagonally_up_yaw(client, yaw_change, duration, forward_speed, upward_speed):
+def move_diagonally_up_yaw(client, yaw_change, duration, forward_speed, upward_speed, vehicle_name=''):
     # Rotate to the new yaw
-    current_yaw = get_current_yaw(client)
+    current_yaw = get_current_yaw(client, vehicle_name)
     target_yaw = current_yaw + yaw_change
-    client.rotateToYawAsync(target_yaw, timeout_sec=duration).join()
+    client.rotateToYawAsync(target_yaw, timeout_sec=duration, vehicle_name=vehicle_name).join()
     # Calculate diagonal movement velocities
     vx = forward_speed * math.cos(math.radians(target_yaw))
     vy = forward_speed * math.sin(math.radians(target_yaw))
-    z = client.getMultirotorState().kinematics_estimated.position.z_val - upward_speed
+    z = client.getMultirotorState(vehicle_name=vehicle_name).kinematics_estimated.position.z_val - upward_speed
     # Move diagonally up with the new yaw
-    client.moveByVelocityZAsync(vx=vx, vy=vy, z=z, duration=duration).join()
+    client.moveByVelocityZAsync(vx=vx, vy=vy, z=z, duration=duration, vehicle_name=vehicle_name).join()
     #print(f"Moved {yaw_change} degrees to {'right' if yaw_change > 0 else 'left'} and up")
 
-def move_45_degrees_right_up(client, duration, speed):
-    move_diagonally_up_yaw(client, 45, duration, speed, 5)
+def move_45_degrees_right_up(client, duration, speed, vehicle_name=''):
+    move_diagonally_up_yaw(client, 45, duration, speed, 5, vehicle_name)
 
-def move_45_degrees_left_up(client, duration, speed):
-    move_diagonally_up_yaw(client, -45, duration, speed, 5)
+def move_45_degrees_left_up(client, duration, speed, vehicle_name=''):
+    move_diagonally_up_yaw(client, -45, duration, speed, 5, vehicle_name)
     
     
-def rotate_by_degrees(client, yaw_change, duration):
+def rotate_by_degrees(client, yaw_change, duration, vehicle_name=''):
     # Get the current yaw and calculate the target yaw
-    current_yaw = get_current_yaw(client)
+    current_yaw = get_current_yaw(client, vehicle_name)
     target_yaw = current_yaw + yaw_change
    # print(f"Rotating from {current_yaw:.2f} degrees to {target_yaw:.2f} degrees.")
     # Rotate to the new yaw
-    client.rotateToYawAsync(target_yaw, timeout_sec=duration).join()
+    client.rotateToYawAsync(target_yaw, timeout_sec=duration, vehicle_name=vehicle_name).join()
 
-def rotate_45_degrees_right(client, duration):
+def rotate_45_degrees_right(client, duration, vehicle_name=''):
     #print("Turning right by 45 degrees...")
-    rotate_by_degrees(client, 45, duration)  # Rotate 45 degrees to the right
+    rotate_by_degrees(client, 45, duration, vehicle_name)  # Rotate 45 degrees to the right
 
-def rotate_45_degrees_left(client, duration):
+def rotate_45_degrees_left(client, duration, vehicle_name=''):
     #print("Turning left by 45 degrees...")
-    rotate_by_degrees(client, -45, duration)  # Rotate 45 degrees to the left
\ No newline at end of file
+    rotate_by_degrees(client, -45, duration, vehicle_name)  # Rotate 45 degrees to the left
\ No newline at end of file
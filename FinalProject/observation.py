@@ -0,0 +1,230 @@
+import cv2
+import gym
+import numpy as np
+
+from profiling import NULL_PROFILER
+
+try:
+    import airsim
+except ImportError:  # no simulator package installed, fall back to the in-process fake
+    import fake_airsim as airsim
+
+# Uncompressed float request: no PNG/PFM encode on the simulator side, no decode here.
+DEPTH_REQUEST = [airsim.ImageRequest("0", airsim.ImageType.DepthPlanar, pixels_as_float=True, compress=False)]
+
+OBSERVATION_SHAPE = (72, 128, 1)
+
+
+class DepthDecoder:
+    """Decodes DepthPlanar responses into a ring of preallocated observation buffers.
+
+    A response carries its pixels either as AirSim's list of floats (image_data_float) or as
+    raw float32 bytes (image_data_uint8, as served by the in-process backends). Bytes are
+    wrapped with np.frombuffer without copying, lists are written into a scratch buffer kept
+    per capture size, and the (height, width) image is resized straight into the next ring
+    slot. decode() returns a view of that slot, so in steady state no array is allocated per
+    observation. A returned view stays valid for `ring_size` - 1 further decodes; callers
+    that keep observations longer (replay buffers do) must copy them.
+    """
+
+    def __init__(self, shape=OBSERVATION_SHAPE, ring_size=4, profiler=NULL_PROFILER):
+        self.shape = shape
+        self.ring = np.zeros((ring_size,) + shape, dtype=np.float32)
+        self._slot = 0
+        self._scratch = {}
+        self.profiler = profiler
+
+    def decode(self, response):
+        out = self.ring[self._slot]
+        self._slot = (self._slot + 1) % len(self.ring)
+        self.decode_into(response, out[:, :, 0])
+        return out
+
+    def decode_into(self, response, out):
+        """Write the resized depth image of response into the (height, width) float32 array out."""
+        with self.profiler.phase('decode'):
+            image = self.raw_image(response)
+        with self.profiler.phase('resize'):
+            if image.shape == out.shape:
+                np.copyto(out, image)
+            else:
+                cv2.resize(image, (out.shape[1], out.shape[0]), dst=out)
+        return out
+
+    def raw_image(self, response):
+        """The response's pixels as a (height, width) float32 array, reusing memory where possible."""
+        size = (response.height, response.width)
+        if response.image_data_float:
+            scratch = self._scratch.get(size)
+            if scratch is None:
+                scratch = self._scratch[size] = np.empty(size, dtype=np.float32)
+            scratch.ravel()[:] = response.image_data_float
+            return scratch
+        return np.frombuffer(response.image_data_uint8, dtype=np.float32).reshape(size)
+
+
+class DepthQuantizer:
+    """Compact storage format for depth observations.
+
+    Depth is clipped to [min_depth, max_depth] metres, then stored either as uint8 codes on a
+    log scale (about 2.7% relative resolution over the default 0.1-100 m, finer close up where
+    it matters) or as float16 metres, whose floating point spacing is already logarithmic.
+    uint8 observations are ordinary 0-255 images to SB3's CnnPolicy; float16 ones need
+    policy_kwargs=dict(normalize_images=False). Like DepthDecoder, quantize() writes into a
+    ring of preallocated buffers and returns a view.
+    """
+
+    def __init__(self, dtype=np.uint8, shape=OBSERVATION_SHAPE, min_depth=0.1, max_depth=100.0, ring_size=4):
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.uint8, np.float16):
+            raise ValueError(f"Unsupported observation dtype {self.dtype}, expected uint8 or float16")
+        self.shape = shape
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self._log_min = np.float32(np.log(min_depth))
+        self._scale = np.float32(255 / np.log(max_depth / min_depth))
+        self.ring = np.zeros((ring_size,) + shape, dtype=self.dtype)
+        self._slot = 0
+        self._scratch = np.empty(shape, dtype=np.float32)
+
+    @property
+    def observation_space(self):
+        if self.dtype == np.uint8:
+            return gym.spaces.Box(low=0, high=255, shape=self.shape, dtype=np.uint8)
+        return gym.spaces.Box(low=self.min_depth, high=self.max_depth, shape=self.shape, dtype=np.float16)
+
+    def quantize(self, depth):
+        out = self.ring[self._slot]
+        self._slot = (self._slot + 1) % len(self.ring)
+        return self.quantize_into(depth, out)
+
+    def quantize_into(self, depth, out):
+        """Write depth (metres, float32, same shape as out) into out in the storage format."""
+        scratch = self._scratch if depth.shape == self.shape else np.empty(depth.shape, dtype=np.float32)
+        np.clip(depth, self.min_depth, self.max_depth, out=scratch)
+        if self.dtype == np.uint8:
+            np.log(scratch, out=scratch)
+            scratch -= self._log_min
+            scratch *= self._scale
+            np.rint(scratch, out=scratch)
+        np.copyto(out, scratch, casting='unsafe')
+        return out
+
+    def dequantize(self, codes):
+        """Depth in metres (float32) from an array of quantized observations of any leading shape."""
+        depth = codes.astype(np.float32)
+        if self.dtype == np.uint8:
+            depth /= self._scale
+            depth += self._log_min
+            np.exp(depth, out=depth)
+        return depth
+
+
+class LazyFrames:
+    """A stack of frames held as references into a FrameStack's storage.
+
+    Consecutive stacks share their frames instead of copying them; the (..., k * channels)
+    array is only built when something converts the stack with np.asarray.
+    """
+
+    __slots__ = ('_storage', '_slots')
+
+    def __init__(self, storage, slots):
+        self._storage = storage
+        self._slots = tuple(slots)
+
+    @property
+    def shape(self):
+        frame_shape = self._storage.shape[1:]
+        return frame_shape[:-1] + (frame_shape[-1] * len(self._slots),)
+
+    @property
+    def dtype(self):
+        return self._storage.dtype
+
+    def __len__(self):
+        return len(self._slots)
+
+    def frame(self, i):
+        return self._storage[self._slots[i]]
+
+    def __array__(self, dtype=None, copy=None):
+        stacked = np.concatenate([self._storage[slot] for slot in self._slots], axis=-1)
+        return stacked if dtype is None else stacked.astype(dtype, copy=False)
+
+
+class FrameStack:
+    """The last k frames, kept in a preallocated ring and handed out as LazyFrames (oldest first).
+
+    append() copies a frame into the ring once; every stack it appears in refers to that copy.
+    A returned LazyFrames stays valid for `ring_size` further appends.
+    """
+
+    def __init__(self, frame_shape, dtype, k, ring_size=4):
+        self.k = k
+        self.storage = np.zeros((k + ring_size,) + frame_shape, dtype=dtype)
+        self._next = 0
+        self._slots = [0] * k
+
+    def append(self, frame, reset=False):
+        slot = self._next
+        self._next = (self._next + 1) % len(self.storage)
+        np.copyto(self.storage[slot], frame)
+        if reset:
+            self._slots = [slot] * self.k  # a new episode starts with its first frame repeated
+        else:
+            self._slots = self._slots[1:] + [slot]
+        return LazyFrames(self.storage, self._slots)
+
+
+def stacked_space(space, k):
+    return gym.spaces.Box(low=space.low.min(), high=space.high.max(),
+                          shape=space.shape[:-1] + (space.shape[-1] * k,), dtype=space.dtype)
+
+
+class DepthObservation:
+    """Builds DroneEnv observations from DepthPlanar responses.
+
+    Each response is decoded to the full-resolution image and quantized to `dtype` (None keeps
+    float32 metres). With `frame_stack` > 1 the last k frames are returned as LazyFrames.
+    With a `lowres_shape` (e.g. the settings.json capture size) the observation is a dict of
+    the stacked 'depth' image and an equally stacked 'lowres' image decoded at that size; note
+    SB3's default NatureCNN needs images of at least 36x36, so a 32x32 'lowres' key needs a
+    custom features extractor.
+    """
+
+    def __init__(self, dtype=np.uint8, shape=OBSERVATION_SHAPE, frame_stack=1, lowres_shape=None,
+                 profiler=NULL_PROFILER):
+        self.frame_stack = frame_stack
+        self.profiler = profiler
+        self.views = {'depth': self._view(dtype, shape)}
+        if lowres_shape is not None:
+            self.views['lowres'] = self._view(dtype, lowres_shape)
+
+    def _view(self, dtype, shape):
+        quantizer = DepthQuantizer(dtype, shape) if dtype is not None else None
+        space = quantizer.observation_space if quantizer is not None else \
+            gym.spaces.Box(low=0, high=np.inf, shape=shape, dtype=np.float32)
+        stack = FrameStack(shape, space.dtype, self.frame_stack) if self.frame_stack > 1 else None
+        return DepthDecoder(shape, profiler=self.profiler), quantizer, stacked_space(space, self.frame_stack), stack
+
+    @property
+    def observation_space(self):
+        spaces = {key: view[2] for key, view in self.views.items()}
+        return spaces['depth'] if len(spaces) == 1 else gym.spaces.Dict(spaces)
+
+    def __call__(self, responses, reset=False):
+        """Return (depth image in metres, observation) for a simGetImages response list."""
+        if not responses:
+            return None, None
+        depth_image = None
+        observation = {}
+        for key, (decoder, quantizer, space, stack) in self.views.items():
+            frame = decoder.decode(responses[0])
+            if key == 'depth':
+                depth_image = frame
+            with self.profiler.phase('quantize'):
+                if quantizer is not None:
+                    frame = quantizer.quantize(frame)
+                observation[key] = stack.append(frame, reset) if stack is not None else frame
+        return depth_image, observation['depth'] if len(observation) == 1 else observation
@@ -0,0 +1,407 @@
+import argparse
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from clients import BACKENDS
+
+# Ape-X style actor/learner training: M actor processes, each flying its own simulator (an AirSim
+# instance on its own port, or an in-process surrogate), stream transitions into a replay buffer
+# in shared memory; the learner in the main process samples it, trains the Q-network and
+# publishes the weights back to the actors. Actors that stop sending heartbeats are restarted.
+#
+#   python parallel_training.py --backend surrogate --workers 4 --updates 2000
+#   python parallel_training.py --backend airsim --ports 41451 41452 41453
+#   python parallel_training.py --backend surrogate --workers 4 --scaling
+
+
+class SharedArrays:
+    """Named NumPy arrays in shared memory that can be handed to child processes.
+
+    The creating process owns the segments and must unlink() them; pickling (as Process
+    arguments) sends only the segment names, and children attach to the same memory.
+    """
+
+    def __init__(self, specs, names=None):
+        self.specs = specs
+        self._segments = {}
+        self.arrays = {}
+        for key, (shape, dtype) in specs.items():
+            size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+            if names is None:
+                segment = shared_memory.SharedMemory(create=True, size=size)
+            else:
+                segment = shared_memory.SharedMemory(name=names[key])
+            self._segments[key] = segment
+            self.arrays[key] = np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+            if names is None:
+                self.arrays[key][...] = 0
+        self._owner = names is None
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    def __getstate__(self):
+        return {'specs': self.specs, 'names': {key: segment.name for key, segment in self._segments.items()}}
+
+    def __setstate__(self, state):
+        self.__init__(state['specs'], state['names'])
+
+    def close(self):
+        self.arrays = {}
+        for segment in self._segments.values():
+            segment.close()
+            if self._owner:
+                segment.unlink()
+        self._segments = {}
+
+
+class SharedReplay:
+    """Transition ring buffer in shared memory with one partition per actor.
+
+    Each actor writes only its own partition and bumps the partition's counter once a slot is
+    complete, so writers never take a lock. The learner samples uniformly over all filled slots.
+    A slot overwritten while the learner reads it can yield a mixed transition; like Ape-X this
+    is tolerated rather than paid for with locking on every step.
+    """
+
+    def __init__(self, num_partitions, capacity, obs_shape, obs_dtype=np.uint8):
+        self.num_partitions = num_partitions
+        self.capacity = capacity
+        slots = (num_partitions, capacity)
+        self.arrays = SharedArrays({
+            'obs': (slots + tuple(obs_shape), obs_dtype),
+            'next_obs': (slots + tuple(obs_shape), obs_dtype),
+            'actions': (slots, np.int64),
+            'rewards': (slots, np.float32),
+            'dones': (slots, np.float32),
+            'counts': ((num_partitions,), np.int64),
+        })
+
+    def add(self, partition, obs, action, reward, next_obs, done):
+        counts = self.arrays['counts']
+        slot = counts[partition] % self.capacity
+        self.arrays['obs'][partition, slot] = obs
+        self.arrays['next_obs'][partition, slot] = next_obs
+        self.arrays['actions'][partition, slot] = action
+        self.arrays['rewards'][partition, slot] = reward
+        self.arrays['dones'][partition, slot] = done
+        counts[partition] += 1
+
+    def added(self):
+        """Total transitions written so far by each actor."""
+        return self.arrays['counts'].copy()
+
+    def size(self):
+        return int(np.minimum(self.arrays['counts'], self.capacity).sum())
+
+    def sample(self, batch_size, rng):
+        filled = np.minimum(self.arrays['counts'], self.capacity)
+        partitions = rng.choice(self.num_partitions, size=batch_size, p=filled / filled.sum())
+        slots = rng.integers(0, filled[partitions])
+        return tuple(self.arrays[key][partitions, slots]
+                     for key in ('obs', 'actions', 'rewards', 'next_obs', 'dones'))
+
+    def close(self):
+        self.arrays.close()
+
+
+class SharedWeights:
+    """The learner's Q-network parameters, published to the actors through shared memory."""
+
+    def __init__(self, num_parameters):
+        self.arrays = SharedArrays({'parameters': ((num_parameters,), np.float32), 'version': ((1,), np.int64)})
+        self.lock = mp.get_context('spawn').Lock()
+
+    def publish(self, module):
+        import torch
+        with torch.no_grad(), self.lock:
+            self.arrays['parameters'][:] = torch.nn.utils.parameters_to_vector(module.parameters()).cpu().numpy()
+            self.arrays['version'][0] += 1
+
+    def pull(self, module, version):
+        """Load the published parameters into module if they are newer than `version`; return the current version."""
+        import torch
+        if self.arrays['version'][0] == version:
+            return version
+        with self.lock:
+            version = int(self.arrays['version'][0])
+            parameters = torch.from_numpy(self.arrays['parameters'].copy())
+        torch.nn.utils.vector_to_parameters(parameters, module.parameters())
+        return version
+
+    def close(self):
+        self.arrays.close()
+
+
+def make_policy(observation_space, action_space, learning_rate=1e-4):
+    """SB3's DQN CnnPolicy for DroneEnv's (height, width, channels) observations, fed channels first."""
+    import gymnasium
+    from stable_baselines3.dqn.policies import CnnPolicy
+    height, width, channels = observation_space.shape
+    space = gymnasium.spaces.Box(0, 255, (channels, height, width), observation_space.dtype)
+    return CnnPolicy(space, gymnasium.spaces.Discrete(action_space.n), lambda _: learning_rate)
+
+
+def actor_epsilon(index, num_actors, base=0.4, alpha=7.0):
+    """Ape-X per-actor exploration rate: from `base` for actor 0 down to base**(1 + alpha) for the last."""
+    if num_actors == 1:
+        return base
+    return base ** (1 + alpha * index / (num_actors - 1))
+
+
+def run_actor(index, backend, client_kwargs, replay, weights, heartbeats, stop, epsilon, seed):
+    """Actor process: fly DroneEnv epsilon-greedily with the latest published weights."""
+    import torch
+    from DroneEnvironment import DroneEnv
+    from clients import make_client, make_observation_client
+
+    torch.set_num_threads(1)
+    rng = np.random.default_rng(seed)
+    client = make_client(backend, **client_kwargs)
+    env = DroneEnv(client=client, observation_client=make_observation_client(backend, client, **client_kwargs))
+    policy = make_policy(env.observation_space, env.action_space)
+    version = -1
+    obs = env.reset()
+    while not stop.is_set():
+        heartbeats[index] = time.time()
+        if weights is not None:
+            version = weights.pull(policy.q_net, version)
+        if weights is None or rng.random() < epsilon:
+            action = int(rng.integers(env.action_space.n))
+        else:
+            with torch.no_grad():
+                q_values = policy.q_net(torch.from_numpy(np.moveaxis(obs, -1, 0)[None].copy()).float())
+            action = int(q_values.argmax())
+        next_obs, reward, done, info = env.step(action)
+        replay.add(index, obs, action, reward, next_obs, done)
+        obs = env.reset() if done else next_obs
+    env.close()
+
+
+class ActorPool:
+    """Starts the actor processes, restarts any that die or stop sending heartbeats, and stops them.
+
+    A worker that has not reported for `heartbeat_timeout` seconds (a frozen AirSim instance
+    blocks its RPCs indefinitely) is killed and relaunched on the same endpoint and replay
+    partition; `startup_timeout` covers imports and connecting before the first heartbeat.
+    """
+
+    def __init__(self, backend, client_kwargs, replay, weights=None, heartbeat_timeout=30.0,
+                 startup_timeout=120.0, seed=0):
+        self.backend = backend
+        self.client_kwargs = client_kwargs
+        self.replay = replay
+        self.weights = weights
+        self.heartbeat_timeout = heartbeat_timeout
+        self.startup_timeout = startup_timeout
+        self.seed = seed
+        self.context = mp.get_context('spawn')
+        self.num_actors = len(client_kwargs)
+        self.heartbeats = self.context.Array('d', self.num_actors, lock=False)
+        self.stop_event = self.context.Event()
+        self.processes = [None] * self.num_actors
+        self.started_at = [0.0] * self.num_actors
+        self.restarts = 0
+
+    def _launch(self, index):
+        self.heartbeats[index] = 0.0
+        self.started_at[index] = time.time()
+        process = self.context.Process(
+            target=run_actor, daemon=True,
+            args=(index, self.backend, self.client_kwargs[index], self.replay, self.weights, self.heartbeats,
+                  self.stop_event, actor_epsilon(index, self.num_actors), self.seed + 1000 * self.restarts + index))
+        process.start()
+        self.processes[index] = process
+
+    def start(self):
+        for index in range(self.num_actors):
+            self._launch(index)
+
+    def wait_ready(self, timeout=None):
+        """Block until every actor has sent its first heartbeat."""
+        deadline = time.time() + (timeout if timeout is not None else self.startup_timeout)
+        while time.time() < deadline:
+            if all(self.heartbeats[index] > 0 for index in range(self.num_actors)):
+                return True
+            self.check_health()
+            time.sleep(0.05)
+        return False
+
+    def check_health(self):
+        """Restart dead or hung actors; returns the indices restarted."""
+        now = time.time()
+        restarted = []
+        for index, process in enumerate(self.processes):
+            heartbeat = self.heartbeats[index]
+            if heartbeat > 0:
+                hung = now - heartbeat > self.heartbeat_timeout
+            else:
+                hung = now - self.started_at[index] > self.startup_timeout
+            if process.is_alive() and not hung:
+                continue
+            process.kill()
+            process.join(timeout=5)
+            self.restarts += 1
+            self._launch(index)
+            restarted.append(index)
+        return restarted
+
+    def stop(self):
+        self.stop_event.set()
+        for process in self.processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+
+class Learner:
+    """DQN updates on batches from the shared replay, publishing weights every `publish_interval` updates.
+
+    Without `weights` (e.g. training on an offline dataset.OfflineDataset) nothing is published.
+    """
+
+    def __init__(self, policy, replay, weights, gamma=0.99, batch_size=32, target_update_interval=1000,
+                 publish_interval=50, max_grad_norm=10, seed=0):
+        self.policy = policy
+        self.replay = replay
+        self.weights = weights
+        self.gamma = gamma
+        self.batch_size = batch_size
+        self.target_update_interval = target_update_interval
+        self.publish_interval = publish_interval
+        self.max_grad_norm = max_grad_norm
+        self.rng = np.random.default_rng(seed)
+        self.updates = 0
+        if weights is not None:
+            weights.publish(policy.q_net)
+
+    def train_step(self):
+        import torch
+        import torch.nn.functional as F
+        obs, actions, rewards, next_obs, dones = self.replay.sample(self.batch_size, self.rng)
+        obs = torch.from_numpy(np.moveaxis(obs, -1, 1).copy()).float()
+        next_obs = torch.from_numpy(np.moveaxis(next_obs, -1, 1).copy()).float()
+        with torch.no_grad():
+            next_q = self.policy.q_net_target(next_obs).max(dim=1).values
+            targets = torch.from_numpy(rewards) + (1 - torch.from_numpy(dones)) * self.gamma * next_q
+        q = self.policy.q_net(obs).gather(1, torch.from_numpy(actions)[:, None]).squeeze(1)
+        loss = F.smooth_l1_loss(q, targets)
+        self.policy.optimizer.zero_grad()
+        loss.backward()
+        torch.nn.utils.clip_grad_norm_(self.policy.parameters(), self.max_grad_norm)
+        self.policy.optimizer.step()
+
+        self.updates += 1
+        if self.updates % self.target_update_interval == 0:
+            self.policy.q_net_target.load_state_dict(self.policy.q_net.state_dict())
+        if self.weights is not None and self.updates % self.publish_interval == 0:
+            self.weights.publish(self.policy.q_net)
+        return loss.item()
+
+
+def worker_client_kwargs(backend, num_workers, ip='', ports=None):
+    """Per-actor make_client() arguments: one AirSim endpoint per port, or default in-process clients."""
+    if backend == 'airsim':
+        ports = ports or [41451 + index for index in range(num_workers)]
+        return [dict(ip=ip, port=port) for port in ports]
+    return [dict() for _ in range(num_workers)]
+
+
+def probe_spaces(backend, client_kwargs):
+    """DroneEnv's observation and action spaces, read without occupying an actor's simulator."""
+    from DroneEnvironment import DroneEnv
+    from clients import make_client
+    if backend == 'airsim':
+        client = make_client('fake')  # the spaces don't depend on the simulator
+    else:
+        client = make_client(backend, **client_kwargs)
+    env = DroneEnv(client=client, use_pipeline=False)
+    return env.observation_space, env.action_space
+
+
+def train(backend='surrogate', num_workers=2, updates=2000, capacity=100000, learning_starts=1000,
+          ip='', ports=None, heartbeat_timeout=30.0, log_interval=5.0):
+    client_kwargs = worker_client_kwargs(backend, num_workers, ip, ports)
+    observation_space, action_space = probe_spaces(backend, client_kwargs[0])
+    policy = make_policy(observation_space, action_space)
+    replay = SharedReplay(len(client_kwargs), capacity // len(client_kwargs), observation_space.shape,
+                          observation_space.dtype)
+    weights = SharedWeights(sum(p.numel() for p in policy.q_net.parameters()))
+    learner = Learner(policy, replay, weights)
+    pool = ActorPool(backend, client_kwargs, replay, weights, heartbeat_timeout=heartbeat_timeout)
+    pool.start()
+    try:
+        start = last_log = time.time()
+        last_added = 0
+        while learner.updates < updates:
+            if replay.size() < learning_starts:
+                time.sleep(0.05)
+            else:
+                learner.train_step()
+            now = time.time()
+            if now - last_log >= log_interval:
+                restarted = pool.check_health()
+                added = int(replay.added().sum())
+                print(f"{now - start:7.1f}s  samples {added:8d}  ({(added - last_added) / (now - last_log):7.1f}/s)"
+                      f"  updates {learner.updates:6d}  restarts {pool.restarts}"
+                      + (f"  restarted {restarted}" if restarted else ""))
+                last_log, last_added = now, added
+    finally:
+        pool.stop()
+        replay.close()
+        weights.close()
+    return policy
+
+
+def measure_scaling(backend='surrogate', max_workers=4, seconds=10.0, ip='', ports=None):
+    """Actor samples/sec for 1..max_workers actors (no learner), after all actors are up."""
+    results = []
+    for num_workers in range(1, max_workers + 1):
+        client_kwargs = worker_client_kwargs(backend, num_workers, ip, ports and ports[:num_workers])
+        observation_space, _ = probe_spaces(backend, client_kwargs[0])
+        replay = SharedReplay(num_workers, 10000, observation_space.shape, observation_space.dtype)
+        pool = ActorPool(backend, client_kwargs, replay)
+        pool.start()
+        try:
+            pool.wait_ready()
+            before, start = replay.added().sum(), time.perf_counter()
+            time.sleep(seconds)
+            rate = (replay.added().sum() - before) / (time.perf_counter() - start)
+        finally:
+            pool.stop()
+            replay.close()
+        results.append((num_workers, rate))
+        print(f"{num_workers:3d} workers  {rate:9.1f} samples/s  ({rate / results[0][1]:.2f}x)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel actor/learner DQN training for DroneEnv.")
+    parser.add_argument('--backend', choices=BACKENDS, default='surrogate')
+    parser.add_argument('--workers', type=int, default=2, help="actor processes (AirSim: one per port)")
+    parser.add_argument('--ip', default='', help="AirSim host")
+    parser.add_argument('--ports', type=int, nargs='+', help="AirSim RPC port of each actor's simulator")
+    parser.add_argument('--updates', type=int, default=2000, help="learner gradient steps")
+    parser.add_argument('--capacity', type=int, default=100000, help="replay transitions across all actors")
+    parser.add_argument('--learning-starts', type=int, default=1000)
+    parser.add_argument('--heartbeat-timeout', type=float, default=30.0,
+                        help="seconds without progress before an actor is restarted")
+    parser.add_argument('--scaling', action='store_true', help="report samples/sec for 1..workers actors and exit")
+    parser.add_argument('--seconds', type=float, default=10.0, help="measurement window per --scaling point")
+    args = parser.parse_args()
+
+    num_workers = len(args.ports) if args.ports else args.workers
+    if args.scaling:
+        measure_scaling(args.backend, num_workers, args.seconds, args.ip, args.ports)
+        return
+    policy = train(args.backend, num_workers, args.updates, args.capacity, args.learning_starts, args.ip, args.ports,
+                   args.heartbeat_timeout)
+    policy.save("dqn_drone_parallel")
+
+
+if __name__ == "__main__":
+    main()
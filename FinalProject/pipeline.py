@@ -0,0 +1,88 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from movements import action_async, yaw_from_pose
+from observation import DEPTH_REQUEST
+from profiling import NULL_PROFILER
+from sim_clock import continue_for_time
+
+
+class PendingStep:
+    """An action in flight; join() waits for it and returns (image_responses, state) observed after it."""
+
+    def __init__(self, pipeline, motion, observation):
+        self._pipeline = pipeline
+        self._motion = motion
+        self._observation = observation
+
+    def join(self):
+        profiler = self._pipeline.profiler
+        with profiler.phase('motion'):
+            self._motion.join()
+        with profiler.phase('observation'):
+            if self._observation is None:
+                return self._pipeline.fetch_observation(self._pipeline.client)
+            self._pipeline.motion_done.set()
+            return self._observation.result()
+
+
+class ActionPipeline:
+    """Non-blocking execution of DroneEnv's discrete actions with an overlapped observation fetch.
+
+    step_async() issues the action from a pose the caller already holds, so no pose/state RPCs
+    precede the motion, and yawing moves are chained into a single turning command. When an
+    `observation_client` (a second connection to the simulator) is given, the next depth image
+    and vehicle state are requested from a worker thread as soon as the motion is expected to end
+    (`lead_time` seconds earlier, if set) instead of after the motion future's reply arrives.
+    Without one, the observation is fetched on `client` once the motion has completed.
+
+    With `lockstep` the simulator is expected to be paused between steps: each action is run for
+    exactly its duration with simContinueForTime and observed once the simulator has paused
+    again, so what an action does no longer depends on how long the caller took to send it.
+    """
+
+    def __init__(self, client, observation_client=None, clock_speed=1.0, lead_time=0.0,
+                 chain_rotation=True, vehicle_name='', profiler=NULL_PROFILER, lockstep=False):
+        if lockstep and not chain_rotation:
+            raise ValueError("lockstep needs chain_rotation: a separate rotation would be joined while paused")
+        self.client = client
+        self.observation_client = observation_client
+        self.clock_speed = clock_speed
+        self.lead_time = lead_time
+        self.chain_rotation = chain_rotation
+        self.vehicle_name = vehicle_name
+        self.profiler = profiler
+        self.lockstep = lockstep
+        self.motion_done = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1) if observation_client is not None else None
+
+    def step_async(self, action, pose):
+        yaw = yaw_from_pose(pose)
+        motion, seconds = action_async(self.client, int(action), yaw, pose.position.z_val,
+                                       self.vehicle_name, self.chain_rotation)
+        if self.lockstep:
+            return PendingStep(self, continue_for_time(self.client, seconds, self.clock_speed), None)
+        observation = None
+        if self._executor is not None:
+            self.motion_done.clear()
+            deadline = time.perf_counter() + seconds / self.clock_speed - self.lead_time
+            observation = self._executor.submit(self._fetch_at, deadline)
+        return PendingStep(self, motion, observation)
+
+    def step(self, action, pose):
+        return self.step_async(action, pose).join()
+
+    def _fetch_at(self, deadline):
+        # Wake at the expected end of the motion, or earlier if the motion reply beats it.
+        self.motion_done.wait(max(0.0, deadline - time.perf_counter()))
+        return self.fetch_observation(self.observation_client)
+
+    def fetch_observation(self, client):
+        responses = client.simGetImages(DEPTH_REQUEST, vehicle_name=self.vehicle_name)
+        state = client.getMultirotorState(vehicle_name=self.vehicle_name)
+        return responses, state
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
@@ -0,0 +1,204 @@
+from collections import namedtuple
+
+import numpy as np
+import torch as th
+from stable_baselines3 import DQN
+from torch.nn import functional as F
+
+from replay import FrameReplayBuffer
+
+# Prioritized experience replay (Schaul et al.) for the drone DQN: transitions are sampled in
+# proportion to priority ** alpha, where priority is the transition's latest absolute TD error,
+# so the rare goal and collision transitions are replayed far more often than under uniform
+# sampling. Priorities live in an array-backed sum-tree; sampling, priority updates and the
+# importance-sampling weights all work on whole batches with one NumPy pass per tree level.
+#
+#   model = PrioritizedDQN("CnnPolicy", env, replay_buffer_class=PrioritizedFrameReplayBuffer,
+#                          replay_buffer_kwargs=dict(n_steps=3))
+#   model.learn(total_timesteps=100000)
+
+PrioritizedSamples = namedtuple('PrioritizedSamples', ['observations', 'actions', 'next_observations', 'dones',
+                                                       'rewards', 'discounts', 'weights', 'indices'])
+
+
+class SumTree:
+    """Binary tree over `capacity` leaf values in one array: node i has children 2i and 2i + 1.
+
+    Leaves sit at [size, size + capacity) with size the next power of two, and every inner node
+    holds the sum of its children, so the root (index 1) is the total. A minimum is kept in a
+    parallel tree for the importance-sampling weight normalization.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.size = 1 << max(capacity - 1, 1).bit_length()
+        self.sums = np.zeros(2 * self.size)
+        self.minima = np.full(2 * self.size, np.inf)
+
+    @property
+    def total(self):
+        return self.sums[1]
+
+    @property
+    def minimum(self):
+        """Smallest non-zero leaf."""
+        return self.minima[1]
+
+    @property
+    def leaves(self):
+        return self.sums[self.size:self.size + self.capacity]
+
+    def update(self, indices, values):
+        """Set leaves `indices` to `values` and refresh their ancestors, one level per pass."""
+        nodes = np.asarray(indices) + self.size
+        values = np.asarray(values, dtype=np.float64)
+        self.sums[nodes] = values
+        self.minima[nodes] = np.where(values > 0, values, np.inf)
+        nodes = np.unique(nodes // 2)
+        while True:
+            self.sums[nodes] = self.sums[2 * nodes] + self.sums[2 * nodes + 1]
+            self.minima[nodes] = np.minimum(self.minima[2 * nodes], self.minima[2 * nodes + 1])
+            if nodes[0] == 1:
+                break
+            nodes = np.unique(nodes // 2)
+
+    def find(self, prefix_sums):
+        """Leaf index of each value in [0, total): the leaf whose cumulative range contains it."""
+        values = np.array(prefix_sums, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        while nodes[0] < self.size:
+            left = self.sums[2 * nodes]
+            right = values >= left
+            values -= left * right
+            nodes = 2 * nodes + right
+        # Rounding can land on an empty leaf next to the last non-empty one
+        leaves = np.minimum(nodes - self.size, self.capacity - 1)
+        while True:
+            empty = self.sums[leaves + self.size] <= 0
+            if not empty.any():
+                return leaves
+            leaves[empty] -= 1
+
+    def rebuild(self, leaves):
+        """Replace all leaves and recompute every inner node bottom-up."""
+        self.sums[:] = 0
+        self.sums[self.size:self.size + self.capacity] = leaves
+        self.minima[:] = np.inf
+        self.minima[self.size:self.size + self.capacity] = np.where(leaves > 0, leaves, np.inf)
+        for level in range(self.size.bit_length() - 2, -1, -1):
+            nodes = np.arange(1 << level, 2 << level)
+            self.sums[nodes] = self.sums[2 * nodes] + self.sums[2 * nodes + 1]
+            self.minima[nodes] = np.minimum(self.minima[2 * nodes], self.minima[2 * nodes + 1])
+
+
+class PrioritizedFrameReplayBuffer(FrameReplayBuffer):
+    """FrameReplayBuffer sampling transitions in proportion to priority ** alpha.
+
+    New transitions get the highest priority seen so far, so each is replayed at least once
+    soon. sample() returns PrioritizedSamples, whose importance-sampling `weights` (exponent
+    `beta`, annealed towards 1 by PrioritizedDQN) correct for the non-uniform sampling and whose
+    `indices` go back to update_priorities() with the batch's TD errors. Transitions that can't
+    be sampled (the slot awaiting the next observation, and stacks reaching into overwritten
+    frames) are held at priority 0.
+    """
+
+    def __init__(self, buffer_size, observation_space, action_space, device='auto', n_envs=1,
+                 optimize_memory_usage=True, handle_timeout_termination=True, quantizer=None, frame_stack=1,
+                 n_steps=1, gamma=0.99, alpha=0.6, beta=0.4, epsilon=1e-6):
+        super(PrioritizedFrameReplayBuffer, self).__init__(buffer_size, observation_space, action_space, device,
+                                                           n_envs, optimize_memory_usage, handle_timeout_termination,
+                                                           quantizer, frame_stack, n_steps, gamma)
+        self.alpha = alpha
+        self.beta = beta
+        self.initial_beta = beta
+        self.epsilon = epsilon
+        self.max_priority = 1.0
+        self.tree = SumTree(self.buffer_size * self.n_envs)
+
+    def add(self, obs, next_obs, action, reward, done, infos):
+        pos = self.pos
+        super(PrioritizedFrameReplayBuffer, self).add(obs, next_obs, action, reward, done, infos)
+        envs = np.arange(self.n_envs)
+        self.tree.update(pos * self.n_envs + envs, np.full(self.n_envs, self.max_priority ** self.alpha))
+        if self.full:
+            # The slot at pos now holds a provisional frame, and the stacks of the frame_stack - 1
+            # transitions after it reach into it
+            blocked = (self.pos + np.arange(self.frame_stack)) % self.buffer_size
+            self.tree.update((blocked[:, None] * self.n_envs + envs).ravel(), 0.0)
+
+    def anneal(self, progress):
+        """Move beta linearly from its initial value to 1 as training progress goes from 0 to 1."""
+        self.beta = self.initial_beta + (1.0 - self.initial_beta) * min(max(progress, 0.0), 1.0)
+
+    def sample(self, batch_size, env=None):
+        # One draw per equal slice of the total priority mass, as in the PER paper
+        total = self.tree.total
+        prefix_sums = (np.arange(batch_size) + np.random.random_sample(batch_size)) * (total / batch_size)
+        indices = self.tree.find(prefix_sums)
+        batch_inds, env_indices = np.divmod(indices, self.n_envs)
+
+        count = (self.buffer_size if self.full else self.pos) * self.n_envs
+        probabilities = self.tree.sums[indices + self.tree.size] / total
+        # Normalized by the largest possible weight, that of the least likely transition
+        weights = (count * probabilities) ** -self.beta / (count * self.tree.minimum / total) ** -self.beta
+        samples = self._get_samples(batch_inds, env=env, env_indices=env_indices)
+        return PrioritizedSamples(*samples, self.to_torch(weights.astype(np.float32).reshape(-1, 1)), indices)
+
+    def update_priorities(self, indices, td_errors):
+        priorities = np.abs(np.asarray(td_errors, dtype=np.float64).reshape(-1)) + self.epsilon
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        self.tree.update(indices, priorities ** self.alpha)
+
+    def snapshot_state(self):
+        """Priorities and sampling parameters, for checkpoint.py."""
+        return {'leaves': self.tree.leaves.copy(), 'max_priority': self.max_priority, 'beta': self.beta}
+
+    def load_snapshot_state(self, state):
+        self.tree.rebuild(state['leaves'])
+        self.max_priority = state['max_priority']
+        self.beta = state['beta']
+
+
+class PrioritizedDQN(DQN):
+    """DQN whose updates weight each sample's Huber loss by its importance-sampling weight and
+    feed the absolute TD errors back as priorities.
+
+    With a buffer without priorities (e.g. FrameReplayBuffer with n_steps) it trains like DQN.
+    """
+
+    def train(self, gradient_steps, batch_size=100):
+        self.policy.set_training_mode(True)
+        self._update_learning_rate(self.policy.optimizer)
+        prioritized = isinstance(self.replay_buffer, PrioritizedFrameReplayBuffer)
+        if prioritized:
+            self.replay_buffer.anneal(1.0 - self._current_progress_remaining)
+
+        losses = []
+        for _ in range(gradient_steps):
+            replay_data = self.replay_buffer.sample(batch_size, env=self._vec_normalize_env)
+            discounts = replay_data.discounts if replay_data.discounts is not None else self.gamma
+            with th.no_grad():
+                next_q_values, _ = self.q_net_target(replay_data.next_observations).max(dim=1)
+                target_q_values = replay_data.rewards + (1 - replay_data.dones) * discounts * next_q_values.reshape(-1, 1)
+            current_q_values = th.gather(self.q_net(replay_data.observations), dim=1,
+                                         index=replay_data.actions.long())
+
+            sample_losses = F.smooth_l1_loss(current_q_values, target_q_values, reduction='none')
+            if prioritized:
+                loss = (replay_data.weights * sample_losses).mean()
+                td_errors = (target_q_values - current_q_values).detach().cpu().numpy()
+                self.replay_buffer.update_priorities(replay_data.indices, td_errors)
+            else:
+                loss = sample_losses.mean()
+            losses.append(loss.item())
+
+            self.policy.optimizer.zero_grad()
+            loss.backward()
+            th.nn.utils.clip_grad_norm_(self.policy.parameters(), self.max_grad_norm)
+            self.policy.optimizer.step()
+
+        self._n_updates += gradient_steps
+        self.logger.record("train/n_updates", self._n_updates, exclude="tensorboard")
+        self.logger.record("train/loss", np.mean(losses))
+        if prioritized:
+            self.logger.record("train/beta", self.replay_buffer.beta)
@@ -0,0 +1,246 @@
+import argparse
+import csv
+import math
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from clients import MultirotorClientInterface
+
+# Low-overhead instrumentation of DroneEnv.step: per-phase latency histograms and RPC counters
+# per action, with Prometheus-text / CSV export and a report command:
+#
+#   env = DroneEnv(client=client, profiler=StepProfiler())
+#   ... run ...
+#   env.profiler.save('step_profile.npz')
+#   python -m profiling report step_profile.npz [--prometheus step.prom] [--csv step.csv]
+#
+# Without a profiler DroneEnv uses NULL_PROFILER, whose phases are a shared no-op context.
+
+MIN_LATENCY = 1e-6  # seconds; the histograms cover 1 us .. ~1 h
+SUB_BUCKETS = 16  # buckets per power of two, ~4.4% relative resolution
+NUM_BUCKETS = 32 * SUB_BUCKETS
+
+
+def bucket_upper_bounds():
+    return MIN_LATENCY * 2.0 ** ((np.arange(NUM_BUCKETS) + 1) / SUB_BUCKETS)
+
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram of durations in seconds, with an exact sum and max."""
+
+    def __init__(self, counts=None, total=0.0, maximum=0.0):
+        self.counts = np.zeros(NUM_BUCKETS, dtype=np.int64) if counts is None else counts
+        self.total = total
+        self.maximum = maximum
+
+    def record(self, seconds):
+        if seconds > MIN_LATENCY:
+            index = min(int(math.log2(seconds / MIN_LATENCY) * SUB_BUCKETS), NUM_BUCKETS - 1)
+        else:
+            index = 0
+        self.counts[index] += 1
+        self.total += seconds
+        if seconds > self.maximum:
+            self.maximum = seconds
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (q in 0..100)."""
+        count = self.count
+        if count == 0:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(self.counts), math.ceil(q / 100 * count)))
+        return min(float(bucket_upper_bounds()[index]), self.maximum)
+
+
+class _Phase:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.histogram.record(time.perf_counter() - self.start)
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class StepProfiler:
+    """Phase timers, latency histograms and per-action RPC counters for the env step loop.
+
+    phase(name) is a context manager timing one stage; action is set by the env at the start
+    of each step so RPCs made through a ProfiledClient are attributed to it. A disabled
+    profiler hands out a shared no-op context and records nothing.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.histograms = defaultdict(LatencyHistogram)
+        self.rpc_counts = Counter()  # (action, rpc) -> calls
+        self.action = 'reset'
+
+    def phase(self, name):
+        if not self.enabled:
+            return _NULL_PHASE
+        # A fresh context per use, so phases nest and the pipeline's worker thread can time its own
+        return _Phase(self.histograms[name])
+
+    def record(self, name, seconds):
+        if self.enabled:
+            self.histograms[name].record(seconds)
+
+    def count_rpc(self, rpc):
+        if self.enabled:
+            self.rpc_counts[(str(self.action), rpc)] += 1
+
+    def summary(self):
+        """Rows of (phase, count, total s, mean s, p50, p95, p99, max), slowest total first."""
+        rows = []
+        for name, histogram in self.histograms.items():
+            count = histogram.count
+            if count:
+                rows.append((name, count, histogram.total, histogram.total / count, histogram.percentile(50),
+                             histogram.percentile(95), histogram.percentile(99), histogram.maximum))
+        return sorted(rows, key=lambda row: -row[2])
+
+    def save(self, path):
+        names = sorted(self.histograms)
+        rpc_keys = sorted(self.rpc_counts)
+        np.savez(path,
+                 phases=np.array(names, dtype=str),
+                 counts=np.array([self.histograms[name].counts for name in names]).reshape(len(names), NUM_BUCKETS),
+                 totals=np.array([self.histograms[name].total for name in names]),
+                 maxima=np.array([self.histograms[name].maximum for name in names]),
+                 rpc_actions=np.array([str(action) for action, _ in rpc_keys], dtype=str),
+                 rpc_names=np.array([rpc for _, rpc in rpc_keys], dtype=str),
+                 rpc_counts=np.array([self.rpc_counts[key] for key in rpc_keys], dtype=np.int64))
+
+    @classmethod
+    def load(cls, path):
+        profiler = cls()
+        with np.load(path) as data:
+            for name, counts, total, maximum in zip(data['phases'], data['counts'], data['totals'], data['maxima']):
+                profiler.histograms[str(name)] = LatencyHistogram(counts.copy(), float(total), float(maximum))
+            for action, rpc, count in zip(data['rpc_actions'], data['rpc_names'], data['rpc_counts']):
+                profiler.rpc_counts[(str(action), str(rpc))] = int(count)
+        return profiler
+
+    def write_prometheus(self, path, prefix='drone_env'):
+        lines = [f'# HELP {prefix}_phase_seconds Time spent per DroneEnv.step phase.',
+                 f'# TYPE {prefix}_phase_seconds summary']
+        for name, count, total, _, p50, p95, p99, _ in self.summary():
+            for quantile, value in (('0.5', p50), ('0.95', p95), ('0.99', p99)):
+                lines.append(f'{prefix}_phase_seconds{{phase="{name}",quantile="{quantile}"}} {value:.9g}')
+            lines.append(f'{prefix}_phase_seconds_sum{{phase="{name}"}} {total:.9g}')
+            lines.append(f'{prefix}_phase_seconds_count{{phase="{name}"}} {count}')
+        lines += [f'# HELP {prefix}_rpc_calls_total Simulator RPCs per action.',
+                  f'# TYPE {prefix}_rpc_calls_total counter']
+        for (action, rpc), count in sorted(self.rpc_counts.items()):
+            lines.append(f'{prefix}_rpc_calls_total{{action="{action}",rpc="{rpc}"}} {count}')
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def write_csv(self, path):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['kind', 'name', 'action', 'count', 'total_s', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms',
+                             'max_ms'])
+            for name, count, total, mean, p50, p95, p99, maximum in self.summary():
+                writer.writerow(['phase', name, '', count, f'{total:.6f}'] +
+                                [f'{value * 1e3:.4f}' for value in (mean, p50, p95, p99, maximum)])
+            for (action, rpc), count in sorted(self.rpc_counts.items()):
+                writer.writerow(['rpc', rpc, action, count, '', '', '', '', '', ''])
+
+    def report(self):
+        rows = self.summary()
+        step = self.histograms.get('step')
+        step_total = step.total if step is not None and step.count else None
+        lines = [f"{'phase':<22}{'count':>8}{'total s':>10}{'% step':>8}{'mean ms':>10}{'p50 ms':>9}"
+                 f"{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"]
+        for name, count, total, mean, p50, p95, p99, maximum in rows:
+            share = f'{100 * total / step_total:7.1f}%' if step_total else f"{'':>8}"
+            lines.append(f'{name:<22}{count:>8}{total:>10.3f}{share}{mean * 1e3:>10.3f}{p50 * 1e3:>9.3f}'
+                         f'{p95 * 1e3:>9.3f}{p99 * 1e3:>9.3f}{maximum * 1e3:>9.3f}')
+        if self.rpc_counts:
+            actions = sorted({action for action, _ in self.rpc_counts})
+            rpcs = sorted({rpc for _, rpc in self.rpc_counts})
+            lines.append('')
+            lines.append(f"{'rpc calls by action':<28}" + ''.join(f'{action:>8}' for action in actions))
+            for rpc in rpcs:
+                lines.append(f'{rpc:<28}' + ''.join(f'{self.rpc_counts[(action, rpc)]:>8}' for action in actions))
+        return '\n'.join(lines)
+
+
+NULL_PROFILER = StepProfiler(enabled=False)
+
+
+class ProfiledClient:
+    """Client proxy that times every simulator call and counts it against the profiler's current action.
+
+    *Async calls are timed until the command is issued; waiting for them is the caller's
+    phase. Wrap the raw client, beneath any caching proxy, so only real RPCs are counted.
+    """
+
+    def __init__(self, client, profiler):
+        self.client = client
+        self.profiler = profiler
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if not callable(attribute):
+            return attribute
+        profiler = self.profiler
+        key = 'rpc.' + name
+
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attribute(*args, **kwargs)
+            finally:
+                profiler.record(key, time.perf_counter() - start)
+                profiler.count_rpc(name)
+        return call
+
+
+MultirotorClientInterface.register(ProfiledClient)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m profiling',
+                                     description="Summarize where DroneEnv.step time goes in a saved profile.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    report = commands.add_parser('report', help="print the phase and RPC breakdown of a profile")
+    report.add_argument('path', help="profile written by StepProfiler.save()")
+    report.add_argument('--prometheus', help="also write the profile as Prometheus text to this file")
+    report.add_argument('--csv', help="also write the profile as CSV to this file")
+    args = parser.parse_args()
+
+    profiler = StepProfiler.load(args.path)
+    print(profiler.report())
+    if args.prometheus:
+        profiler.write_prometheus(args.prometheus)
+    if args.csv:
+        profiler.write_csv(args.csv)
+
+
+if __name__ == "__main__":
+    main()
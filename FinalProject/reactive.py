@@ -0,0 +1,273 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from movements import ACTIONS
+from observation import DEPTH_REQUEST, OBSERVATION_SHAPE, DepthDecoder, DepthQuantizer
+from sim_settings import load_capture_settings
+
+# Reactive obstacle avoidance as a fixed-rate streaming control loop. Each tick reads the latest
+# depth image and vehicle state, measures clearance in a cone ahead of the camera and sends a
+# non-blocking velocity command (never joined, so the next tick's command supersedes it):
+#
+#   controller = ReactiveController(target_x=65)
+#   log = controller.fly(client, observation_client, rate_hz=20)
+#   print(log.summary())
+#
+# The same clearance rule drives ReactivePolicy, a baseline with SB3's predict() for DroneEnv's
+# discrete actions, e.g. evaluation.evaluate(ReactivePolicy(), eval_env).
+
+
+class ForwardCone:
+    """Closest depth in a cone around the camera axis, split into left-to-right sectors.
+
+    The cone is cut out of a planar depth image as a fixed bounding box plus a mask; per tick
+    the box is reduced to column minima once and the columns to sector minima with
+    np.minimum.reduceat, all into preallocated buffers.
+    """
+
+    def __init__(self, width, height, fov_degrees=90.0, half_angle_degrees=30.0, sectors=3):
+        focal = (width / 2) / math.tan(math.radians(fov_degrees) / 2)
+        u = (np.arange(width) + 0.5 - width / 2) / focal
+        v = (np.arange(height) + 0.5 - height / 2) / focal
+        # The pixel ray (1, u, v) is within the cone when its angle to the axis is small enough
+        inside = u[None, :] ** 2 + v[:, None] ** 2 <= math.tan(math.radians(half_angle_degrees)) ** 2
+        self.shape = (height, width)
+        rows, columns = np.flatnonzero(inside.any(axis=1)), np.flatnonzero(inside.any(axis=0))
+        self.rows = slice(rows[0], rows[-1] + 1)
+        self.columns = slice(columns[0], columns[-1] + 1)
+        # Added to the box: pushes pixels outside the cone to infinity without a masked write
+        self._outside = np.where(inside[self.rows, self.columns], 0.0, np.inf).astype(np.float32)
+        self._box = np.empty_like(self._outside)
+        self._column_minima = np.empty(self._outside.shape[1], dtype=np.float32)
+        self._sector_starts = np.linspace(0, self._outside.shape[1], sectors + 1).astype(int)[:-1]
+        self._sector_minima = np.empty(sectors, dtype=np.float32)
+
+    @classmethod
+    def from_settings(cls, shape=None, **kwargs):
+        """Cone for the settings.json camera, at its capture size or at `shape` (height, width, ...)."""
+        width, height, fov = load_capture_settings()
+        if shape is not None:
+            height, width = shape[:2]
+        return cls(width, height, fov, **kwargs)
+
+    def clearance(self, depth):
+        """Closest depth (metres) in each sector, left to right, of a (height, width) depth image."""
+        np.add(depth[self.rows, self.columns], self._outside, out=self._box)
+        np.min(self._box, axis=0, out=self._column_minima)
+        np.minimum.reduceat(self._column_minima, self._sector_starts, out=self._sector_minima)
+        return self._sector_minima
+
+
+class ObservationStream:
+    """Fetches (depth image, multirotor state) on `client` from a worker thread.
+
+    request(at) schedules a fetch to complete around the wall time `at`: it starts `lead_time`
+    earlier, a running average of how long fetches take. result() waits for the latest request.
+    """
+
+    def __init__(self, client, vehicle_name=''):
+        self.client = client
+        self.vehicle_name = vehicle_name
+        self.decoder = DepthDecoder()
+        self.lead_time = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def fetch(self):
+        """(depth as a (height, width) float32 array, state, wall time at which it was received)."""
+        start = time.perf_counter()
+        responses = self.client.simGetImages(DEPTH_REQUEST, vehicle_name=self.vehicle_name)
+        state = self.client.getMultirotorState(vehicle_name=self.vehicle_name)
+        received = time.perf_counter()
+        with self._lock:
+            self.lead_time = 0.8 * self.lead_time + 0.2 * (received - start)
+        # A copy: the decoder reuses its scratch memory on the next fetch
+        depth = np.array(self.decoder.raw_image(responses[0])) if responses else None
+        return depth, state, received
+
+    def _fetch_at(self, start):
+        delay = start - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        return self.fetch()
+
+    def request(self, at):
+        with self._lock:
+            start = at - self.lead_time
+        self._pending = self._executor.submit(self._fetch_at, start)
+
+    def result(self):
+        if self._pending is None:
+            return self.fetch()
+        pending, self._pending = self._pending, None
+        return pending.result()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+class ControlLog:
+    """Per-tick columns of a streaming flight: timing in wall seconds, positions in NED metres."""
+
+    COLUMNS = ('scheduled', 'started', 'sent', 'observed', 'positions', 'commands', 'clearance')
+
+    def __init__(self):
+        self.rows = {column: [] for column in self.COLUMNS}
+        self.reached = False
+        self.collided = False
+        self.overruns = 0  # ticks that started a full period late; the schedule skipped ahead
+
+    def record(self, **values):
+        for column, value in values.items():
+            self.rows[column].append(value)
+
+    def __len__(self):
+        return len(self.rows['started'])
+
+    def column(self, name):
+        return np.asarray(self.rows[name])
+
+    def summary(self):
+        """Tick jitter (start minus schedule), observation age when the command is sent and tick latency
+        (start to command sent) in milliseconds."""
+        started, sent = self.column('started'), self.column('sent')
+        jitter = (started - self.column('scheduled')) * 1e3
+        age = (sent - self.column('observed')) * 1e3
+        latency = (sent - started) * 1e3
+        periods = np.diff(started) * 1e3
+        return {'ticks': len(self), 'reached': self.reached, 'collided': self.collided, 'overruns': self.overruns,
+                'rate_hz': 1e3 / periods.mean() if len(periods) else float('nan'),
+                'jitter_p50_ms': float(np.percentile(jitter, 50)), 'jitter_p95_ms': float(np.percentile(jitter, 95)),
+                'age_p50_ms': float(np.percentile(age, 50)), 'age_p95_ms': float(np.percentile(age, 95)),
+                'latency_p50_ms': float(np.percentile(latency, 50)),
+                'latency_p95_ms': float(np.percentile(latency, 95))}
+
+
+class ReactiveController:
+    """Flies towards x = target_x at cruise speed, slowing, side-stepping and climbing around obstacles.
+
+    The forward cone is split into left, centre and right sectors. Within slow_distance the
+    centre clearance scales the forward speed down (to a stop at stop_distance) and the climb
+    rate up, to at most ceiling_z, and the vehicle side-steps towards a side sector that is
+    clear. The altitude setpoint is kept between ticks, so a climb is held once clear.
+    """
+
+    def __init__(self, target_x=65.0, cruise_speed=2.5, lateral_speed=1.5, climb_speed=2.0, cruise_z=-5.0,
+                 ceiling_z=-15.0, stop_distance=2.5, slow_distance=6.0, cone=None):
+        self.target_x = target_x
+        self.cruise_speed = cruise_speed
+        self.lateral_speed = lateral_speed
+        self.climb_speed = climb_speed
+        self.cruise_z = cruise_z
+        self.ceiling_z = ceiling_z
+        self.stop_distance = stop_distance
+        self.slow_distance = slow_distance
+        self.cone = cone
+        self.z_setpoint = cruise_z
+        self.last_clearance = None  # (left, centre, right) metres at the latest command
+
+    def reset(self):
+        self.z_setpoint = self.cruise_z
+
+    def command(self, depth, seconds):
+        """(vx, vy, z) for the next `seconds` of flight given a (height, width) planar depth image."""
+        if self.cone is None or self.cone.shape != depth.shape:
+            self.cone = ForwardCone.from_settings(depth.shape)
+        left, centre, right = self.last_clearance = tuple(float(c) for c in self.cone.clearance(depth))
+        # 1 when clear, 0 at stop_distance or closer
+        free = min(max((centre - self.stop_distance) / (self.slow_distance - self.stop_distance), 0.0), 1.0)
+        # Side-step only towards a sector that is itself clear: the cone sees nothing beside the vehicle
+        side = max(left, right)
+        vy = 0.0 if free == 1.0 or side < self.slow_distance else \
+            math.copysign(self.lateral_speed * (1.0 - free), right - left)
+        self.z_setpoint = max(self.z_setpoint - self.climb_speed * (1.0 - free) * seconds, self.ceiling_z)
+        return self.cruise_speed * free, vy, self.z_setpoint
+
+    def fly(self, client, observation_client=None, rate_hz=20.0, clock_speed=1.0, max_seconds=120.0,
+            vehicle_name=''):
+        """Run the control loop at rate_hz until the vehicle passes target_x, collides or max_seconds pass.
+
+        rate_hz is in simulated time: each command lasts one control period (1 / rate_hz simulated
+        seconds), so the vehicle never flies past what the tick's cone check covered, and ticks
+        are paced at 1 / (rate_hz * clock_speed) wall seconds. A tick that overruns leaves the
+        vehicle hovering once its command expires. With an `observation_client` each tick's depth
+        and state are fetched on it from a worker thread during the previous tick's idle time;
+        otherwise they are fetched at the start of the tick. max_seconds is wall time.
+        Returns the flight's ControlLog.
+        """
+        command_seconds = 1.0 / rate_hz
+        period = command_seconds / clock_speed
+        stream = ObservationStream(observation_client if observation_client is not None else client, vehicle_name)
+        asynchronous = observation_client is not None
+        log = ControlLog()
+        self.reset()
+        start = scheduled = time.perf_counter()
+        try:
+            while time.perf_counter() - start < max_seconds:
+                started = time.perf_counter()
+                depth, state, observed = stream.result()
+                position = state.kinematics_estimated.position
+                if state.collision.has_collided:
+                    log.collided = True
+                    break
+                if position.x_val >= self.target_x:
+                    log.reached = True
+                    break
+                vx, vy, z = self.command(depth, command_seconds)
+                client.moveByVelocityZAsync(vx, vy, z, command_seconds, vehicle_name=vehicle_name)
+                sent = time.perf_counter()
+                log.record(scheduled=scheduled, started=started, sent=sent, observed=observed,
+                           positions=(position.x_val, position.y_val, position.z_val), commands=(vx, vy, z),
+                           clearance=self.last_clearance)
+
+                scheduled += period
+                now = time.perf_counter()
+                if now - scheduled > period:
+                    log.overruns += 1
+                    scheduled = now
+                if asynchronous:
+                    stream.request(scheduled)
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        finally:
+            stream.close()
+        return log
+
+
+class ReactivePolicy:
+    """The controller's clearance rule as a policy over DroneEnv's discrete actions (movements.ACTIONS).
+
+    Each action travels a fixed distance, so an action is taken only when its direction is
+    clear beyond that distance plus `margin`: forward (2.5 m) on the centre sector, the climbing
+    45 degree moves (10 m) on the clearer side sector. When neither is clear the vehicle turns
+    towards the clearer side in place. predict() follows SB3's signature, taking a batch of
+    quantized observations (the newest frame of each stack is used).
+    """
+
+    FORWARD, RIGHT_UP, LEFT_UP, ROTATE_RIGHT, ROTATE_LEFT = 0, 1, 2, 5, 6
+
+    def __init__(self, margin=1.5, quantizer=None, shape=OBSERVATION_SHAPE, cone=None):
+        self.forward_distance = ACTIONS[self.FORWARD][1] * ACTIONS[self.FORWARD][2] + margin
+        self.climb_distance = ACTIONS[self.RIGHT_UP][1] * ACTIONS[self.RIGHT_UP][2] + margin
+        self.quantizer = quantizer if quantizer is not None else DepthQuantizer(np.uint8, shape)
+        self.cone = cone if cone is not None else ForwardCone.from_settings(shape)
+
+    def action(self, depth):
+        left, centre, right = self.cone.clearance(depth)
+        if centre >= self.forward_distance:
+            return self.FORWARD
+        if max(left, right) >= self.climb_distance:
+            return self.RIGHT_UP if right >= left else self.LEFT_UP
+        return self.ROTATE_RIGHT if right >= left else self.ROTATE_LEFT
+
+    def predict(self, observations, state=None, episode_start=None, deterministic=True):
+        observations = np.asarray(observations)
+        batch = observations.reshape((-1,) + observations.shape[-3:])
+        depth = self.quantizer.dequantize(batch[..., -1])
+        return np.array([self.action(image) for image in depth]), state
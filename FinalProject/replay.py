@@ -0,0 +1,185 @@
+import gymnasium
+import numpy as np
+from stable_baselines3.common.buffers import BaseBuffer
+from stable_baselines3.common.type_aliases import DictReplayBufferSamples, ReplayBufferSamples
+
+
+class FrameReplayBuffer(BaseBuffer):
+    """DQN replay buffer that stores every observation frame once.
+
+    A transition's next_obs is the following transition's obs, so frames live in a single ring
+    (SB3's optimize_memory_usage layout). Unlike that layout, episode ends are handled exactly:
+    the terminal next_obs of a finished episode, which differs from the reset observation that
+    follows it, is kept in a side table, so timeouts can still be bootstrapped through
+    (handle_timeout_termination). Frames are stored in the env's observation dtype, so with
+    DroneEnv's uint8 observations a 72x128 transition costs ~9 KB instead of the ~74 KB of
+    float32 obs + next_obs. If a `quantizer` (observation.DepthQuantizer) is given, sampled
+    observations are dequantized back to float32 metres for policies that consume depth directly.
+
+    With `frame_stack` k matching DroneEnv(frame_stack=k), only the newest frame of each stacked
+    observation is stored and stacks are rebuilt at sample time, repeating an episode's first
+    frame like FrameStack does, so stacking costs no extra replay memory. Dict observations
+    (DroneEnv(lowres=True)) are stored per key the same way.
+
+    With `n_steps` > 1, a sampled transition carries the discounted return of up to n_steps
+    rewards of its episode and the observation after the last of them; its `discounts` field,
+    gamma ** steps taken, replaces DQN's gamma in the TD target. Returns are built from the ring
+    at sample time, so n can change without touching the stored transitions.
+
+    Use with DQN(..., replay_buffer_class=FrameReplayBuffer,
+    replay_buffer_kwargs=dict(frame_stack=k)).
+    """
+
+    def __init__(self, buffer_size, observation_space, action_space, device='auto', n_envs=1,
+                 optimize_memory_usage=True, handle_timeout_termination=True, quantizer=None, frame_stack=1,
+                 n_steps=1, gamma=0.99):
+        # optimize_memory_usage is accepted for the off-policy algorithms' constructor call; the
+        # shared-frame layout is always used.
+        super(FrameReplayBuffer, self).__init__(buffer_size, observation_space, action_space, device, n_envs=n_envs)
+        self.buffer_size = max(buffer_size // n_envs, 1)
+        self.handle_timeout_termination = handle_timeout_termination
+        self.quantizer = quantizer
+        self.frame_stack = frame_stack
+        self.n_steps = n_steps
+        self.gamma = gamma  # discount of the n-step returns, DQN's gamma
+        self.is_dict = isinstance(getattr(observation_space, 'spaces', None), dict)
+        spaces = observation_space.spaces if self.is_dict else {None: observation_space}
+
+        self.frames = {}
+        self.stacked_shapes = {key: space.shape for key, space in spaces.items()}
+        for key, space in spaces.items():
+            frame_shape = space.shape[:-1] + (space.shape[-1] // frame_stack,)
+            self.frames[key] = np.zeros((self.buffer_size, self.n_envs) + frame_shape, dtype=space.dtype)
+        self.actions = np.zeros((self.buffer_size, self.n_envs, self.action_dim), dtype=action_space.dtype)
+        self.rewards = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.dones = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.timeouts = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.episode_starts = np.zeros((self.buffer_size, self.n_envs), dtype=bool)
+        self.terminal_frames = {}  # (pos, env) -> newest frame(s) of a transition's terminal next_obs
+        self._episode_start = np.ones(self.n_envs, dtype=bool)
+        self.num_added = 0  # add() calls so far, for checkpoint.py's incremental snapshots
+
+    def _newest(self, obs, key):
+        # The last frame of each env's (possibly stacked) observation for one key.
+        frames = np.asarray(obs[key] if self.is_dict else obs).reshape((self.n_envs,) + self.stacked_shapes[key])
+        return frames[..., -self.frames[key].shape[-1]:]
+
+    def add(self, obs, next_obs, action, reward, done, infos):
+        pos, following = self.pos, (self.pos + 1) % self.buffer_size
+        for env in range(self.n_envs):
+            self.terminal_frames.pop((pos, env), None)
+        for key, frames in self.frames.items():
+            frames[pos] = self._newest(obs, key)
+            # Provisional: overwritten by the next obs, which is this next_obs unless the episode ended
+            newest_next = self._newest(next_obs, key)
+            frames[following] = newest_next
+            for env in np.flatnonzero(done):
+                self.terminal_frames.setdefault((pos, env), {})[key] = newest_next[env].copy()
+
+        self.actions[pos] = np.array(action).reshape((self.n_envs, self.action_dim))
+        self.rewards[pos] = np.array(reward)
+        self.dones[pos] = np.array(done)
+        if self.handle_timeout_termination:
+            self.timeouts[pos] = np.array([info.get("TimeLimit.truncated", False) for info in infos])
+        self.episode_starts[pos] = self._episode_start
+        self.episode_starts[following] = False
+        self._episode_start = np.array(done, dtype=bool).reshape(self.n_envs)
+
+        self.num_added += 1
+        self.pos += 1
+        if self.pos == self.buffer_size:
+            self.full = True
+            self.pos = 0
+
+    def sample(self, batch_size, env=None):
+        # The slot at self.pos holds a provisional next_obs, and when the buffer has wrapped the
+        # frame_stack - 1 transitions after it are missing the older frames of their stacks.
+        if self.full:
+            batch_inds = (np.random.randint(self.frame_stack, self.buffer_size, size=batch_size) + self.pos) % self.buffer_size
+        else:
+            batch_inds = np.random.randint(0, self.pos, size=batch_size)
+        return self._get_samples(batch_inds, env=env)
+
+    def _stack_indices(self, last, env_indices):
+        """Ring indices (batch, frame_stack) of the frames stacked into the observation at `last`."""
+        indices = last[:, None] - np.arange(self.frame_stack - 1, -1, -1)
+        for j in range(self.frame_stack - 1, 0, -1):
+            # Frames before an episode's first one repeat that first frame
+            start = self.episode_starts[indices[:, j] % self.buffer_size, env_indices]
+            indices[start, :j] = indices[start, j:j + 1]
+        return indices % self.buffer_size
+
+    @staticmethod
+    def _concatenate(stack):
+        # (batch, k, ..., channels) oldest first -> (batch, ..., k * channels), as LazyFrames stacks
+        stack = np.moveaxis(stack, 1, -2)
+        return stack.reshape(stack.shape[:-2] + (-1,))
+
+    def _n_step(self, batch_inds, env_indices):
+        """(returns, index of the last transition, discounts) of n-step returns from batch_inds.
+
+        A return stops after its episode's last transition and at the newest one written.
+        """
+        offsets = np.arange(self.n_steps)
+        indices = (batch_inds[:, None] + offsets) % self.buffer_size
+        rewards = self.rewards[indices, env_indices[:, None]]
+        dones = self.dones[indices, env_indices[:, None]]
+        available = (self.pos - 1 - batch_inds) % self.buffer_size + 1
+        ended = np.cumsum(dones, axis=1) - dones > 0  # an earlier transition finished the episode
+        taken = (offsets < available[:, None]) & ~ended
+        steps = taken.sum(axis=1)
+        returns = (rewards * taken * self.gamma ** offsets).sum(axis=1, dtype=np.float32)
+        return returns, batch_inds + steps - 1, (self.gamma ** steps).astype(np.float32)
+
+    def _get_samples(self, batch_inds, env=None, env_indices=None):
+        if env_indices is None:
+            env_indices = np.random.randint(0, high=self.n_envs, size=(len(batch_inds),))
+        if self.n_steps > 1:
+            rewards, last_inds, discounts = self._n_step(batch_inds, env_indices)
+        else:
+            rewards, last_inds, discounts = self.rewards[batch_inds, env_indices], batch_inds, None
+        last_ring = last_inds % self.buffer_size
+        terminal = np.flatnonzero(self.dones[last_ring, env_indices])
+        obs_indices = self._stack_indices(batch_inds, env_indices)
+        last_indices = obs_indices if self.n_steps == 1 else self._stack_indices(last_inds, env_indices)
+        next_indices = self._stack_indices(last_inds + 1, env_indices)
+        # A finished episode's next_obs continues its own stack, ending in the terminal frame
+        next_indices[terminal, :-1] = last_indices[terminal, 1:]
+
+        obs, next_obs = {}, {}
+        for key, frames in self.frames.items():
+            obs[key] = self._concatenate(frames[obs_indices, env_indices[:, None]])
+            next_frames = frames[next_indices, env_indices[:, None]]
+            for k in terminal:
+                next_frames[k, -1] = self.terminal_frames[(last_ring[k], env_indices[k])][key]
+            next_obs[key] = self._concatenate(next_frames)
+            if self.quantizer is not None:
+                obs[key], next_obs[key] = self.quantizer.dequantize(obs[key]), self.quantizer.dequantize(next_obs[key])
+
+        if not self.is_dict:
+            obs, next_obs = obs[None], next_obs[None]
+        obs, next_obs = self._normalize_obs(obs, env), self._normalize_obs(next_obs, env)
+        actions = self.to_torch(self.actions[batch_inds, env_indices, :])
+        # Timeouts are not terminal: bootstrap through them when handle_timeout_termination is set
+        dones = self.to_torch((self.dones[last_ring, env_indices]
+                               * (1 - self.timeouts[last_ring, env_indices])).reshape(-1, 1))
+        rewards = self.to_torch(self._normalize_reward(rewards.reshape(-1, 1), env))
+        discounts = self.to_torch(discounts.reshape(-1, 1)) if discounts is not None else None
+        if self.is_dict:
+            return DictReplayBufferSamples({key: self.to_torch(value) for key, value in obs.items()}, actions,
+                                           {key: self.to_torch(value) for key, value in next_obs.items()},
+                                           dones, rewards, discounts)
+        return ReplayBufferSamples(self.to_torch(obs), actions, self.to_torch(next_obs), dones, rewards, discounts)
+
+    def nbytes(self):
+        """Memory held by the stored transitions, frames included."""
+        terminal = sum(frame.nbytes for frames in self.terminal_frames.values() for frame in frames.values())
+        return (sum(frames.nbytes for frames in self.frames.values()) + self.actions.nbytes + self.rewards.nbytes
+                + self.dones.nbytes + self.timeouts.nbytes + self.episode_starts.nbytes + terminal)
+
+
+def gymnasium_space(space):
+    """The gymnasium equivalent of a gym Box/Dict space, as SB3 expects (it converts gym envs on wrap)."""
+    if isinstance(getattr(space, 'spaces', None), dict):
+        return gymnasium.spaces.Dict({key: gymnasium_space(value) for key, value in space.spaces.items()})
+    return gymnasium.spaces.Box(space.low, space.high, space.shape, space.dtype)
@@ -0,0 +1,67 @@
+import math
+
+import numpy as np
+
+try:
+    import airsim
+except ImportError:  # no simulator package installed, fall back to the in-process fake
+    import fake_airsim as airsim
+
+# Start states for DroneEnv's fast reset. Instead of a full simulator reset and take-off, the
+# vehicle is teleported to one of these hover poses, which have been checked for clearance
+# beforehand. States are kept easiest first (furthest along x, i.e. closest to the goal line),
+# and `difficulty` limits sampling to that leading fraction of the pool for a curriculum.
+
+
+def hover_pose(x, y, z, yaw_degrees=0.0):
+    return airsim.Pose(airsim.Vector3r(float(x), float(y), float(z)),
+                       airsim.to_quaternion(0, 0, math.radians(yaw_degrees)))
+
+
+def candidate_positions(center, count, spread=(4.0, 4.0, 1.0), seed=None):
+    """`count` positions scattered uniformly within +/- spread (x, y, z) metres of center."""
+    rng = np.random.default_rng(seed)
+    return np.asarray(center, dtype=float) + rng.uniform(-1, 1, (count, 3)) * np.asarray(spread, dtype=float)
+
+
+class ResetStatePool:
+    """Pool of (position, yaw) start states sampled by DroneEnv(start_states=...) on each reset."""
+
+    def __init__(self, positions, yaws=None, difficulty=1.0, seed=None):
+        positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        yaws = np.zeros(len(positions)) if yaws is None else np.asarray(yaws, dtype=float).reshape(-1)
+        order = np.argsort(-positions[:, 0], kind='stable')
+        self.positions = positions[order]
+        self.yaws = yaws[order]  # degrees
+        self.difficulty = difficulty
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def pose(self, index):
+        x, y, z = self.positions[index]
+        return hover_pose(x, y, z, self.yaws[index])
+
+    def sample(self):
+        """Pose of a uniformly drawn state among the easiest `difficulty` fraction of the pool."""
+        active = max(1, int(math.ceil(self.difficulty * len(self))))
+        return self.pose(int(self.rng.integers(active)))
+
+    @classmethod
+    def validated(cls, env, positions, yaws=None, min_clearance=2.0, max_altitude=10.0, **kwargs):
+        """Pool of the candidates at which env's camera sees nothing closer than min_clearance.
+
+        Each candidate is visited with env.teleport(); candidates below the floor or beyond the
+        altitude at which compute_reward ends the episode are dropped without a visit.
+        """
+        positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        yaws = np.zeros(len(positions)) if yaws is None else np.asarray(yaws, dtype=float).reshape(-1)
+        keep = np.zeros(len(positions), dtype=bool)
+        for i, (x, y, z) in enumerate(positions):
+            if not -max_altitude < z < 0:
+                continue
+            env.teleport(hover_pose(x, y, z, yaws[i]))
+            depth, _ = env.get_depth_image(reset=True)
+            keep[i] = np.min(depth) >= min_clearance
+        return cls(positions[keep], yaws[keep], **kwargs)
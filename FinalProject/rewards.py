@@ -0,0 +1,93 @@
+from collections import namedtuple
+
+import numpy as np
+
+from telemetry import RESET_ACTION, TIMEOUT_ACTION, episode_groups
+
+# The drone's reward as a pure function of NumPy arrays. compute_rewards() scores a whole batch of
+# transitions (previous position, current position, closest depth in front) in one pass; the live
+# DroneEnv, DroneVecEnv and offline relabelling of logged telemetry all go through it:
+#
+#   records = load_telemetry('telemetry.npy')
+#   rewards, dones = relabel(records, weights=RewardWeights(forward=10.0))
+
+RewardWeights = namedtuple('RewardWeights', [
+    'step_cost',           # added to every transition
+    'z_increase',          # per metre of positive z change
+    'z_decrease',          # per metre of negative z change, subtracted
+    'forward',             # per metre of positive x change
+    'backward',            # per metre of negative x change (the change itself is negative)
+    'proximity',           # times 1 / front_distance, subtracted when closer than proximity_distance
+    'proximity_distance',
+    'collision_distance',  # closer than this ends the episode as a collision
+    'collision_reward',
+    'goal_reward',         # for reaching x >= target_x
+    'altitude_limit',      # |z| beyond this ends the episode
+    'altitude_reward',
+    'timeout_reward',      # for the step that hits the time or action limit
+], defaults=[-1.0, 5.0, 3.0, 7.0, 1.0, 5.0, 1.0, 0.5, -5.0, 100.0, 10.0, -25.0, -100.0])
+
+DEFAULT_WEIGHTS = RewardWeights()
+
+
+def compute_rewards(previous_positions, current_positions, front_distances, target_x, weights=DEFAULT_WEIGHTS):
+    """Rewards and episode ends for N transitions given (N, 3) positions and (N,) front distances.
+
+    Returns (rewards as float64, dones as bool). The collision, goal and altitude outcomes
+    override the shaped reward, in that order of precedence from last to first.
+    """
+    previous_positions = np.asarray(previous_positions)
+    current_positions = np.asarray(current_positions)
+    front_distances = np.asarray(front_distances)
+    x_change = current_positions[:, 0] - previous_positions[:, 0]
+    z_change = current_positions[:, 2] - previous_positions[:, 2]
+    x = current_positions[:, 0]
+
+    rewards = np.full(len(x_change), weights.step_cost)
+    rewards += np.where(z_change > 0, weights.z_increase * z_change, 0.0)
+    rewards -= np.where(z_change < 0, weights.z_decrease * np.abs(z_change), 0.0)
+    rewards += np.where(x_change > 0, weights.forward * x_change, 0.0)
+    rewards += np.where(x_change < 0, weights.backward * x_change, 0.0)
+    with np.errstate(divide='ignore'):
+        rewards -= np.where(front_distances < weights.proximity_distance,
+                            (1.0 / front_distances) * weights.proximity, 0.0)
+
+    collided = front_distances < weights.collision_distance
+    reached = x >= target_x
+    rewards = np.where(collided, weights.collision_reward, np.where(reached, weights.goal_reward, rewards))
+    strayed = np.abs(current_positions[:, 2]) > weights.altitude_limit
+    rewards = np.where(strayed, weights.altitude_reward, rewards)
+    return rewards, collided | reached | strayed
+
+
+def relabel(records, target_x=35, weights=DEFAULT_WEIGHTS):
+    """Recompute (rewards, dones) of logged telemetry records, aligned with the records.
+
+    Each step is scored from the previous record of its episode, which for the first step is
+    the episode's reset record. Reset records get a reward of 0, timeout records the timeout
+    reward; a step without an earlier record in its episode gets NaN. Positions are logged as
+    float32, so rewards match the live ones up to that rounding.
+    """
+    _, order, starts = episode_groups(records)
+    x = np.asarray(records['x'])[order]
+    y = np.asarray(records['y'])[order]
+    z = np.asarray(records['z'])[order]
+    actions = np.asarray(records['action'])[order]
+    positions = np.column_stack([x, y, z]).astype(np.float64)
+    has_previous = np.ones(len(order), dtype=bool)
+    has_previous[starts] = False
+    previous = np.roll(positions, 1, axis=0)
+
+    rewards, dones = compute_rewards(previous, positions, np.asarray(records['front_distance'])[order], target_x,
+                                     weights)
+    rewards[~has_previous] = np.nan
+    rewards[actions == RESET_ACTION] = 0.0
+    dones[actions == RESET_ACTION] = False
+    rewards[actions == TIMEOUT_ACTION] = weights.timeout_reward
+    dones[actions == TIMEOUT_ACTION] = True
+
+    aligned_rewards = np.empty_like(rewards)
+    aligned_dones = np.empty_like(dones)
+    aligned_rewards[order] = rewards
+    aligned_dones[order] = dones
+    return aligned_rewards, aligned_dones
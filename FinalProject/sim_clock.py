@@ -0,0 +1,69 @@
+import time
+from contextlib import contextmanager
+
+from stable_baselines3.common.callbacks import BaseCallback
+
+# Simulator-time helpers. Durations in the movement primitives and the episode time limit are
+# simulated seconds, read from the simulator's own timestamps, so they mean the same thing at
+# any ClockSpeed; only wall-clock waits are divided by the clock speed.
+
+
+def sim_seconds(timestamp):
+    """Simulated seconds of an AirSim timestamp (nanoseconds, as in MultirotorState and ImageResponse)."""
+    return timestamp * 1e-9
+
+
+class SimContinuation:
+    """Future-like handle for simContinueForTime: join() returns once the simulator has paused again."""
+
+    def __init__(self, client, wall_seconds, poll_interval=0.001):
+        self.client = client
+        self.ready_at = time.perf_counter() + wall_seconds
+        self.poll_interval = poll_interval
+
+    def join(self):
+        remaining = self.ready_at - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+        while not self.client.simIsPause():
+            time.sleep(self.poll_interval)
+
+
+def continue_for_time(client, seconds, clock_speed=1.0):
+    """Run a paused simulator for `seconds` of simulated time and return a SimContinuation."""
+    client.simContinueForTime(seconds)
+    return SimContinuation(client, seconds / clock_speed)
+
+
+@contextmanager
+def paused(client):
+    """Hold the simulator still for the duration of the block."""
+    client.simPause(True)
+    try:
+        yield
+    finally:
+        client.simPause(False)
+
+
+class SimPauseCallback(BaseCallback):
+    """Pauses the simulator while SB3 trains on collected experience and resumes it for the next rollout.
+
+    The vehicle then hovers frozen instead of drifting through a learner update, and the
+    update's wall time never counts towards the episode's simulated time limit.
+    """
+
+    def __init__(self, client, verbose=0):
+        super(SimPauseCallback, self).__init__(verbose)
+        self.client = client
+
+    def _on_rollout_start(self):
+        self.client.simPause(False)
+
+    def _on_rollout_end(self):
+        self.client.simPause(True)
+
+    def _on_step(self):
+        return True
+
+    def _on_training_end(self):
+        self.client.simPause(False)
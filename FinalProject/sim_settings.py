@@ -0,0 +1,22 @@
+import json
+import os
+
+# Readers for the AirSim settings.json shipped next to these scripts.
+
+SETTINGS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'settings.json')
+
+
+def load_settings(path=SETTINGS_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_capture_settings(path=SETTINGS_PATH):
+    """Return (width, height, fov_degrees) of the first CaptureSettings entry in settings.json."""
+    capture = load_settings(path)['CameraDefaults']['CaptureSettings'][0]
+    return capture['Width'], capture['Height'], capture['FOV_Degrees']
+
+
+def load_clock_speed(path=SETTINGS_PATH):
+    """Simulated seconds per wall-clock second configured for the simulator."""
+    return float(load_settings(path).get('ClockSpeed', 1.0))
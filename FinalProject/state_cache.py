@@ -0,0 +1,69 @@
+from clients import MultirotorClientInterface
+
+try:
+    import airsim
+except ImportError:  # no simulator package installed, fall back to the in-process fake
+    import fake_airsim as airsim
+
+# Calls that change what the vehicle is doing; any of them makes the cached state stale.
+INVALIDATING_CALLS = ('reset', 'simSetVehiclePose', 'enableApiControl', 'armDisarm', 'simContinueForTime')
+
+
+class CachedStateClient:
+    """Client proxy serving pose and state queries from one getMultirotorState snapshot per vehicle.
+
+    The first simGetVehiclePose or getMultirotorState after a command fetches the state once;
+    every later query, from the reward code, the movement primitives, the position log or an
+    evaluation loop, is answered from that snapshot until the next *Async command, reset or
+    pose change invalidates it. Poses are built from kinematics_estimated, which matches the
+    ground-truth pose under AirSim's default simple_flight settings. All other calls go
+    straight through to the wrapped client.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._states = {}
+        self.state_requests = 0  # pose/state queries made by callers
+        self.state_fetches = 0  # getMultirotorState RPCs actually sent
+
+    @property
+    def rpcs_saved(self):
+        return self.state_requests - self.state_fetches
+
+    def getMultirotorState(self, vehicle_name=''):
+        self.state_requests += 1
+        state = self._states.get(vehicle_name)
+        if state is None:
+            self.state_fetches += 1
+            state = self._states[vehicle_name] = self.client.getMultirotorState(vehicle_name=vehicle_name)
+        return state
+
+    def simGetVehiclePose(self, vehicle_name=''):
+        kinematics = self.getMultirotorState(vehicle_name=vehicle_name).kinematics_estimated
+        return airsim.Pose(kinematics.position, kinematics.orientation)
+
+    def store(self, state, vehicle_name='', fetched=True):
+        """Adopt a state as the current snapshot. fetched=False when it was fetched through this proxy,
+        which already counted it; True when it came from another connection (e.g. an observation one)."""
+        if fetched:
+            self.state_fetches += 1
+        self._states[vehicle_name] = state
+
+    def invalidate(self, vehicle_name=None):
+        if vehicle_name is None:
+            self._states.clear()
+        else:
+            self._states.pop(vehicle_name, None)
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if not callable(attribute) or not (name.endswith('Async') or name in INVALIDATING_CALLS):
+            return attribute
+
+        def command(*args, **kwargs):
+            self.invalidate(kwargs.get('vehicle_name') if name != 'reset' else None)
+            return attribute(*args, **kwargs)
+        return command
+
+
+MultirotorClientInterface.register(CachedStateClient)
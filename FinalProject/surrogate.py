@@ -0,0 +1,89 @@
+import numpy as np
+
+from depth_renderer import DepthRenderer, slab_intersect
+from fake_airsim import MultirotorClient
+from sim_settings import load_capture_settings
+
+# NumPy kinematic surrogate of the Unreal Blocks world: axis-aligned box obstacles on a flat
+# floor and a ray-cast planar depth camera. Coordinates follow AirSim's NED frame, so the
+# floor is the plane z = 0 and altitude is negative z.
+
+
+class BlocksWorld:
+    """Axis-aligned boxes, stored as (N, 3) arrays of min and max corners, on an unbounded floor at z = 0."""
+
+    def __init__(self, box_min, box_max):
+        self.box_min = np.asarray(box_min, dtype=float).reshape(-1, 3)
+        self.box_max = np.asarray(box_max, dtype=float).reshape(-1, 3)
+
+    @classmethod
+    def default(cls):
+        """Fixed layout of cubes between the start point and the goal line at x = 35."""
+        centers = [(10, 0), (10, 8), (10, -8), (17, 4), (17, -4), (24, 0), (24, 9), (24, -9), (30, 5), (30, -5)]
+        sizes = [4, 3, 3, 4, 4, 5, 3, 3, 4, 4]
+        heights = [6, 8, 8, 7, 7, 6, 9, 9, 7, 7]
+        return cls.from_blocks(centers, sizes, heights)
+
+    @classmethod
+    def random(cls, num_blocks=12, seed=None, x_range=(8, 32), y_range=(-12, 12)):
+        """Randomly placed cubes in the corridor ahead of the start point."""
+        rng = np.random.default_rng(seed)
+        centers = np.column_stack([rng.uniform(*x_range, num_blocks), rng.uniform(*y_range, num_blocks)])
+        sizes = rng.uniform(2, 5, num_blocks)
+        heights = rng.uniform(3, 10, num_blocks)
+        return cls.from_blocks(centers, sizes, heights)
+
+    @classmethod
+    def from_blocks(cls, centers, sizes, heights):
+        """Build boxes standing on the floor from (x, y) centers, footprint sizes and heights."""
+        centers = np.asarray(centers, dtype=float)
+        half = np.asarray(sizes, dtype=float) / 2
+        heights = np.asarray(heights, dtype=float)
+        box_min = np.column_stack([centers[:, 0] - half, centers[:, 1] - half, -heights])
+        box_max = np.column_stack([centers[:, 0] + half, centers[:, 1] + half, np.zeros(len(centers))])
+        return cls(box_min, box_max)
+
+    def first_hit(self, start, end, radius=0.0):
+        """Fraction along the segment start->end at which a sphere of `radius` first touches a box, or None."""
+        if len(self.box_min) == 0:
+            return None
+        direction = np.asarray(end, dtype=float) - start
+        t_near, t_far = slab_intersect(start, direction[None, :], self.box_min - radius, self.box_max + radius)
+        t_near, t_far = t_near[0], t_far[0]
+        hit = (t_far > np.maximum(t_near, 0.0)) & (t_near <= 1.0)
+        if not hit.any():
+            return None
+        return max(float(t_near[hit].min()), 0.0)
+
+
+class SurrogateClient(MultirotorClient):
+    """MultirotorClient backed by a BlocksWorld: kinematic motion with collisions and ray-cast depth."""
+
+    def __init__(self, ip="", port=41451, timeout_value=3600, vehicle_names=("",), world=None,
+                 image_size=None, fov_degrees=None, drone_radius=0.5, rpc_delay=0.0, takeoff_z=-3.0,
+                 clock_speed=None, binary_images=True):
+        width, height, fov = load_capture_settings()
+        image_size = image_size if image_size is not None else (width, height)
+        super(SurrogateClient, self).__init__(ip, port, timeout_value, vehicle_names=vehicle_names,
+                                              image_size=image_size, rpc_delay=rpc_delay, takeoff_z=takeoff_z,
+                                              clock_speed=clock_speed, binary_images=binary_images)
+        self.world = world if world is not None else BlocksWorld.default()
+        self.camera = DepthRenderer(self.world.box_min, self.world.box_max, image_size[0], image_size[1],
+                                    fov_degrees if fov_degrees is not None else fov)
+        self.drone_radius = drone_radius
+
+    def _fly(self, vehicle, target, seconds):
+        target = np.array(target, dtype=float)
+        target[2] = min(target[2], 0.0)  # the floor stops descents
+        t_hit = self.world.first_hit(vehicle.position, target, self.drone_radius)
+        if t_hit is not None:
+            # Stop just short of the contact point so the vehicle can still back away.
+            t_hit = max(t_hit - 1e-3, 0.0)
+            target = vehicle.position + (target - vehicle.position) * t_hit
+            seconds *= t_hit
+            vehicle.has_collided = True
+        return super(SurrogateClient, self)._fly(vehicle, target, seconds)
+
+    def _render(self, request, vehicle):
+        depth = self.camera.render(vehicle.position, vehicle.yaw)
+        return self._response(request, depth, self.camera.width, self.camera.height)
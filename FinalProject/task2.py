@@ -1,20 +1,15 @@
-import airsim
-import numpy as np
-import time
-
-def get_depth_image(client):
-    """Retrieve and process depth image from the drone's sensor."""
-    responses = client.simGetImages([airsim.ImageRequest("0", airsim.ImageType.DepthPlanar, pixels_as_float=True)])
-    if responses:
-        response = responses[0]
-        img_data = np.array(response.image_data_float, dtype=np.float32)
-        depth_image = np.reshape(img_data, (response.height, response.width))
-        return depth_image
-    else:
-        return None
+import argparse
+
+from clients import BACKENDS, make_client, make_observation_client
+from reactive import ReactiveController
+from sim_settings import load_clock_speed
+
 
-def main():
-    client = airsim.MultirotorClient()
+def main(backend='airsim', rate_hz=20.0, clock_speed=None, target_x=65):
+    # AirSim runs at the ClockSpeed of settings.json; the in-process backends take it here
+    clock_speed = clock_speed if clock_speed is not None else load_clock_speed()
+    client = make_client(backend) if backend == 'airsim' else make_client(backend, clock_speed=clock_speed)
+    observation_client = make_observation_client(backend, client)
     client.confirmConnection()
     client.enableApiControl(True)
     client.armDisarm(True)
@@ -23,34 +18,33 @@ def main():
     client.takeoffAsync().join()
     client.moveToZAsync(-5, 5).join()  # Adjust altitude to a safe level
 
-    target_x = 65
-    current_x = 0
-    step = 5
-    obstacle_threshold = 2.5  # meters
-
-    while current_x < target_x:
-        print("Moving forward...")
-        client.moveByVelocityAsync(2.5, 0, 0, 1).join()  # Move forward at 5 m/s
-        depth_image = get_depth_image(client)
-        if depth_image is not None:
-            front_distance = np.min(depth_image)  # Simple obstacle detection in front
-            print("Detected distance:", front_distance)
-
-            while front_distance < obstacle_threshold:
-                print("Obstacle detected! Ascending...")
-                client.moveToZAsync(-15, 2).join()  # Move higher
-                depth_image = get_depth_image(client)
-                front_distance = np.min(depth_image) if depth_image is not None else float('inf')
-
-        current_x += step  # Simulate forward movement increment
-
-    print("Destination reached. Landing...")
-    client.moveToPositionAsync(65, 0, -10, 5).join()  # Move to the exact landing spot
+    # Streaming obstacle avoidance at rate_hz, tracking the vehicle's actual x position
+    controller = ReactiveController(target_x=target_x, stop_distance=2.5)
+    log = controller.fly(client, observation_client, rate_hz=rate_hz, clock_speed=clock_speed)
+    summary = log.summary()
+    print(f"{summary['ticks']} ticks at {summary['rate_hz']:.1f} Hz wall clock, jitter p95 {summary['jitter_p95_ms']:.2f} ms, "
+          f"latency p95 {summary['latency_p95_ms']:.2f} ms")
+
+    if log.reached:
+        print("Destination reached. Landing...")
+        client.moveToPositionAsync(target_x, 0, -10, 5).join()  # Move to the exact landing spot
+    else:
+        print("Collision detected. Landing..." if log.collided else "Out of time. Landing...")
     client.landAsync().join()
 
     client.armDisarm(False)
     client.enableApiControl(False)
-    print("Mission completed successfully.")
+    print("Mission completed successfully." if log.reached else "Mission aborted.")
+
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Reactive obstacle avoidance towards x = target_x.")
+    parser.add_argument('--backend', choices=BACKENDS, default='airsim')
+    parser.add_argument('--rate', type=float, default=20.0,
+                        help="control loop rate in Hz of simulated time; each command lasts 1 / rate simulated seconds")
+    parser.add_argument('--clock-speed', type=float,
+                        help="simulated seconds per wall-clock second (default: ClockSpeed in settings.json); "
+                             "ticks are then paced at 1 / (rate * clock_speed) wall seconds")
+    parser.add_argument('--target-x', type=float, default=65)
+    args = parser.parse_args()
+    main(args.backend, args.rate, args.clock_speed, args.target_x)
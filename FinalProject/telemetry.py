@@ -0,0 +1,157 @@
+import os
+import struct
+
+import numpy as np
+
+# Per-step telemetry streamed to disk in constant memory.
+#
+# Records are written into a preallocated structured chunk and appended to a .npy file whose
+# header is rewritten with the new row count after every flush. The file is therefore always a
+# valid .npy of everything flushed so far and can be memory-mapped, even while a run is still
+# writing it: records = load_telemetry('telemetry.npy'); records['x'][records['episode'] == 3].
+
+RECORD_DTYPE = np.dtype([
+    ('episode', np.int32),
+    ('env', np.int16),
+    ('step', np.int16),
+    ('action', np.int16),
+    ('reward', np.float32),
+    ('x', np.float32),
+    ('y', np.float32),
+    ('z', np.float32),
+    ('yaw', np.float32),  # degrees
+    ('front_distance', np.float32),
+    ('latency', np.float32),  # seconds of wall time spent in the env step
+])
+
+# Records that aren't steps are marked in the action column. A reset record holds the episode's
+# start pose (step 0, reward 0), so every step has the pose it started from in the log.
+TIMEOUT_ACTION = -1
+RESET_ACTION = -2
+
+HEADER_SIZE = 1024  # fixed, so the row count can be rewritten in place as the file grows
+MAGIC = b'\x93NUMPY\x01\x00'
+
+
+def _header(dtype, rows):
+    header = repr({'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (rows,)})
+    padding = HEADER_SIZE - len(MAGIC) - 2 - len(header) - 1
+    if padding < 0:
+        raise ValueError("record dtype too large for the fixed .npy header")
+    return MAGIC + struct.pack('<H', HEADER_SIZE - len(MAGIC) - 2) + header.encode('latin1') + b' ' * padding + b'\n'
+
+
+class TelemetryWriter:
+    """Streams per-step records into chunks of `chunk_size` rows appended to an .npy file.
+
+    Memory use is one chunk regardless of run length. An existing file is overwritten unless
+    the run continues it: with `append`, or with `rows` (keep its first `rows` records, e.g. the
+    rows a resumed checkpoint had seen). next_episode is the first episode id after those
+    already in the file, where the envs writing to it start numbering their episodes.
+    """
+
+    def __init__(self, path, chunk_size=4096, dtype=RECORD_DTYPE, rows=None, append=False):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.chunk = np.zeros(chunk_size, dtype=self.dtype)
+        self.pending = 0
+        self.next_episode = 0
+        if (append or rows is not None) and os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE:
+            existing = np.load(path, mmap_mode='r')
+            if existing.dtype != self.dtype:
+                raise ValueError(f"{path} holds records of a different layout")
+            self.rows = len(existing) if rows is None else min(rows, len(existing))
+            if self.rows and 'episode' in self.dtype.names:
+                self.next_episode = int(existing['episode'][:self.rows].max()) + 1
+            del existing
+            self.file = open(path, 'r+b')
+            self.file.seek(HEADER_SIZE + self.rows * self.dtype.itemsize)
+            self.file.truncate()
+            self.file.seek(0)
+            self.file.write(_header(self.dtype, self.rows))
+        else:
+            self.rows = 0
+            self.file = open(path, 'w+b')
+            self.file.write(_header(self.dtype, 0))
+
+    def record(self, *values):
+        """Append one record; values are the RECORD_DTYPE fields in order."""
+        self.chunk[self.pending] = values
+        self.pending += 1
+        if self.pending == len(self.chunk):
+            self.flush()
+
+    def flush(self):
+        if self.pending == 0:
+            return
+        self.file.seek(HEADER_SIZE + self.rows * self.dtype.itemsize)
+        self.file.write(self.chunk[:self.pending].tobytes())
+        self.rows += self.pending
+        self.pending = 0
+        # Data first, then the row count, so readers only ever see complete records
+        self.file.flush()
+        self.file.seek(0)
+        self.file.write(_header(self.dtype, self.rows))
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_telemetry(path):
+    """Memory-map a telemetry file; nothing is read until a column or slice is used."""
+    return np.load(path, mmap_mode='r')
+
+
+def episode_groups(records):
+    """(episode ids, row order, group starts) grouping records by episode.
+
+    Rows of one env are already in episode order; interleaved envs are sorted by a stable
+    argsort of the episode column only.
+    """
+    episodes = np.asarray(records['episode'])
+    order = np.arange(len(episodes)) if np.all(episodes[1:] >= episodes[:-1]) else \
+        np.argsort(episodes, kind='stable')
+    sorted_episodes = episodes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_episodes[1:] != sorted_episodes[:-1]]) if len(order) else \
+        np.zeros(0, dtype=int)
+    return sorted_episodes[starts], order, starts
+
+
+def stepped_episodes(records, order, starts):
+    """Mask of the episode groups holding at least one step. A vectorized env resets a vehicle as
+    its episode ends, so a log can end in episodes holding nothing but a reset marker."""
+    if not len(order):
+        return np.zeros(0, dtype=bool)
+    return np.logical_or.reduceat(np.asarray(records['action'])[order] >= 0, starts)
+
+
+def episode_returns(records):
+    """(episode ids, total reward of each episode), for episodes with at least one step."""
+    ids, order, starts = episode_groups(records)
+    if not len(order):
+        return ids, np.zeros(0, dtype=np.float64)
+    stepped = stepped_episodes(records, order, starts)
+    return ids[stepped], np.add.reduceat(np.asarray(records['reward'], dtype=np.float64)[order], starts)[stepped]
+
+
+def episode_trajectories(records, episodes=None):
+    """Yield (episode id, (steps, 3) positions) for each episode with at least one step, or only
+    those in `episodes`."""
+    ids, order, starts = episode_groups(records)
+    stops = np.r_[starts[1:], len(order)]
+    stepped = stepped_episodes(records, order, starts)
+    for episode, start, stop, has_steps in zip(ids, starts, stops, stepped):
+        if not has_steps or (episodes is not None and episode not in episodes):
+            continue
+        rows = records[order[start:stop]]
+        yield episode, np.column_stack([rows['x'], rows['y'], rows['z']])
@@ -0,0 +1,179 @@
+import numpy as np
+
+# Vectorized k-armed bandit testbed (Sutton & Barto, chapter 2).
+#
+# All runs and strategies of an experiment live in (runs, strategies, k) arrays and every
+# timestep is one batched update of all of them; random numbers are drawn in blocks of steps.
+# The runs share their bandit problems across strategies, and are processed in chunks that fit
+# `memory` bytes, so 10^5 runs take no more memory than a few thousand.
+#
+#   strategies = [epsilon_greedy(0.0), epsilon_greedy(0.01), epsilon_greedy(0.1)]
+#   rewards, optimal = run_testbed(strategies, runs=2000, steps=1000, seed=0)
+#   rewards[2, -1]   # average reward of epsilon = 0.1 at the last step
+#
+# drift > 0 makes the problems nonstationary: every step each true value takes a normal random
+# walk step of standard deviation `drift`.
+
+KINDS = ('epsilon_greedy', 'ucb', 'gradient')
+
+
+class Strategy:
+    """Action-selection and learning rule of one testbed curve.
+
+    epsilon_greedy: greedy in the estimates (first best arm on ties), random arm with
+        probability epsilon; estimates start at `initial` (optimistic when > 0).
+    ucb: the arm maximizing Q + c * sqrt(ln t / N), untried arms first.
+    gradient: softmax over preferences, updated by step_size * (reward - baseline); the baseline
+        is the average reward so far (0 without `baseline`).
+    Estimates are sample averages unless step_size is given (constant step size).
+    """
+
+    def __init__(self, kind='epsilon_greedy', epsilon=0.0, initial=0.0, step_size=None, c=2.0, baseline=True,
+                 name=None):
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {KINDS}, not {kind!r}")
+        if kind == 'gradient' and step_size is None:
+            raise ValueError("gradient bandits need a step_size")
+        self.kind = kind
+        self.epsilon = epsilon
+        self.initial = initial
+        self.step_size = step_size
+        self.c = c
+        self.baseline = baseline
+        self.name = name or self.default_name()
+
+    def default_name(self):
+        if self.kind == 'ucb':
+            return f"UCB c={self.c:g}"
+        if self.kind == 'gradient':
+            return f"gradient alpha={self.step_size:g}{'' if self.baseline else ' no baseline'}"
+        name = f"epsilon={self.epsilon:g}"
+        if self.initial:
+            name += f" Q1={self.initial:g}"
+        return name + ('' if self.step_size is None else f" alpha={self.step_size:g}")
+
+
+def epsilon_greedy(epsilon, initial=0.0, step_size=None):
+    return Strategy('epsilon_greedy', epsilon=epsilon, initial=initial, step_size=step_size)
+
+
+def ucb(c=2.0, step_size=None):
+    return Strategy('ucb', c=c, step_size=step_size)
+
+
+def gradient(step_size=0.1, baseline=True):
+    return Strategy('gradient', step_size=step_size, baseline=baseline)
+
+
+def run_testbed(strategies, runs=2000, steps=1000, k=10, mean=0.0, drift=0.0, seed=None, memory=256 * 2 ** 20,
+                block_steps=None):
+    """(average reward, fraction of optimal actions), each (strategies, steps), over `runs` problems.
+
+    True values start N(mean, 1) per arm (or all at `mean` when drift > 0, as in exercise 2.5) and
+    rewards are N(true value, 1). Runs go in chunks of at most `memory` bytes of working arrays,
+    each chunk with its own seed from `seed`; results depend on the seed and the chunk size only.
+    """
+    num_strategies = len(strategies)
+    block_steps = block_steps or min(steps, 100)
+    # Per run: Q, N and temporaries (runs, strategies, k), a block of float32 uniforms and noise,
+    # the drift block
+    bytes_per_run = 8 * (4 * num_strategies * k + block_steps * num_strategies + block_steps * k + 2 * k)
+    chunk_runs = max(1, min(runs, memory // bytes_per_run))
+    # Group the strategies by kind, so each kind is one contiguous slice of the strategy axis
+    order = sorted(range(num_strategies), key=lambda i: KINDS.index(strategies[i].kind))
+    grouped = [strategies[i] for i in order]
+    rewards = np.zeros((num_strategies, steps))
+    optimal = np.zeros((num_strategies, steps))
+    chunks = range(0, runs, chunk_runs)
+    for start, seed_sequence in zip(chunks, np.random.SeedSequence(seed).spawn(len(chunks))):
+        run_chunk(grouped, min(chunk_runs, runs - start), steps, k, mean, drift, np.random.default_rng(seed_sequence),
+                  block_steps, rewards, optimal)
+    inverse = np.argsort(order)
+    return rewards[inverse] / runs, optimal[inverse] / runs
+
+
+def first_argmax(values):
+    """Index of the first largest entry along the first (arm) axis of a contiguous array. Walking
+    the arms' contiguous rows is several times faster than argmax over a short last axis."""
+    best = values.max(axis=0)
+    ahead = np.ones(best.shape, dtype=bool)  # no largest entry seen yet
+    arms = np.zeros(best.shape, dtype=np.min_scalar_type(len(values)))
+    for arm in range(len(values) - 1):
+        ahead &= values[arm] != best
+        arms += ahead
+    return arms
+
+
+def run_chunk(strategies, runs, steps, k, mean, drift, rng, block_steps, rewards, optimal):
+    """Simulate `runs` problems for strategies grouped by kind, adding the per-step reward and optimal
+    action sums of each strategy to rewards and optimal (strategies, steps)."""
+    num_strategies = len(strategies)
+    kinds = [strategy.kind for strategy in strategies]
+    groups = [(kind, slice(kinds.index(kind), len(kinds) - kinds[::-1].index(kind))) for kind in KINDS if kind in kinds]
+    # Per kind, the (runs, strategies, k) arrays are stored arm-major, as (k, runs, strategies), so
+    # each arm's values are contiguous: estimates (or preferences) Q and counts N
+    Q, N = {}, {}
+    for kind, group in groups:
+        initial = [strategy.initial for strategy in strategies[group]]
+        Q[kind] = np.broadcast_to(np.array(initial), (k, runs, len(initial))).copy()
+        N[kind] = np.zeros((k, runs, len(initial)))
+    epsilons = np.array([strategy.epsilon for strategy in strategies])
+    cs = np.array([strategy.c for strategy in strategies])
+    step_sizes = np.array([strategy.step_size or 0.0 for strategy in strategies])
+    sample_average = np.array([strategy.step_size is None for strategy in strategies])
+    use_baseline = np.array([strategy.baseline for strategy in strategies], dtype=np.float64)
+    baselines = np.zeros((runs, num_strategies))
+
+    # True values as (k, runs)
+    true_values = np.full((k, runs), mean) if drift > 0 else rng.normal(mean, 1.0, (k, runs))
+    optimal_arms = first_argmax(true_values)[:, None]
+    run_index = np.arange(runs)[:, None]
+    arms = np.arange(k)[:, None, None]
+    ones = np.ones(runs)
+    actions = np.empty((runs, num_strategies), dtype=np.int64)
+    for t in range(steps):
+        if t % block_steps == 0:
+            block = min(block_steps, steps - t)
+            uniforms = rng.random((block, runs, num_strategies), dtype=np.float32)
+            noise = rng.standard_normal((block, runs, num_strategies), dtype=np.float32)
+            walks = rng.normal(0.0, drift, (block, k, runs)) if drift > 0 else None
+        u = uniforms[t % block_steps]
+
+        for kind, group in groups:
+            if kind == 'epsilon_greedy':
+                epsilon = epsilons[group]
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    # One uniform decides to explore and, scaled, which arm
+                    random = np.minimum((u[:, group] * (k / epsilon)).astype(np.int64), k - 1)
+                actions[:, group] = np.where(u[:, group] < epsilon, random, first_argmax(Q[kind]))
+            elif kind == 'ucb':
+                counts = N[kind]
+                bonus = np.where(counts > 0, cs[group] * np.sqrt(np.log(t + 1) / np.maximum(counts, 1)), np.inf)
+                actions[:, group] = first_argmax(Q[kind] + bonus)
+            else:
+                preferences = Q[kind]
+                policy = np.exp(preferences - preferences.max(axis=0))
+                policy /= policy.sum(axis=0)
+                # Inverse-CDF draw from the softmax
+                actions[:, group] = np.minimum((u[:, group] > policy.cumsum(axis=0)).sum(axis=0), k - 1)
+
+        step_rewards = true_values.reshape(-1).take(actions * runs + run_index) + noise[t % block_steps]
+        rewards[:, t] += ones @ step_rewards
+        optimal[:, t] += ones @ (actions == optimal_arms)
+
+        for kind, group in groups:
+            size = group.stop - group.start
+            # Flat index of arm a, run r, strategy s of the group is (a * runs + r) * size + s
+            cells = (actions[:, group] * runs + run_index) * size + np.arange(size)
+            counts, estimates, group_rewards = N[kind].reshape(-1), Q[kind].reshape(-1), step_rewards[:, group]
+            counts[cells] += 1
+            if kind != 'gradient':
+                step = np.where(sample_average[group], 1.0 / counts[cells], step_sizes[group])
+                estimates[cells] += step * (group_rewards - estimates[cells])
+            else:
+                advantage = step_sizes[group] * (group_rewards - baselines[:, group])
+                Q[kind] += advantage * ((arms == actions[:, group]) - policy)
+                baselines[:, group] += use_baseline[group] * (group_rewards - baselines[:, group]) / (t + 1)
+        if drift > 0:
+            true_values += walks[t % block_steps]
+            optimal_arms = first_argmax(true_values)[:, None]
@@ -0,0 +1,89 @@
+import argparse
+import json
+import os
+import time
+import tracemalloc
+
+import numpy as np
+
+import bandit
+
+# bandit.run_testbed() against the exercise notebook's loop, run from the notebook's own code
+# (plotting stripped) on --loop-runs runs and extrapolated to --runs. Also prints the final
+# performance of every strategy kind, a nonstationary run, and a large run in memory-bounded chunks.
+
+NOTEBOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'GM_RL_HW1.ipynb')
+
+
+def notebook_loop(runs, seed):
+    """(average rewards, optimal action fractions, seconds) of the notebook's epsilon = 0, 0.01, 0.1 loop."""
+    with open(NOTEBOOK) as f:
+        cell = next(cell for cell in json.load(f)['cells'] if cell['cell_type'] == 'code')
+    source = ''.join(cell['source'])
+    source = source[:source.index('plt.figure')].replace('runs = 2000', f'runs = {runs}')
+    namespace = {'__name__': 'notebook'}
+    np.random.seed(seed)
+    start = time.perf_counter()
+    exec('\n'.join(line for line in source.splitlines() if 'matplotlib' not in line), namespace)
+    seconds = time.perf_counter() - start
+    return namespace['average_rewards'] / runs, namespace['optimal_action_counts'] / runs, seconds
+
+
+def timed_testbed(strategies, **kwargs):
+    start = time.perf_counter()
+    rewards, optimal = bandit.run_testbed(strategies, **kwargs)
+    return rewards, optimal, time.perf_counter() - start
+
+
+def print_final(strategies, rewards, optimal, last):
+    for strategy, reward, fraction in zip(strategies, rewards[:, -last:].mean(axis=1), optimal[:, -last:].mean(axis=1)):
+        print(f"  {strategy.name:<32}{reward:>8.3f}{fraction:>10.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized bandit testbed against the notebook loop.")
+    parser.add_argument('--runs', type=int, default=2000)
+    parser.add_argument('--steps', type=int, default=1000)
+    parser.add_argument('--loop-runs', type=int, default=20, help="runs of the notebook loop, extrapolated to --runs")
+    parser.add_argument('--big-runs', type=int, default=10 ** 5, help="runs of the chunked run (0 to skip)")
+    parser.add_argument('--memory', type=int, default=64, help="working memory of the chunked run, in MB")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    last = max(1, args.steps // 10)
+    epsilons = [bandit.epsilon_greedy(epsilon) for epsilon in (0.0, 0.01, 0.1)]
+
+    loop_rewards, loop_optimal, loop_seconds = notebook_loop(args.loop_runs, args.seed)
+    rewards, optimal, seconds = timed_testbed(epsilons, runs=args.runs, steps=args.steps, seed=args.seed)
+    loop_seconds *= args.runs / args.loop_runs
+    print(f"notebook experiment, {args.runs} runs x {args.steps} steps x 3 epsilons")
+    print(f"  loop {loop_seconds:.1f} s (from {args.loop_runs} runs), run_testbed {seconds:.3f} s, "
+          f"speedup {loop_seconds / seconds:.0f}x")
+    print(f"  last {last} steps: average reward / optimal action, loop ({args.loop_runs} runs) vs run_testbed")
+    for i, strategy in enumerate(epsilons):
+        print(f"  {strategy.name:<16}{loop_rewards[i, -last:].mean():>8.3f} /{loop_optimal[i, -last:].mean():>6.1%}"
+              f"   {rewards[i, -last:].mean():>8.3f} /{optimal[i, -last:].mean():>6.1%}")
+
+    strategies = [bandit.epsilon_greedy(0.1), bandit.epsilon_greedy(0.0, initial=5.0, step_size=0.1), bandit.ucb(2.0),
+                  bandit.gradient(0.1), bandit.gradient(0.1, baseline=False)]
+    rewards, optimal, seconds = timed_testbed(strategies, runs=args.runs, steps=args.steps, mean=4.0, seed=args.seed)
+    print(f"\nall kinds, true values N(4, 1), {seconds:.2f} s; last {last} steps' average reward, optimal action")
+    print_final(strategies, rewards, optimal, last)
+
+    strategies = [bandit.epsilon_greedy(0.1), bandit.epsilon_greedy(0.1, step_size=0.1)]
+    rewards, optimal, seconds = timed_testbed(strategies, runs=args.runs, steps=10 * args.steps, drift=0.01,
+                                              seed=args.seed)
+    print(f"\nnonstationary (drift 0.01), {10 * args.steps} steps, {seconds:.2f} s")
+    print_final(strategies, rewards, optimal, 10 * last)
+
+    if args.big_runs:
+        tracemalloc.start()
+        rewards, optimal, seconds = timed_testbed(epsilons, runs=args.big_runs, steps=args.steps,
+                                                  memory=args.memory * 2 ** 20, seed=args.seed)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"\n{args.big_runs} runs in {args.memory} MB chunks, {seconds:.1f} s, peak allocated {peak / 2 ** 20:.0f} MB")
+        print_final(epsilons, rewards, optimal, last)
+
+
+if __name__ == "__main__":
+    main()
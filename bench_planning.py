@@ -0,0 +1,144 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+import tabular
+from planning import DynaPlanner, IndexedModel, PrioritizedSweeping, dyna_agent
+
+# planning.py's planners against the Dyna-Q exercise's dict-based loop, on the exercise's maze and
+# on larger mazes from tabular.maze_walls().
+#
+# throughput: planning backups per second with every (state, action) of the maze in the model.
+#   The exercise's planning() rebuilds list(Model.keys()) for every backup, so its rate falls
+#   as the model grows with the maze; the planners' cost per backup does not depend on it.
+# learning: steps per episode with uniform Dyna-Q and prioritized sweeping, averaged over seeds.
+
+NOTEBOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Model-based RL Programming',
+                        'Model_based_RL_Programming_Exercise.ipynb')
+EXERCISE_MAZE = (6, 9, (3, 0), (5, 8), [(4, 2), (3, 2), (2, 2), (1, 5), (5, 7), (4, 7), (3, 7)])
+
+
+def notebook_namespace():
+    """Globals of the notebook's code cell up to its training loop, without matplotlib."""
+    with open(NOTEBOOK) as f:
+        cell = next(cell for cell in json.load(f)['cells'] if cell['cell_type'] == 'code')
+    source = ''.join(cell['source'])
+    source = source[:source.index('# Simulation parameters')]
+    namespace = {'__name__': 'notebook'}
+    exec('\n'.join(line for line in source.splitlines() if 'matplotlib' not in line), namespace)
+    return namespace
+
+
+def mazes(sizes, seed):
+    """(name, height, width, start, goal, walls) of the exercise maze and a generated maze per size."""
+    yield ('exercise',) + EXERCISE_MAZE
+    for size in sizes:
+        walls, start, goal = tabular.maze_walls(size, size, seed=seed)
+        yield (f"{size}x{size}", size, size, start, goal, walls)
+
+
+def filled_models(env, width):
+    """The exercise's Model dict and an IndexedModel, both holding every (state, action) of env's open
+    cells, as after a long exploration."""
+    Model, model = {}, IndexedModel(env.num_states, env.num_actions)
+    open_cells = np.flatnonzero((env.next_states[:, :, 0] != np.arange(env.num_states)[:, None]).any(axis=1))
+    for state in open_cells.tolist():
+        for action, name in enumerate(env.action_names):
+            next_state, reward = int(env.next_states[state, action, 0]), float(env.rewards[state, action, 0])
+            Model[(divmod(state, width), name)] = (divmod(next_state, width), reward)
+            model.add(state, action, next_state, reward)
+    return Model, model
+
+
+def rate(plan, planning_steps, seconds):
+    """Backups per second of repeated plan(planning_steps) calls over about `seconds` (or until one makes none)."""
+    made, started = 0, time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        updates = plan(planning_steps)
+        made += updates
+        if not updates:
+            break
+    return made / (time.perf_counter() - started)
+
+
+def throughput(env, width, goal, planning_steps, seconds, batches, seed):
+    """Backups per second of the exercise's planning() and of each planner on fully filled models.
+
+    Prioritized sweeping starts from Q = 0 with the pairs into the goal queued, and is timed while
+    it sweeps their reward back through the maze.
+    """
+    Model, model = filled_models(env, width)
+    namespace = notebook_namespace()
+    namespace['random'].seed(seed)
+    Q = {}
+    rates = [rate(lambda steps: namespace['planning'](Q, Model, steps, alpha=0.1, gamma=0.95) or steps,
+                  planning_steps, seconds)]
+    for batch in batches:
+        rates.append(rate(DynaPlanner(model, np.zeros((env.num_states, env.num_actions)), batch=batch,
+                                      seed=seed).plan, planning_steps, seconds))
+    for batch in batches:
+        planner = PrioritizedSweeping(model, np.zeros((env.num_states, env.num_actions)), batch=batch)
+        planner.push(model.predecessors_of([env.state_index(goal)]))
+        rates.append(rate(planner.plan, planning_steps, seconds))
+    return len(model), rates
+
+
+def learning(env, kind, planning_steps, episodes, seeds, alpha):
+    lengths, updates = [], 0
+    for seed in range(seeds):
+        Q = np.zeros((env.num_states, env.num_actions))
+        model = IndexedModel(env.num_states, env.num_actions)
+        planner = DynaPlanner(model, Q, alpha=alpha, seed=seed) if kind == 'uniform' else \
+            PrioritizedSweeping(model, Q, alpha=alpha)
+        episode_lengths, made = dyna_agent(env, planner, episodes, planning_steps, seed=seed)
+        lengths.append(episode_lengths)
+        updates += made
+    return np.mean(lengths, axis=0), updates / seeds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the prioritized-sweeping and Dyna-Q planners.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[15, 63, 255],
+                        help="side lengths of the generated mazes")
+    parser.add_argument('--planning-steps', type=int, default=50)
+    parser.add_argument('--seconds', type=float, default=1.0, help="time per throughput measurement")
+    parser.add_argument('--learn-max-cells', type=int, default=300,
+                        help="largest maze (in cells) of the learning comparison")
+    parser.add_argument('--episodes', type=int, default=30)
+    parser.add_argument('--seeds', type=int, default=5)
+    parser.add_argument('--alpha', type=float, nargs='+', default=[0.1, 0.5])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    n = args.planning_steps
+    batches = (1, n)
+
+    print(f"planning backups per second with every pair in the model, n = {n}")
+    print(f"{'maze':<10}{'pairs':>9}{'exercise':>12}" + ''.join(f"{f'uniform {batch}':>14}" for batch in batches)
+          + ''.join(f"{f'prioritized {batch}':>16}" for batch in batches))
+    for name, height, width, start, goal, walls in mazes(args.sizes, args.seed):
+        env = tabular.dyna_maze(height, width, start, goal, walls)
+        pairs, rates = throughput(env, width, goal, n, args.seconds, batches, args.seed)
+        print(f"{name:<10}{pairs:>9}{rates[0]:>12,.0f}" + ''.join(f"{r:>14,.0f}" for r in rates[1:3])
+              + ''.join(f"{r:>16,.0f}" for r in rates[3:]))
+
+    print(f"\nsteps per episode, mean of {args.seeds} seeds: first episode / episodes 2-10 / 11-{args.episodes} "
+          f"(planning backups per seed)")
+    for name, height, width, start, goal, walls in mazes(args.sizes, args.seed):
+        if height * width > args.learn_max_cells:
+            continue
+        env = tabular.dyna_maze(height, width, start, goal, walls)
+        for alpha in args.alpha:
+            for planning_steps in (5, n):
+                row = f"{name:<10}alpha {alpha:<5g}n {planning_steps:<4}"
+                for kind in ('uniform', 'prioritized'):
+                    lengths, updates = learning(env, kind, planning_steps, args.episodes, args.seeds, alpha)
+                    row += f"  {kind} {lengths[0]:.0f} / {lengths[1:10].mean():.1f} / {lengths[10:].mean():.1f} " \
+                           f"({updates:,.0f})"
+                print(row)
+
+
+if __name__ == "__main__":
+    main()
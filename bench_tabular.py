@@ -0,0 +1,145 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+import tabular
+
+# tabular.py's batched learners against the exercise notebooks' dict-based loops, run from the
+# notebooks' own code (plotting stripped). Throughput is in run-episodes per second: a loop
+# learns one seed at a time, the batched learners --runs seeds at once. The learning results
+# (final returns, Q values, episode lengths) are printed side by side as a check that both
+# learn the same thing.
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+TD_NOTEBOOK = os.path.join(ROOT, 'temporal difference (TD) programming exercise', 'TD_HW4.ipynb')
+MC_NOTEBOOK = os.path.join(ROOT, 'monte-carlo programming exercise', 'Monte_Carlo_assignment.ipynb')
+DYNA_NOTEBOOK = os.path.join(ROOT, 'Model-based RL Programming', 'Model_based_RL_Programming_Exercise.ipynb')
+
+
+def notebook_namespace(path, stop):
+    """Globals defined by the notebook's first code cell up to the line starting with `stop`, without matplotlib."""
+    with open(path) as f:
+        cell = next(cell for cell in json.load(f)['cells'] if cell['cell_type'] == 'code')
+    source = ''.join(cell['source'])
+    source = source[:source.index('\n' + stop)]
+    source = '\n'.join(line for line in source.splitlines() if 'matplotlib' not in line)
+    namespace = {'__name__': 'notebook'}
+    exec(source, namespace)
+    return namespace
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def td(runs, episodes, loop_runs, seed):
+    rows = []
+    for algorithm in ('sarsa', 'q_learning'):
+        loop_returns, loop_seconds = [], 0.0
+        for run in range(loop_runs):
+            namespace = notebook_namespace(TD_NOTEBOOK, 'rewards_sarsa_prints')
+            namespace['num_episodes'] = episodes
+            np.random.seed(seed + run)
+            Q = namespace['Q_sarsa' if algorithm == 'sarsa' else 'Q_ql']
+            returns, seconds = timed(namespace['train'], Q, algorithm)
+            loop_returns.append(returns)
+            loop_seconds += seconds
+        (returns, _), seconds = timed(tabular.td_control, tabular.cliff_walking(), algorithm, runs, episodes,
+                                      alpha=0.5, gamma=1.0, epsilon=0.1, seed=seed)
+        last = max(1, episodes // 5)
+        rows.append((algorithm, loop_runs * episodes / loop_seconds, runs * episodes / seconds,
+                     f"last {last} episodes' return {np.mean(loop_returns, axis=0)[-last:].mean():.1f} vs "
+                     f"{returns[:, -last:].mean():.1f}"))
+    return rows
+
+
+def mc(runs, episodes, loop_runs, seed):
+    loop_q, loop_seconds = [], 0.0
+    for run in range(loop_runs):
+        namespace = notebook_namespace(MC_NOTEBOOK, '# Run multiple episodes')
+        namespace['random'].seed(seed + run)
+
+        def learn():
+            for _ in range(episodes):
+                episode = namespace['generate_episode'](3, namespace['policy'])
+                namespace['update_policy'](episode, namespace['policy'], namespace['Q'], namespace['returns'])
+
+        _, seconds = timed(learn)
+        loop_q.append([namespace['Q'][3][action] for action in (-1, 1)])
+        loop_seconds += seconds
+    (Q, _), seconds = timed(tabular.mc_control, tabular.cleaning_robot(), runs, episodes, epsilon=0.1, gamma=1.0,
+                            seed=seed)
+    loop_q, q = np.mean(loop_q, axis=0), Q[:, 3].mean(axis=0)
+    return [('monte carlo', loop_runs * episodes / loop_seconds, runs * episodes / seconds,
+             f"Q(3, -1), Q(3, +1) {loop_q[0]:.2f}, {loop_q[1]:.2f} vs {q[0]:.2f}, {q[1]:.2f}")]
+
+
+def dyna(runs, episodes, loop_runs, seed, planning_steps):
+    rows = []
+    for n in planning_steps:
+        loop_lengths, loop_seconds = [], 0.0
+        for run in range(loop_runs):
+            namespace = notebook_namespace(DYNA_NOTEBOOK, '# Simulation parameters')
+            np.random.seed(seed + run)
+            namespace['random'].seed(seed + run)
+            env, Q, Model = namespace['env'], namespace['Q'], namespace['Model']
+            select, update, planning = (namespace['epsilon_greedy_action_selection'], namespace['q_learning_update'],
+                                        namespace['planning'])
+
+            def learn():
+                # The notebook's training loop for one value of n
+                lengths = []
+                for episode in range(episodes):
+                    state = env.reset()
+                    steps = 0
+                    while True:
+                        action = select(state, Q, epsilon=0.1)
+                        next_state, reward, done = env.step(action)
+                        update(state, action, reward, next_state, Q, alpha=0.1, gamma=0.95)
+                        Model[(state, action)] = (next_state, reward)
+                        planning(Q, Model, n, alpha=0.1, gamma=0.95)
+                        state = next_state
+                        steps += 1
+                        if done:
+                            break
+                    lengths.append(steps)
+                return lengths
+
+            lengths, seconds = timed(learn)
+            loop_lengths.append(lengths)
+            loop_seconds += seconds
+        (lengths, _), seconds = timed(tabular.dyna_q, tabular.dyna_maze(), runs, episodes, n, alpha=0.1, gamma=0.95,
+                                      epsilon=0.1, seed=seed)
+        rows.append((f"dyna-q n={n}", loop_runs * episodes / loop_seconds, runs * episodes / seconds,
+                     f"steps in episodes 2-{episodes} {np.mean(loop_lengths, axis=0)[1:].mean():.1f} vs "
+                     f"{lengths[:, 1:].mean():.1f}"))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the batched tabular learners against the notebook loops.")
+    parser.add_argument('--runs', type=int, default=1000, help="seeds learned at once by the batched learners")
+    parser.add_argument('--loop-runs', type=int, default=5, help="seeds learned by the notebook loops")
+    parser.add_argument('--td-episodes', type=int, default=500)
+    parser.add_argument('--mc-episodes', type=int, default=10000)
+    parser.add_argument('--dyna-episodes', type=int, default=50)
+    parser.add_argument('--planning-steps', type=int, nargs='+', default=[0, 5, 50])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rows = td(args.runs, args.td_episodes, args.loop_runs, args.seed)
+    rows += mc(args.runs, args.mc_episodes, args.loop_runs, args.seed)
+    rows += dyna(args.runs, args.dyna_episodes, args.loop_runs, args.seed, args.planning_steps)
+    print(f"{args.runs} batched runs, {args.loop_runs} loop runs; run-episodes per second")
+    print(f"{'learner':<14}{'loop':>11}{'batched':>12}{'speedup':>9}  loop vs batched")
+    for name, loop_rate, rate, check in rows:
+        print(f"{name:<14}{loop_rate:>11,.0f}{rate:>12,.0f}{rate / loop_rate:>9.0f}  {check}")
+
+
+if __name__ == "__main__":
+    main()
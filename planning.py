@@ -0,0 +1,239 @@
+import heapq
+
+import numpy as np
+
+from tabular import row_max
+
+# Model-based planning for tabular Q-learning agents (the Dyna-Q exercise and larger mazes).
+#
+# IndexedModel keeps the learned deterministic model as arrays over (state, action) pairs,
+# pair = state * A + action, with a list of the observed pairs for O(1) uniform sampling and a
+# predecessor index (the observed pairs leading into each state). Two planners update a
+# (S, A) Q array from it:
+#
+#   DynaPlanner          Dyna-Q: updates on pairs drawn uniformly from the model
+#   PrioritizedSweeping  updates the pair with the largest pending change first and queues the
+#                        predecessors of every state whose values it changes
+#
+#   model = IndexedModel(env.num_states, env.num_actions)
+#   planner = PrioritizedSweeping(model, Q, threshold=1e-4)
+#   lengths, updates = dyna_agent(env, planner, episodes=50, planning_steps=5)
+#
+# Both planners take `batch` pairs per update: batch=1 is the textbook sequential algorithm,
+# larger batches back up many pairs in one vectorized update.
+
+
+class IndexedModel:
+    """Learned deterministic model: the latest (next state, reward) of every observed pair, the
+    observed pairs in order seen, and the predecessor index."""
+
+    def __init__(self, num_states, num_actions, predecessor_width=8):
+        self.num_actions = num_actions
+        self.next_states = np.full(num_states * num_actions, -1, dtype=np.int64)
+        self.rewards = np.zeros(num_states * num_actions)
+        self.pairs = np.empty(num_states * num_actions, dtype=np.int64)
+        self.count = 0
+        # Row s: the observed pairs whose next state is s, padded with -1; widened when a row fills
+        self.predecessors = np.full((num_states, predecessor_width), -1, dtype=np.int64)
+        self.predecessor_counts = np.zeros(num_states, dtype=np.int64)
+
+    def __len__(self):
+        return self.count
+
+    def add(self, state, action, next_state, reward):
+        """Record a real transition; returns its pair."""
+        pair = state * self.num_actions + action
+        previous = self.next_states[pair]
+        if previous < 0:
+            self.pairs[self.count] = pair
+            self.count += 1
+        if previous != next_state:
+            if previous >= 0:
+                self._unlink(pair, previous)
+            self._link(pair, next_state)
+            self.next_states[pair] = next_state
+        self.rewards[pair] = reward
+        return pair
+
+    def _link(self, pair, state):
+        count = self.predecessor_counts[state]
+        if count == self.predecessors.shape[1]:
+            self.predecessors = np.pad(self.predecessors, ((0, 0), (0, count)), constant_values=-1)
+        self.predecessors[state, count] = pair
+        self.predecessor_counts[state] += 1
+
+    def _unlink(self, pair, state):
+        row, last = self.predecessors[state], self.predecessor_counts[state] - 1
+        row[np.flatnonzero(row == pair)[0]] = row[last]
+        row[last] = -1
+        self.predecessor_counts[state] = last
+
+    def sample(self, rng, size):
+        """`size` observed pairs drawn uniformly (with replacement)."""
+        return self.pairs[rng.integers(0, self.count, size)]
+
+    def predecessors_of(self, states):
+        """Observed pairs leading into any of `states`."""
+        rows = self.predecessors[states]
+        return rows[rows >= 0]
+
+
+def td_errors(Q, model, pairs, gamma):
+    """Q-learning TD errors of `pairs` under the model: r + gamma * max_a Q(s', a) - Q(s, a)."""
+    targets = model.rewards[pairs] + gamma * row_max(Q[model.next_states[pairs]])
+    return targets - Q.reshape(-1)[pairs]
+
+
+def backup(Q, model, pairs, alpha, gamma):
+    """Q-learning updates of `pairs` from the model, all computed from the current Q. A pair listed
+    twice is updated once."""
+    Q.reshape(-1)[pairs] += alpha * td_errors(Q, model, pairs, gamma)
+
+
+def pair_td_error(Q, model, pair, gamma):
+    """td_errors() of one pair in scalar arithmetic, several times faster than on a one-element array."""
+    flat, num_actions = Q.reshape(-1), model.num_actions
+    next_state = int(model.next_states[pair])
+    best = max(flat[next_state * num_actions:(next_state + 1) * num_actions].tolist())
+    return model.rewards[pair] + gamma * best - flat[pair]
+
+
+def backup_pair(Q, model, pair, alpha, gamma):
+    """backup() of one pair."""
+    Q.reshape(-1)[pair] += alpha * pair_td_error(Q, model, pair, gamma)
+
+
+class DynaPlanner:
+    """Dyna-Q planning: backups of pairs drawn uniformly from the model, `batch` at a time."""
+
+    def __init__(self, model, Q, alpha=0.1, gamma=0.95, batch=1, seed=None):
+        self.model = model
+        self.Q = Q
+        self.alpha = alpha
+        self.gamma = gamma
+        self.batch = batch
+        self.rng = np.random.default_rng(seed)
+
+    def learn(self, pair):
+        """Direct Q-learning update from a real transition (already in the model)."""
+        backup_pair(self.Q, self.model, pair, self.alpha, self.gamma)
+
+    def plan(self, steps):
+        """`steps` planning backups; returns the number made."""
+        # The model does not change while planning, so all the pairs can be drawn up front
+        pairs = self.model.sample(self.rng, steps)
+        if self.batch == 1:
+            for pair in pairs.tolist():
+                backup_pair(self.Q, self.model, pair, self.alpha, self.gamma)
+        else:
+            for start in range(0, steps, self.batch):
+                backup(self.Q, self.model, pairs[start:start + self.batch], self.alpha, self.gamma)
+        return steps
+
+
+class PrioritizedSweeping:
+    """Prioritized sweeping (Sutton & Barto, section 8.4).
+
+    Pairs wait in a max-priority queue keyed by the size of their pending update |TD error|;
+    only pairs above `threshold` are queued, and a pair is queued at most once, with its highest
+    priority (superseded heap entries are skipped when popped). Each planning round pops the
+    `batch` highest pairs, backs them up together and re-queues them and the predecessors of
+    their states. Real transitions are only queued (learn()), so with no planning steps nothing
+    is learned.
+    """
+
+    def __init__(self, model, Q, alpha=0.1, gamma=0.95, threshold=1e-4, batch=1):
+        self.model = model
+        self.Q = Q
+        self.alpha = alpha
+        self.gamma = gamma
+        self.threshold = threshold
+        self.batch = batch
+        self.queue = []  # heap of (-priority, pair)
+        self.priorities = np.zeros(Q.size)  # queued priority of each pair, 0 when it is not queued
+
+    def __len__(self):
+        return int(np.count_nonzero(self.priorities))
+
+    def push(self, pairs):
+        """Queue `pairs` by their current |TD error|, if above the threshold."""
+        priorities = np.abs(td_errors(self.Q, self.model, pairs, self.gamma))
+        queue = priorities > np.maximum(self.priorities[pairs], self.threshold)
+        for pair, priority in zip(pairs[queue].tolist(), priorities[queue].tolist()):
+            # A pair listed twice is queued with its (equal) priority once
+            if priority > self.priorities[pair]:
+                self.priorities[pair] = priority
+                heapq.heappush(self.queue, (-priority, pair))
+
+    def push_pairs(self, pairs):
+        """push() for a short list of pairs, one at a time."""
+        for pair in pairs:
+            priority = abs(pair_td_error(self.Q, self.model, pair, self.gamma))
+            if priority > self.threshold and priority > self.priorities[pair]:
+                self.priorities[pair] = priority
+                heapq.heappush(self.queue, (-priority, pair))
+
+    def learn(self, pair):
+        """Queue a real transition (already in the model); its backup happens while planning."""
+        self.push_pairs([pair])
+
+    def pop(self, size):
+        """Up to `size` of the highest-priority pairs, removed from the queue."""
+        pairs = []
+        while self.queue and len(pairs) < size:
+            priority, pair = heapq.heappop(self.queue)
+            if -priority == self.priorities[pair]:
+                self.priorities[pair] = 0.0
+                pairs.append(pair)
+        return np.array(pairs, dtype=np.int64)
+
+    def plan(self, steps):
+        """Up to `steps` backups, fewer if the queue runs dry; returns the number made."""
+        made = 0
+        while made < steps:
+            pairs = self.pop(min(self.batch, steps - made))
+            if not len(pairs):
+                break
+            made += len(pairs)
+            # With alpha < 1 the backed-up pairs keep part of their error, so they compete again
+            # with the predecessors of their states
+            if len(pairs) == 1:
+                pair = int(pairs[0])
+                backup_pair(self.Q, self.model, pair, self.alpha, self.gamma)
+                state = pair // self.model.num_actions
+                self.push_pairs([pair] + self.model.predecessors[state, :self.model.predecessor_counts[state]].tolist())
+            else:
+                backup(self.Q, self.model, pairs, self.alpha, self.gamma)
+                self.push(np.concatenate([pairs, self.model.predecessors_of(np.unique(pairs // self.model.num_actions))]))
+        return made
+
+
+def dyna_agent(env, planner, episodes, planning_steps, epsilon=0.1, seed=None, max_steps=10 ** 7):
+    """One epsilon-greedy agent (random greedy ties, as in the exercise) learning on a tabular.TabularEnv
+    with `planning_steps` planner backups after every real step.
+
+    The planner's Q and model are updated in place. Returns (steps per episode, planning backups made).
+    """
+    rng = np.random.default_rng(seed)
+    Q, model = planner.Q, planner.model
+    lengths, updates = [], 0
+    state, steps = env.start_state, 0
+    for _ in range(max_steps):
+        values = Q[state]
+        if rng.random() < epsilon:
+            action = int(rng.integers(env.num_actions))
+        else:
+            best = np.flatnonzero(values == values.max())
+            action = int(best[rng.integers(len(best))])
+        next_state, reward, done = env.step(np.array([state]), np.array([action]), rng.random(1))
+        next_state, reward = int(next_state[0]), float(reward[0])
+        planner.learn(model.add(state, action, next_state, reward))
+        updates += planner.plan(planning_steps)
+        steps += 1
+        state = next_state
+        if done[0]:
+            lengths.append(steps)
+            if len(lengths) == episodes:
+                break
+            state, steps = env.start_state, 0
+    return lengths, updates
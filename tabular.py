@@ -0,0 +1,393 @@
+import numpy as np
+
+# Array-backed tabular RL shared by the TD, Monte Carlo and Dyna-Q exercises.
+#
+# Environments are compiled to integer arrays (TabularEnv) and Q tables are contiguous
+# (runs, states, actions) arrays, so many independent seeds learn at once: every learner below
+# advances all of its runs by one step per NumPy update, and each run keeps its own Q table and
+# episode counter.
+#
+#   env = cliff_walking()
+#   returns, Q = td_control(env, 'q_learning', runs=1000, episodes=500, alpha=0.5, gamma=1.0)
+#   returns.mean(axis=0)   # learning curve averaged over 1000 seeds
+#
+# Runs drop out of the batch as they finish, so a slow seed does not keep the others working.
+# States and actions are indices; the notebooks' names are kept in env.action_names and
+# env.state_index().
+
+
+class TabularEnv:
+    """Finite MDP as arrays over states 0..S-1 and actions 0..A-1.
+
+    Each (state, action) has K outcomes: next_states[s, a, k] with probabilities[s, a, k],
+    rewards[s, a, k] and dones[s, a, k] (the episode ends on that transition). With K = 1 the
+    environment is deterministic and step() ignores its uniforms. `shape` maps state indices
+    back to grid cells (row-major) where there is a grid.
+    """
+
+    def __init__(self, next_states, rewards, dones, start_state, probabilities=None, action_names=None,
+                 shape=None):
+        self.next_states = np.asarray(next_states, dtype=np.int64)
+        if self.next_states.ndim == 2:
+            self.next_states = self.next_states[..., None]
+        outcomes = self.next_states.shape
+        self.rewards = np.array(np.broadcast_to(np.reshape(rewards, outcomes), outcomes), dtype=np.float64)
+        self.dones = np.array(np.broadcast_to(np.reshape(dones, outcomes), outcomes), dtype=bool)
+        self.probabilities = np.ones(outcomes) if probabilities is None else np.array(probabilities, dtype=np.float64)
+        self.cumulative = np.cumsum(self.probabilities, axis=2)
+        self.start_state = start_state
+        self.action_names = action_names
+        self.shape = shape
+
+    @property
+    def num_states(self):
+        return self.next_states.shape[0]
+
+    @property
+    def num_actions(self):
+        return self.next_states.shape[1]
+
+    def state_index(self, cell):
+        """Index of a (row, column) grid cell."""
+        return cell[0] * self.shape[1] + cell[1]
+
+    def step(self, states, actions, uniforms=None):
+        """(next states, rewards, dones) of a batch of transitions; `uniforms` in [0, 1) pick the outcomes."""
+        outcomes = self.next_states.shape[2]
+        # Flat gathers: far cheaper than indexing the (S, A, K) arrays with three index arrays
+        flat = states * self.num_actions + actions
+        if outcomes > 1:
+            cumulative = self.cumulative.reshape(-1, outcomes).take(flat, axis=0)
+            flat = flat * outcomes
+            for k in range(outcomes - 1):
+                flat += uniforms >= cumulative[:, k]
+        return (self.next_states.reshape(-1).take(flat), self.rewards.reshape(-1).take(flat),
+                self.dones.reshape(-1).take(flat))
+
+
+def grid_moves(height, width, moves, blocked=()):
+    """Next cell index (cells, moves) of every cell and move on a grid; moves off the grid or into
+    `blocked` cells leave the agent where it is."""
+    rows, columns = np.divmod(np.arange(height * width), width)
+    obstacle = np.zeros(height * width, dtype=bool)
+    obstacle[[row * width + column for row, column in blocked]] = True
+    next_cells = np.empty((height * width, len(moves)), dtype=np.int64)
+    for a, (dy, dx) in enumerate(moves):
+        next_rows, next_columns = rows + dy, columns + dx
+        inside = (next_rows >= 0) & (next_rows < height) & (next_columns >= 0) & (next_columns < width)
+        target = np.where(inside, next_rows * width + next_columns, 0)
+        next_cells[:, a] = np.where(inside & ~obstacle[target], target, np.arange(height * width))
+    return next_cells
+
+
+def cliff_walking(width=12, height=4, start=(3, 0), goal=(3, 11)):
+    """The TD exercise's cliff: -1 per step, -100 and back to the start for stepping into the cliff."""
+    action_names = ['up', 'right', 'down', 'left']
+    moves = [(-1, 0), (0, 1), (1, 0), (0, -1)]
+    # Moves off the grid are clipped, which leaves the agent in place
+    next_states = grid_moves(height, width, moves)
+    start_state, goal_state = start[0] * width + start[1], goal[0] * width + goal[1]
+    cliff = np.zeros(height * width, dtype=bool)
+    cliff[[start[0] * width + column for column in range(start[1] + 1, goal[1])]] = True
+    rewards = np.where(cliff[next_states], -100.0, -1.0)
+    dones = next_states == goal_state
+    next_states = np.where(cliff[next_states], start_state, next_states)
+    return TabularEnv(next_states, rewards, dones, start_state, action_names=action_names, shape=(height, width))
+
+
+def cleaning_robot(move_probability=0.8, stay_probability=0.15, back_probability=0.05):
+    """The Monte Carlo exercise's corridor of states 0-5, terminal at both ends: 5 for reaching state 5
+    from 4, 1 for reaching state 0 from 1. Actions move left (-1) or right (+1), succeeding with
+    move_probability and otherwise staying or going the other way."""
+    states, action_names = np.arange(6), [-1, 1]
+    next_states = np.empty((6, 2, 3), dtype=np.int64)
+    for a, action in enumerate(action_names):
+        next_states[:, a] = np.column_stack([states + action, states, states - action])
+    terminal = (states == 0) | (states == 5)
+    # Terminal states only lead to themselves
+    next_states[terminal] = states[terminal, None, None]
+    next_states = np.clip(next_states, 0, 5)
+    rewards = np.zeros((6, 2, 3))
+    rewards[4, 1, 0] = 5.0
+    rewards[1, 0, 0] = 1.0
+    dones = (next_states == 0) | (next_states == 5)
+    probabilities = np.broadcast_to([move_probability, stay_probability, back_probability], (6, 2, 3))
+    return TabularEnv(next_states, rewards, dones, 3, probabilities, action_names=action_names)
+
+
+def dyna_maze(height=6, width=9, start=(3, 0), goal=(5, 8),
+              obstacles=((4, 2), (3, 2), (2, 2), (1, 5), (5, 7), (4, 7), (3, 7))):
+    """The Dyna-Q exercise's maze, or any other (e.g. from maze_walls()): reward 1 for reaching the
+    goal, which ends the episode."""
+    action_names = ['up', 'down', 'left', 'right']
+    next_states = grid_moves(height, width, [(-1, 0), (1, 0), (0, -1), (0, 1)], obstacles)
+    goal_state = goal[0] * width + goal[1]
+    dones = next_states == goal_state
+    return TabularEnv(next_states, dones.astype(np.float64), dones, start[0] * width + start[1],
+                      action_names=action_names, shape=(height, width))
+
+
+def maze_walls(height, width, loops=0.05, seed=None):
+    """(wall cells, start, goal) of a random maze for dyna_maze().
+
+    Cells with even row and column are rooms, carved into a spanning tree by a randomized
+    depth-first search; then a `loops` fraction of the remaining walls between two rooms is
+    knocked out so there is more than one way through. Start and goal are opposite corner rooms.
+    """
+    rng = np.random.default_rng(seed)
+    rooms = ((height + 1) // 2, (width + 1) // 2)
+    wall = np.ones((height, width), dtype=bool)
+    wall[::2, ::2] = False
+    visited = np.zeros(rooms, dtype=bool)
+    visited[0, 0] = True
+    stack = [(0, 0)]
+    while stack:
+        row, column = stack[-1]
+        neighbours = [(row + dy, column + dx) for dy, dx in ((-1, 0), (1, 0), (0, -1), (0, 1))
+                      if 0 <= row + dy < rooms[0] and 0 <= column + dx < rooms[1] and not visited[row + dy, column + dx]]
+        if not neighbours:
+            stack.pop()
+            continue
+        next_row, next_column = neighbours[rng.integers(len(neighbours))]
+        wall[row + next_row, column + next_column] = False  # the wall between the two rooms
+        visited[next_row, next_column] = True
+        stack.append((next_row, next_column))
+    rows, columns = np.nonzero(wall)
+    between_rooms = (rows % 2) != (columns % 2)
+    knocked = between_rooms & (rng.random(len(rows)) < loops)
+    wall[rows[knocked], columns[knocked]] = False
+    goal = (2 * (rooms[0] - 1), 2 * (rooms[1] - 1))
+    return [(int(row), int(column)) for row, column in zip(*np.nonzero(wall))], (0, 0), goal
+
+
+def row_max(q):
+    """Largest value of each row of q (runs, A), taken column by column: q.max(axis=1) is much
+    slower for a handful of actions."""
+    best = q[:, 0].copy()
+    for column in range(1, q.shape[1]):
+        np.maximum(best, q[:, column], out=best)
+    return best
+
+
+def greedy_actions(q, uniforms=None):
+    """Greedy action of each row of q (runs, A): the first best, or a uniformly random one of the
+    tied best when `uniforms` (runs, A) are given."""
+    if uniforms is None:
+        return q.argmax(axis=1)
+    return np.where(q == row_max(q)[:, None], uniforms, -1.0).argmax(axis=1)
+
+
+def epsilon_greedy(q, epsilon, uniforms, tie_uniforms=None):
+    """Epsilon-greedy actions for q (runs, A) from one uniform per run, which below epsilon also
+    picks the random action. `tie_uniforms` (runs, A) break greedy ties at random."""
+    return explore(greedy_actions(q, tie_uniforms), q.shape[1], epsilon, uniforms)
+
+
+def explore(greedy, num_actions, epsilon, uniforms):
+    """`greedy` actions replaced by uniformly random ones where `uniforms` fall below epsilon."""
+    if epsilon <= 0:
+        return greedy
+    random = np.minimum((uniforms * (num_actions / epsilon)).astype(np.int64), num_actions - 1)
+    return np.where(uniforms < epsilon, random, greedy)
+
+
+def td_control(env, algorithm, runs, episodes, alpha=0.5, gamma=1.0, epsilon=0.1, seed=None, max_steps=10 ** 7):
+    """SARSA or Q-learning ('sarsa' / 'q_learning') on `runs` independent seeds at once.
+
+    Returns (episode returns (runs, episodes), Q (runs, S, A)). Each run starts its next episode
+    at env.start_state as soon as the previous one ends, and drops out once it has finished
+    `episodes` episodes. Greedy ties go to the first action, like max(Q[state], key=Q[state].get).
+    """
+    if algorithm not in ('sarsa', 'q_learning'):
+        raise ValueError(f"algorithm must be 'sarsa' or 'q_learning', not {algorithm!r}")
+    num_states, num_actions = env.num_states, env.num_actions
+    rng = np.random.default_rng(seed)
+    Q = np.zeros((runs, num_states, num_actions))
+    # Row r * S + s of `rows` is Q[r, s]; entry (r * S + s) * A + a of `flat` is Q[r, s, a]
+    rows, flat = Q.reshape(-1, num_actions), Q.reshape(-1)
+    returns = np.zeros((runs, episodes))
+    # Per live run, in the order of `live`
+    live = np.arange(runs)
+    base = live * num_states
+    episode = np.zeros(runs, dtype=np.int64)
+    total = np.zeros(runs)
+    state = np.full(runs, env.start_state)
+    action = epsilon_greedy(rows.take(base + state, axis=0), epsilon, rng.random(runs))
+    for _ in range(max_steps):
+        # The action, the transition's outcome and the first action of a new episode
+        draws = rng.random((3, len(live)))
+        if algorithm == 'q_learning':
+            action = epsilon_greedy(rows.take(base + state, axis=0), epsilon, draws[0])
+        next_state, reward, done = env.step(state, action, draws[1])
+        total += reward
+        # A finished episode continues from the start; terminal transitions do not bootstrap
+        next_state = np.where(done, env.start_state, next_state)
+        next_rows = base + next_state
+        if algorithm == 'sarsa':
+            next_action = epsilon_greedy(rows.take(next_rows, axis=0), epsilon, draws[0])
+            bootstrap = flat.take(next_rows * num_actions + next_action)
+        else:
+            bootstrap = row_max(rows.take(next_rows, axis=0))
+        target = reward + gamma * np.where(done, 0.0, bootstrap)
+        cells = (base + state) * num_actions + action
+        old = flat.take(cells)
+        flat[cells] = old + alpha * (target - old)
+
+        if done.any():
+            finished = np.flatnonzero(done)
+            returns[live[finished], episode[finished]] = total[finished]
+            episode[finished] += 1
+            total[finished] = 0.0
+            if algorithm == 'sarsa':
+                # The first action of an episode is chosen after the last update of the one before
+                stale = finished[state[finished] == env.start_state]
+                if len(stale):
+                    next_action[stale] = epsilon_greedy(rows.take(base[stale] + env.start_state, axis=0), epsilon,
+                                                        draws[2, stale])
+            if episode[finished].max() == episodes:
+                keep = episode < episodes
+                if not keep.any():
+                    break
+                live, base, episode, total = live[keep], base[keep], episode[keep], total[keep]
+                next_state = next_state[keep]
+                if algorithm == 'sarsa':
+                    next_action = next_action[keep]
+        state = next_state
+        if algorithm == 'sarsa':
+            action = next_action
+    return returns, Q
+
+
+def mc_control(env, runs, episodes, epsilon=0.1, gamma=1.0, first_visit=False, seed=None, max_steps=10000,
+               history=False):
+    """On-policy epsilon-soft Monte Carlo control on `runs` independent seeds at once.
+
+    Every run plays one episode from env.start_state per iteration; Q then moves to the mean
+    return of each visited (state, action), kept as an incremental mean with a visit count
+    instead of a list of returns, and the policy turns greedy in Q (first best action on ties).
+    Every visit counts unless first_visit, as in the exercise's update_policy. Returns
+    (Q (runs, S, A), greedy actions (runs, S)), plus the Q after each episode
+    (episodes, runs, S, A) with history.
+    """
+    num_states, num_actions = env.num_states, env.num_actions
+    index = np.arange(runs)
+    rng = np.random.default_rng(seed)
+    Q = np.zeros((runs, num_states, num_actions))
+    flat = Q.reshape(-1)
+    counts = np.zeros(runs * num_states * num_actions)
+    # The exercise starts from a random best action per state
+    greedy = rng.integers(0, num_actions, (runs, num_states))
+    Q_history = np.empty((episodes, runs, num_states, num_actions)) if history else None
+    for episode in range(episodes):
+        # Runs whose episode has ended drop out, so the longest episode of the batch costs little
+        live, state = index, np.full(runs, env.start_state)
+        trajectory = []
+        for _ in range(max_steps):
+            draws = rng.random((2, len(live)))
+            action = explore(greedy.reshape(-1).take(live * num_states + state), num_actions, epsilon, draws[0])
+            next_state, reward, done = env.step(state, action, draws[1])
+            trajectory.append((live, (live * num_states + state) * num_actions + action, reward))
+            if done.any():
+                live, next_state = live[~done], next_state[~done]
+                if not len(live):
+                    break
+            state = next_state
+
+        if first_visit:
+            seen = np.zeros(counts.shape, dtype=bool)
+            visits = []
+            for _, cells, _ in trajectory:
+                visits.append(~seen[cells])
+                seen[cells] = True
+        G = np.zeros(runs)
+        for t in range(len(trajectory) - 1, -1, -1):
+            live, cells, reward = trajectory[t]
+            G[live] = gamma * G[live] + reward
+            returns = G[live]
+            if first_visit:
+                cells, returns = cells[visits[t]], returns[visits[t]]
+            counts[cells] += 1
+            flat[cells] += (returns - flat[cells]) / counts[cells]
+        greedy = Q.argmax(axis=2)
+        if history:
+            Q_history[episode] = Q
+    return (Q, greedy, Q_history) if history else (Q, greedy)
+
+
+class ModelStore:
+    """Deterministic learned model of each run: the latest (next state, reward) of every observed
+    (state, action), plus the list of observed pairs for O(1) uniform sampling."""
+
+    def __init__(self, runs, num_states, num_actions):
+        self.num_actions = num_actions
+        self.size = num_states * num_actions
+        self.next_states = np.full(runs * self.size, -1, dtype=np.int64)  # entry r * S * A + s * A + a
+        self.rewards = np.zeros(runs * self.size)
+        self.pairs = np.zeros(runs * self.size, dtype=np.int64)  # each run's observed s * A + a, in order seen
+        self.counts = np.zeros(runs, dtype=np.int64)
+
+    def add(self, runs, states, actions, next_states, rewards):
+        entries = runs * self.size + states * self.num_actions + actions
+        new = self.next_states.take(entries) < 0
+        if new.any():
+            added = runs[new]
+            self.pairs[added * self.size + self.counts[added]] = entries[new] - added * self.size
+            self.counts[added] += 1
+        self.next_states[entries] = next_states
+        self.rewards[entries] = rewards
+
+    def sample(self, runs, uniforms):
+        """(states, actions, next states, rewards): one uniformly drawn observed pair per run (runs must have one)."""
+        offsets = runs * self.size
+        pairs = self.pairs.take(offsets + (uniforms * self.counts[runs]).astype(np.int64))
+        states, actions = np.divmod(pairs, self.num_actions)
+        return states, actions, self.next_states.take(offsets + pairs), self.rewards.take(offsets + pairs)
+
+
+def dyna_q(env, runs, episodes, planning_steps, alpha=0.1, gamma=0.95, epsilon=0.1, seed=None, max_steps=10 ** 7):
+    """Tabular Dyna-Q on `runs` independent seeds at once; returns (steps per episode (runs, episodes), Q).
+
+    After each real step every run makes `planning_steps` Q-learning updates on pairs drawn
+    uniformly from its ModelStore, all runs in one update per planning step. Greedy ties are
+    broken at random, as in the exercise. Runs drop out once they have finished `episodes`.
+    """
+    num_states, num_actions = env.num_states, env.num_actions
+    Q = np.zeros((runs, num_states, num_actions))
+    rows, flat = Q.reshape(-1, num_actions), Q.reshape(-1)
+    model = ModelStore(runs, num_states, num_actions)
+    lengths = np.zeros((runs, episodes), dtype=np.int64)
+    episode = np.zeros(runs, dtype=np.int64)
+    steps = np.zeros(runs, dtype=np.int64)
+    state = np.full(runs, env.start_state)
+    live = np.arange(runs)
+    rng = np.random.default_rng(seed)
+    for _ in range(max_steps):
+        # The action, the transition's outcome and greedy tie-breaks
+        draws = rng.random((2 + num_actions, len(live)))
+        base = live * num_states
+        s = state[live]
+        action = epsilon_greedy(rows.take(base + s, axis=0), epsilon, draws[0], draws[2:].T)
+        next_state, reward, done = env.step(s, action, draws[1])
+        cells = (base + s) * num_actions + action
+        target = reward + gamma * row_max(rows.take(base + next_state, axis=0))
+        flat[cells] += alpha * (target - flat.take(cells))
+        model.add(live, s, action, next_state, reward)
+        if planning_steps:
+            planning_draws = rng.random((planning_steps, len(live)))
+            for n in range(planning_steps):
+                ps, pa, pnext, preward = model.sample(live, planning_draws[n])
+                cells = (base + ps) * num_actions + pa
+                target = preward + gamma * row_max(rows.take(base + pnext, axis=0))
+                flat[cells] += alpha * (target - flat.take(cells))
+
+        steps[live] += 1
+        state[live] = np.where(done, env.start_state, next_state)
+        if done.any():
+            finished = live[done]
+            lengths[finished, episode[finished]] = steps[finished]
+            episode[finished] += 1
+            steps[finished] = 0
+            live = live[episode[live] < episodes]
+            if not len(live):
+                break
+    return lengths, Q